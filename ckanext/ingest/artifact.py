@@ -1,15 +1,65 @@
 from __future__ import annotations
 
 import enum
+import gzip
+import itertools
 import json
+import os
 import tempfile
-from typing import Any
+import uuid
+from typing import Any, Iterable
 
+from . import config, shared
+
+
+def make_artifacts(report: str, user: str | None = None) -> Artifacts:
+    """Create artifacts for the report type.
+
+    `user` is recorded as the owner of the `stream` report, which is stored
+    and can be read later.
+
+    """
+    if report == Type.stream.name:
+        return StreamArtifacts(user)
 
-def make_artifacts(report: str) -> Artifacts:
     return Type[report].value()
 
 
+def project(
+    data: dict[str, Any],
+    fields: Iterable[str],
+    transformed: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Keep only selected fields of the record's result and source.
+
+    Fields are taken from the entity produced by ingestion(e.g, package's
+    `id` and `name`) and from the details of the result(e.g, `action`).
+
+    Failed records have no entity, so fields are taken from their
+    `transformed` data, which has the same field names as the entity, and
+    stored under the `data` key. When transformed data is not available(e.g,
+    transformation failed, or record was transformed by a process worker),
+    the source is kept instead, and fields are treated as names of source's
+    columns.
+
+    """
+    projected = {k: v for k, v in data.items() if k not in ["result", "source"]}
+
+    if isinstance(result := data.get("result"), dict):
+        values: dict[str, Any] = dict(result.get("details") or {})
+        if isinstance(entity := result.get("result"), dict):
+            values.update(entity)
+        projected["result"] = {f: values[f] for f in fields if f in values}
+
+    source = data.get("source")
+    if isinstance(source, dict) and isinstance(transformed, dict):
+        projected["data"] = {f: transformed[f] for f in fields if f in transformed}
+    elif isinstance(source, dict):
+        projected["source"] = {f: source[f] for f in fields if f in source}
+
+    return projected
+
+
 class Artifacts:
     def fail(self, data: Any):
         pass
@@ -17,9 +67,23 @@ class Artifacts:
     def success(self, data: Any):
         pass
 
+    def unchanged(self, data: Any):
+        """Record was skipped, because its data did not change."""
+        self.success(data)
+
     def collect(self) -> Any:
         pass
 
+    def state(self) -> Any:
+        """JSON-serializable state used to resume collection."""
+        return None
+
+    def restore(self, state: Any):
+        """Continue collection from the saved state."""
+
+    def timing(self, summary: dict[str, Any]):
+        """Add timing of ingestion stages produced by `profiling.Profile`."""
+
 
 class DetailedArtifacts(Artifacts):
     collection: list[dict[str, Any]]
@@ -42,6 +106,8 @@ class DetailedArtifacts(Artifacts):
 
 
 class TmpArtifacts(Artifacts):
+    summary: dict[str, Any] | None = None
+
     def __init__(self):
         self.output = tempfile.NamedTemporaryFile("w", delete=False)
 
@@ -57,12 +123,36 @@ class TmpArtifacts(Artifacts):
 
     def collect(self):
         self.output.close()
-        return {"report_path": self.output.name}
+        result: dict[str, Any] = {"report_path": self.output.name}
+        if self.summary is not None:
+            result["timing"] = self.summary
+        return result
+
+    def state(self):
+        self.output.flush()
+        return {"report_path": self.output.name, "size": self.output.tell()}
+
+    def restore(self, state: Any):
+        path = state["report_path"]
+        if not os.path.exists(path):
+            return
+
+        self.output.close()
+        os.remove(self.output.name)
+
+        # records reported after the checkpoint are ingested once again
+        self.output = open(path, "a")  # noqa: SIM115
+        self.output.truncate(state["size"])
+
+    def timing(self, summary: dict[str, Any]):
+        self.summary = summary
 
 
 class StatArtifacts(Artifacts):
     succeed: int = 0
     failed: int = 0
+    skipped: int = 0
+    summary: dict[str, Any] | None = None
 
     def fail(self, data: Any):
         self.failed += 1
@@ -70,14 +160,193 @@ class StatArtifacts(Artifacts):
     def success(self, data: Any):
         self.succeed += 1
 
+    def unchanged(self, data: Any):
+        self.skipped += 1
+
     def collect(self):
+        result: dict[str, Any] = {
+            "fail": self.failed,
+            "success": self.succeed,
+        }
+        if self.skipped:
+            result["unchanged"] = self.skipped
+        if self.summary is not None:
+            result["timing"] = self.summary
+        return result
+
+    def state(self):
         return {
             "fail": self.failed,
             "success": self.succeed,
+            "unchanged": self.skipped,
         }
 
+    def restore(self, state: Any):
+        self.failed = state["fail"]
+        self.succeed = state["success"]
+        self.skipped = state.get("unchanged", 0)
+
+    def timing(self, summary: dict[str, Any]):
+        self.summary = summary
+
+
+class StreamArtifacts(StatArtifacts):
+    """Compressed JSONL report of every record inside the storage directory.
+
+    Report is identified by `report_id` from the result of ingestion and can
+    be read via `ingest_report_show`. When uncompressed size of the report
+    reaches `ckanext.ingest.report_size_limit`, remaining records are only
+    counted.
+
+    Reports that were not updated during `ckanext.ingest.report_ttl` seconds
+    are removed when the new report is created.
+
+    Name of the `user` who produced the report is stored in its summary, so
+    that only this user can read the report.
+
+    """
+
+    def __init__(self, user: str | None = None):
+        self.id = str(uuid.uuid4())
+        self.user = user
+        self.limit = config.report_size_limit()
+        self.size = 0
+        self.records = 0
+        self.truncated = False
+
+        path = report_path(self.id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shared.remove_expired(os.path.dirname(path), config.report_ttl())
+        self.file = open(path, "wb")  # noqa: SIM115
+        self.output = gzip.GzipFile(fileobj=self.file, mode="wb")
+
+    def fail(self, data: Any):
+        super().fail(data)
+        self._write(False, data)
+
+    def success(self, data: Any):
+        super().success(data)
+        self._write(True, data)
+
+    def unchanged(self, data: Any):
+        super().unchanged(data)
+        self._write(True, data)
+
+    def _write(self, success: bool, data: Any):
+        if self.truncated:
+            return
+
+        rec = {"success": success}
+        rec.update(data)
+        line = (json.dumps(rec) + "\n").encode()
+
+        if self.limit and self.size + len(line) > self.limit:
+            self.truncated = True
+            return
+
+        self.output.write(line)
+        self.size += len(line)
+        self.records += 1
+
+    def collect(self):
+        self.output.close()
+        self.file.close()
+
+        result = super().collect()
+        result.update(
+            {
+                "report_id": self.id,
+                "records": self.records,
+                "truncated": self.truncated,
+            },
+        )
+
+        with open(report_path(self.id, "json"), "w") as dest:
+            json.dump(dict(result, user=self.user), dest)
+
+        return result
+
+    def state(self):
+        # report is written as a sequence of gzip members, so that it can be
+        # truncated to the last complete member on resume
+        self.output.close()
+        self.file.flush()
+        state = dict(
+            super().state(),
+            report_id=self.id,
+            position=self.file.tell(),
+            size=self.size,
+            records=self.records,
+            truncated=self.truncated,
+        )
+        self.output = gzip.GzipFile(fileobj=self.file, mode="wb")
+        return state
+
+    def restore(self, state: Any):
+        super().restore(state)
+
+        path = report_path(state["report_id"])
+        if not os.path.exists(path):
+            return
+
+        self.output.close()
+        self.file.close()
+        os.remove(self.file.name)
+
+        self.id = state["report_id"]
+        self.size = state["size"]
+        self.records = state["records"]
+        self.truncated = state["truncated"]
+
+        self.file = open(path, "r+b")  # noqa: SIM115
+        self.file.truncate(state["position"])
+        self.file.seek(state["position"])
+        self.output = gzip.GzipFile(fileobj=self.file, mode="wb")
+
+
+def report_path(report_id: str, extension: str = "jsonl.gz") -> str:
+    return os.path.join(config.storage_path(), "reports", f"{report_id}.{extension}")
+
+
+def read_summary(report_id: str) -> dict[str, Any] | None:
+    """Read the summary of the streamed report.
+
+    `None` returned if report does not exist or it's not completed yet.
+
+    """
+    try:
+        with open(report_path(report_id, "json")) as src:
+            return json.load(src)
+    except FileNotFoundError:
+        return None
+
+
+def read_report(report_id: str, offset: int, limit: int) -> dict[str, Any] | None:
+    """Read a page of the streamed report.
+
+    `None` returned if report does not exist or it's not completed yet.
+
+    Report is compressed as a whole, so records before the page are
+    decompressed and skipped: cost of the page grows with `offset`.
+
+    """
+    summary = read_summary(report_id)
+    if summary is None:
+        return None
+
+    with gzip.open(report_path(report_id)) as src:
+        lines = itertools.islice(src, offset, offset + limit)
+        results = [json.loads(line) for line in lines]
+
+    return {
+        "count": summary["records"],
+        "truncated": summary["truncated"],
+        "results": results,
+    }
+
 
 class Type(enum.Enum):
     stats = StatArtifacts
     details = DetailedArtifacts
     tmp = TmpArtifacts
+    stream = StreamArtifacts
@@ -0,0 +1,385 @@
+"""Benchmarks of ingestion stages.
+
+Every benchmark case generates a synthetic source and measures time spent on
+the following stages:
+
+* extract: parsing of the source by `ExtractionStrategy.chunks`
+* transform: transformation of every row by `PackageRecord.transform_batch`,
+  using synthetic metadata schema, where every column is mapped and converted
+  via `ingest_options`
+* ingest: creation of packages by `PackageRecord.ingest`. Optional, because
+  it requires DB. All changes are rolled back and search indexing is skipped.
+
+Stages are chained, just as during ingestion, so rows are never collected
+into a list and peak memory reflects streaming of the source. Time of stages
+is measured by `profiling`.
+
+This module is a development tool. It's imported only by `ckan ingest
+benchmark` command, and never by the plugin.
+
+Additionally, `startup` measures import of the plugin and collection of its
+strategies in a fresh interpreter, which is paid by every CKAN process.
+
+Results are JSON-serializable, so they can be saved and compared with the
+results of another commit via `compare`.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import csv
+import dataclasses
+import io
+import itertools
+import platform
+import resource
+import subprocess
+import sys
+import zipfile
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator
+
+import ckan.plugins.toolkit as tk
+from ckan import __version__ as ckan_version
+from ckan import model
+
+from . import config, indexing, pipeline, profiling, shared
+from .record import PackageRecord
+from .strategy.csv import CsvStrategy
+from .strategy.xlsx import XlsxStrategy, is_installed as xlsx_installed
+from .strategy.zip import ZipStrategy
+
+# dataset type of the synthetic metadata schema
+DATASET_TYPE = "ingest_benchmark"
+
+
+def _as_is(chunks: Iterable[Any]) -> Iterable[Any]:
+    return chunks
+
+
+@dataclasses.dataclass
+class Case:
+    """Synthetic source and strategy that parses it."""
+
+    # strategy that extracts rows from the source
+    strategy: Callable[[], shared.ExtractionStrategy]
+    # produce the source from the number of rows
+    source: Callable[[int], bytes]
+    # number of columns in every row
+    columns: int
+    # convert chunk produced by strategy into raw data for transformation
+    rows: Callable[[Iterable[Any]], Iterable[dict[str, Any]]] = _as_is
+    # options of the strategy
+    options: shared.StrategyOptions = dataclasses.field(default_factory=dict)
+
+
+@dataclasses.dataclass
+class Result:
+    case: str
+    rows: int
+    # seconds spent on every stage
+    stages: dict[str, float]
+    # processed rows per second for every stage
+    rate: dict[str, float]
+    # high-water mark of the process memory, KiB
+    peak_rss: int
+    # growth of the high-water mark during the case, KiB
+    rss_growth: int
+
+
+def make_rows(rows: int, columns: int) -> Iterable[list[str]]:
+    """Generate rows with `name` and `title` followed by `columns` values."""
+    yield ["name", "title", *(f"col_{i}" for i in range(columns))]
+    for row in range(rows):
+        yield [
+            f"benchmark-{row}",
+            f"Benchmark {row}",
+            *(f"value {row}-{i}" for i in range(columns)),
+        ]
+
+
+def make_csv(rows: int, columns: int) -> bytes:
+    output = io.StringIO()
+    csv.writer(output).writerows(make_rows(rows, columns))
+    return output.getvalue().encode()
+
+
+def make_zip(rows: int, columns: int, files: int = 2, depth: int = 2) -> bytes:
+    """Archive with CSV files and nested archive of the same structure."""
+    output = io.BytesIO()
+    per_file = rows // (files * depth) or 1
+
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for idx in range(files):
+            archive.writestr(f"data/{idx}.csv", make_csv(per_file, columns))
+
+        if depth > 1:
+            nested = make_zip(rows - per_file * files, columns, files, depth - 1)
+            archive.writestr("nested.zip", nested)
+
+    return output.getvalue()
+
+
+def make_xlsx(rows: int, columns: int, sheets: int = 3) -> bytes:
+    from openpyxl import Workbook
+
+    doc = Workbook(write_only=True)
+    for idx in range(sheets):
+        sheet = doc.create_sheet(f"Sheet {idx}")
+        for row in make_rows(rows // sheets, columns):
+            sheet.append(row)
+
+    output = io.BytesIO()
+    doc.save(output)
+    return output.getvalue()
+
+
+def make_schema(columns: int) -> dict[str, Any]:
+    """Metadata schema with a field for every column of the generated rows.
+
+    Every field except `name` converts its value, so transformation runs
+    validators, and every tenth field normalizes choices, so that
+    transformation includes the most expensive option.
+
+    """
+    fields: list[dict[str, Any]] = [
+        {"field_name": "name", "label": "URL", "ingest_options": {}},
+        {
+            "field_name": "title",
+            "label": "Title",
+            "ingest_options": {"convert": "unicode_safe strip_value"},
+        },
+    ]
+
+    for idx in range(columns):
+        field: dict[str, Any] = {
+            "field_name": f"field_{idx}",
+            "label": f"Field {idx}",
+            "validators": "ignore_missing unicode_safe",
+            "ingest_options": {
+                "aliases": [f"col_{idx}"],
+                "convert": "unicode_safe strip_value",
+            },
+        }
+        if not idx % 10:
+            field["choices"] = [{"value": "v", "label": "Value"}]
+            field["ingest_options"]["normalize_choice"] = True
+
+        fields.append(field)
+
+    return {
+        "scheming_version": 2,
+        "dataset_type": DATASET_TYPE,
+        "dataset_fields": fields,
+        "resource_fields": [],
+    }
+
+
+def _xlsx_rows(chunks: Iterable[Any]) -> Iterable[dict[str, Any]]:
+    strategy = XlsxStrategy()
+    for chunk in chunks:
+        yield from strategy.rows(chunk, {"extras": {"with_header": True}})
+
+
+def _zip_rows(chunks: Iterable[Any]) -> Iterable[dict[str, Any]]:
+    for chunk in chunks:
+        nested = chunk["handler"].chunks(chunk["source"], {})
+        if isinstance(chunk["handler"], ZipStrategy):
+            nested = _zip_rows(nested)
+
+        yield from nested
+
+
+CASES: dict[str, Case] = {
+    "csv-narrow": Case(CsvStrategy, lambda rows: make_csv(rows, 5), 5),
+    "csv-wide": Case(CsvStrategy, lambda rows: make_csv(rows, 200), 200),
+    "zip-nested": Case(
+        ZipStrategy,
+        lambda rows: make_zip(rows, 5),
+        5,
+        _zip_rows,
+    ),
+}
+
+if xlsx_installed:
+    CASES["xlsx-sheets"] = Case(
+        XlsxStrategy,
+        lambda rows: make_xlsx(rows, 5),
+        5,
+        _xlsx_rows,
+    )
+    CASES["xlsx-lxml"] = Case(
+        XlsxStrategy,
+        lambda rows: make_xlsx(rows, 5),
+        5,
+        _xlsx_rows,
+        {"extras": {"engine": "lxml"}},
+    )
+
+
+@contextlib.contextmanager
+def registered_schema(columns: int) -> Iterator[dict[str, Any]]:
+    """Make synthetic schema available to `transform.get_plan`.
+
+    Schemas of other dataset types are still produced by ckanext-scheming.
+
+    """
+    schema = make_schema(columns)
+    original = tk.h.scheming_get_dataset_schema
+
+    def get_schema(type_: str, expanded: bool = True) -> Any:
+        if type_ == DATASET_TYPE:
+            return schema
+        return original(type_, expanded)
+
+    tk.h["scheming_get_dataset_schema"] = get_schema
+    try:
+        yield schema
+    finally:
+        tk.h["scheming_get_dataset_schema"] = original
+
+
+def run(name: str, rows: int, ingest: bool = False) -> Result:
+    """Measure stages of the benchmark case."""
+    case = CASES[name]
+    source = case.source(rows)
+    rss = _rss()
+    count = 0
+
+    with registered_schema(case.columns), profiling.profile() as profile:
+        records = _transform(profiling.timed(_records(case, source), "extract"))
+        if ingest:
+            records = _ingest(records)
+
+        for record in records:
+            profile.finish(record)
+            count += 1
+
+    stages = {stage: spent.wall for stage, spent in profile.stages.items()}
+    peak = _rss()
+    return Result(
+        name,
+        count,
+        stages,
+        {stage: count / spent if spent else 0 for stage, spent in stages.items()},
+        peak,
+        peak - rss,
+    )
+
+
+def _records(case: Case, source: bytes) -> Iterator[PackageRecord]:
+    chunks = case.strategy().chunks(shared.make_storage(source), case.options)
+    for row in case.rows(chunks):
+        yield PackageRecord(row, type=DATASET_TYPE)
+
+
+def _transform(records: Iterable[PackageRecord]) -> Iterator[PackageRecord]:
+    """Transform records by windows, just as during ingestion."""
+    window = config.prefetch_window() or 1
+    iterator = iter(records)
+    while group := list(itertools.islice(iterator, window)):
+        shared.transform_batch(group)
+        yield from group
+
+
+# executed in a fresh interpreter by `startup`
+_STARTUP = """
+import sys, time
+start = time.perf_counter()
+from ckanext.ingest.plugin import IngestPlugin
+IngestPlugin().get_ingest_strategies()
+print(time.perf_counter() - start, len(sys.modules))
+"""
+
+
+def startup(repeat: int = 5) -> dict[str, Any]:
+    """Measure import of the plugin and its strategies.
+
+    Every attempt runs in a new interpreter, so modules are not cached between
+    attempts. The fastest attempt is reported, together with the number of
+    loaded modules.
+
+    """
+    attempts: list[tuple[float, int]] = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, "-c", _STARTUP],  # noqa: S603
+            text=True,
+        )
+        seconds, modules = output.split()
+        attempts.append((float(seconds), int(modules)))
+
+    seconds, modules = min(attempts)
+    return {"seconds": seconds, "modules": modules}
+
+
+def _ingest(records: Iterable[PackageRecord]) -> Iterator[shared.Record]:
+    """Ingest records inside the transaction that is rolled back."""
+    user = tk.get_action("get_site_user")({"ignore_auth": True}, {})
+    context: Any = {"user": user["name"], "ignore_auth": True}
+
+    try:
+        with indexing.deferred():
+            for record, _outcome in pipeline.ingest(records, context, savepoints=True):
+                yield record
+    finally:
+        model.Session.rollback()
+
+
+def run_all(
+    names: Iterable[str],
+    rows: int,
+    ingest: bool = False,
+    with_startup: bool = False,
+) -> dict[str, Any]:
+    """Run benchmark cases and collect results with environment details."""
+    results: dict[str, Any] = {
+        "created": datetime.utcnow().isoformat(),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "ckan": ckan_version,
+        "results": [dataclasses.asdict(run(name, rows, ingest)) for name in names],
+    }
+    if with_startup:
+        results["startup"] = startup()
+
+    return results
+
+
+def compare(
+    before: dict[str, Any],
+    after: dict[str, Any],
+) -> Iterable[tuple[str, str, float, float]]:
+    """Produce case, metric, value before and value after for common cases."""
+    previous = {r["case"]: r for r in before["results"]}
+
+    for result in after["results"]:
+        old = previous.get(result["case"])
+        if not old:
+            continue
+
+        for stage, rate in result["rate"].items():
+            if stage in old["rate"]:
+                yield result["case"], f"{stage}, rows/s", old["rate"][stage], rate
+
+        yield result["case"], "peak RSS, KiB", old["peak_rss"], result["peak_rss"]
+
+    if "startup" in before and "startup" in after:
+        old, new = before["startup"], after["startup"]
+        yield "startup", "import, ms", old["seconds"] * 1000, new["seconds"] * 1000
+        yield "startup", "modules", old["modules"], new["modules"]
+
+
+def _rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],  # noqa: S603, S607
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,97 @@
+"""Checkpoints of ingestion.
+
+Checkpoint is saved into the storage directory every N ingested records. It
+contains the number of processed records, position of the next record inside
+the source and the state of artifacts. Checkpoint is identified by the
+fingerprint of the source and ingestion parameters, so it's picked up only
+when exactly the same source is ingested using the same parameters.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any
+
+from typing_extensions import TypedDict
+
+from . import config, shared
+
+log = logging.getLogger(__name__)
+
+# parameters of ingest_import_records that affect the sequence of records
+_fingerprint_keys = ["options", "defaults", "overrides", "skip", "take"]
+
+
+class Checkpoint(TypedDict):
+    # number of records processed after `skip`
+    processed: int
+    # value of `ExtractionStrategy.tell` after the last processed record
+    position: Any
+    # value of `Artifacts.state`
+    artifacts: Any
+    # ISO datetime of the last update
+    updated: str
+
+
+def fingerprint(
+    source: shared.Storage,
+    strategy: shared.ExtractionStrategy,
+    data_dict: dict[str, Any],
+) -> str | None:
+    """Compute unique identifier of the ingestion.
+
+    `None` returned if source cannot be read twice.
+
+    """
+    cls = type(strategy)
+    params = {k: data_dict.get(k) for k in _fingerprint_keys}
+    params["strategy"] = f"{cls.__module__}:{cls.__qualname__}"
+
+    return shared.fingerprint(source.stream, params)
+
+
+def checkpoint_path(key: str) -> str:
+    return os.path.join(config.storage_path(), "checkpoints", f"{key}.json")
+
+
+def load(key: str) -> Checkpoint | None:
+    try:
+        with open(checkpoint_path(key)) as src:
+            return json.load(src)
+    except FileNotFoundError:
+        return None
+
+
+def save(key: str, processed: int, position: Any, artifacts: Any):
+    """Durably write the checkpoint.
+
+    Checkpoint is written into temporary file which replaces the previous
+    version only after its content reached the disk. Ingestion that dies in
+    the middle of saving leaves previous checkpoint intact.
+
+    """
+    checkpoint = Checkpoint(
+        processed=processed,
+        position=position,
+        artifacts=artifacts,
+        updated=datetime.utcnow().isoformat(),
+    )
+    path = checkpoint_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path + ".tmp", "w") as dest:
+        json.dump(checkpoint, dest)
+        dest.flush()
+        os.fsync(dest.fileno())
+
+    os.replace(path + ".tmp", path)
+    log.debug("Checkpoint %s: %s", key, checkpoint)
+
+
+def remove(key: str):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(checkpoint_path(key))
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import json
 import logging
 import pydoc
 import textwrap
+from typing import IO
 
 import click
 
@@ -29,5 +31,86 @@ def strategy():
 def list_strategies():
     """List supported input strategies and corresponding mimetypes."""
     for name, strategy in strategies.items():
-        click.secho(f"{name} [{strategy.__module__}:{strategy.__name__}]:", bold=True)
+        click.secho(f"{name} [{strategies.reference(name)}]:", bold=True)
         click.echo(textwrap.indent(pydoc.getdoc(strategy) + "\n", "\t"))
+
+
+@ingest.command("benchmark")
+@click.option(
+    "-c",
+    "--case",
+    "cases",
+    multiple=True,
+    help="Benchmark case. Can be repeated. Default: all cases",
+)
+@click.option("-r", "--rows", default=10000, show_default=True)
+@click.option(
+    "--ingest",
+    "with_ingest",
+    is_flag=True,
+    help="Measure ingestion as well. All changes are rolled back",
+)
+@click.option(
+    "--startup",
+    "with_startup",
+    is_flag=True,
+    help="Measure import of the plugin and its strategies",
+)
+@click.option("-o", "--output", type=click.File("w"), help="Save results as JSON")
+@click.option(
+    "--compare",
+    "baseline",
+    type=click.File(),
+    help="Compare with results saved by previous run",
+)
+def run_benchmark(
+    cases: tuple[str, ...],
+    rows: int,
+    with_ingest: bool,
+    with_startup: bool,
+    output: IO[str] | None,
+    baseline: IO[str] | None,
+):
+    """Measure performance of ingestion stages using synthetic sources."""
+    from . import benchmark
+
+    unknown = set(cases) - set(benchmark.CASES)
+    if unknown:
+        msg = f"Available cases: {', '.join(benchmark.CASES)}"
+        raise click.BadParameter(msg, param_hint="--case")
+
+    results = benchmark.run_all(
+        cases or benchmark.CASES,
+        rows,
+        with_ingest,
+        with_startup,
+    )
+
+    for result in results["results"]:
+        click.secho(f"{result['case']}: {result['rows']} rows", bold=True)
+        for stage, spent in result["stages"].items():
+            click.echo(
+                f"\t{stage}: {spent:.3f}s, {result['rate'][stage]:.0f} rows/s",
+            )
+        click.echo(f"\tpeak RSS: {result['peak_rss']} KiB")
+
+    if startup := results.get("startup"):
+        click.secho("startup", bold=True)
+        click.echo(
+            f"\timport: {startup['seconds'] * 1000:.0f}ms,"
+            f" {startup['modules']} modules",
+        )
+
+    if output:
+        json.dump(results, output, indent=2)
+
+    if baseline:
+        click.secho("Comparison with baseline:", bold=True)
+        for case, metric, before, after in benchmark.compare(
+            json.load(baseline),
+            results,
+        ):
+            change = (after - before) / before * 100 if before else 0
+            click.echo(
+                f"\t{case}, {metric}: {before:.0f} -> {after:.0f} ({change:+.1f}%)",
+            )
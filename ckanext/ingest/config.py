@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import os
+import tempfile
+
 import ckan.plugins.toolkit as tk
 
 CONFIG_ALLOWED = "ckanext.ingest.strategy.allowed"
@@ -8,6 +11,14 @@ CONFIG_DISABLED = "ckanext.ingest.strategy.disabled"
 CONFIG_BASE_TEMPLATE = "ckanext.ingest.base_template"
 CONFIG_ALLOW_TRANSFER = "ckanext.ingest.allow_resource_transfer"
 CONFIG_NAME_MAPPING = "ckanext.ingest.strategy.name_mapping"
+CONFIG_PREFETCH_WINDOW = "ckanext.ingest.prefetch_window"
+CONFIG_STORAGE_PATH = "ckanext.ingest.storage_path"
+CONFIG_INDEX_BATCH_SIZE = "ckanext.ingest.index_batch_size"
+CONFIG_BATCH_SIZE = "ckanext.ingest.batch_size"
+CONFIG_REPORT_SIZE_LIMIT = "ckanext.ingest.report_size_limit"
+CONFIG_CHOICES_TTL = "ckanext.ingest.choices_ttl"
+CONFIG_JOB_TTL = "ckanext.ingest.job_ttl"
+CONFIG_REPORT_TTL = "ckanext.ingest.report_ttl"
 
 
 def allow_transfer() -> bool:
@@ -28,3 +39,42 @@ def base_template() -> str:
 
 def name_mapping() -> dict[str, str]:
     return tk.config[CONFIG_NAME_MAPPING]
+
+
+def prefetch_window() -> int:
+    return tk.config[CONFIG_PREFETCH_WINDOW]
+
+
+def storage_path() -> str:
+    """Directory for files produced by ingestion."""
+    if path := tk.config[CONFIG_STORAGE_PATH]:
+        return path
+
+    if root := tk.config["ckan.storage_path"]:
+        return os.path.join(root, "ingest")
+
+    return os.path.join(tempfile.gettempdir(), "ckanext-ingest")
+
+
+def index_batch_size() -> int:
+    return tk.config[CONFIG_INDEX_BATCH_SIZE]
+
+
+def batch_size() -> int:
+    return tk.config[CONFIG_BATCH_SIZE]
+
+
+def report_size_limit() -> int:
+    return tk.config[CONFIG_REPORT_SIZE_LIMIT]
+
+
+def choices_ttl() -> int:
+    return tk.config[CONFIG_CHOICES_TTL]
+
+
+def job_ttl() -> int:
+    return tk.config[CONFIG_JOB_TTL]
+
+
+def report_ttl() -> int:
+    return tk.config[CONFIG_REPORT_TTL]
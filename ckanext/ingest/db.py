@@ -0,0 +1,62 @@
+"""Tables of the plugin.
+
+Fingerprints of ingested records.
+
+Fingerprint is a hash of the record's data stored for the entity affected by
+the record(`Record.fingerprint_key`). When ingestion skips unchanged records,
+record whose data produces the same hash as the stored one is not ingested
+again.
+
+Table is created by the migration of the plugin: `ckan db upgrade -p ingest`.
+
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Iterable
+
+from sqlalchemy import Column, DateTime, UnicodeText
+
+import ckan.plugins.toolkit as tk
+from ckan import model
+
+
+class Fingerprint(tk.BaseModel):
+    __tablename__ = "ingest_fingerprint"
+
+    key = Column(UnicodeText, primary_key=True)
+    digest = Column(UnicodeText, nullable=False)
+    modified_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def lookup(cls, key: str) -> str | None:
+        """Digest stored for the entity."""
+        return (
+            model.Session.query(cls.digest).filter(cls.key == key).scalar()
+        )
+
+    @classmethod
+    def lookup_many(cls, keys: Iterable[str]) -> dict[str, str]:
+        """Digests stored for multiple entities, using a single query."""
+        query = model.Session.query(cls.key, cls.digest).filter(
+            cls.key.in_(list(keys)),
+        )
+        return dict(query.all())
+
+    @classmethod
+    def store(cls, key: str, digest: str, defer_commit: bool = False):
+        """Remember the digest of the entity."""
+        model.Session.merge(
+            cls(key=key, digest=digest, modified_at=datetime.utcnow()),
+        )
+
+        if not defer_commit:
+            model.Session.commit()
+
+
+def digest(data: Any) -> str:
+    """Stable hash of the record's data."""
+    content = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
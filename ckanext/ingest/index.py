@@ -0,0 +1,80 @@
+"""Offset index of the source.
+
+Index contains positions(as reported by `ExtractionStrategy.tell`) of every
+K-th record of the source. It's built by the strategy once and cached inside
+the storage directory using the fingerprint of the source, so `skip` jumps
+close to the requested record instead of extracting all the records before
+it.
+
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Callable
+
+from . import config, shared
+
+log = logging.getLogger(__name__)
+
+
+class OffsetIndex:
+    """Positions of every `step`-th record."""
+
+    def __init__(self, step: int, positions: list[Any]):
+        self.step = step
+        self.positions = positions
+
+    def locate(self, number: int) -> tuple[int, Any] | None:
+        """Find the closest indexed record that precedes the record `number`.
+
+        Returns the number of the indexed record and its position.
+
+        """
+        idx = min(number // self.step, len(self.positions) - 1)
+        if idx < 1:
+            return None
+
+        return idx * self.step, self.positions[idx]
+
+
+def index_path(key: str) -> str:
+    return os.path.join(config.storage_path(), "indexes", f"{key}.json")
+
+
+def get_index(
+    stream: Any,
+    step: int,
+    params: Any,
+    build: Callable[[], list[Any]],
+) -> OffsetIndex | None:
+    """Load cached index of the stream or build a new one.
+
+    `params` must contain everything that affects the sequence of records,
+    e.g. encoding and options of the parser. `build` produces positions of
+    every `step`-th record, starting from the first one. `None` returned if
+    stream is not seekable.
+
+    """
+    key = shared.fingerprint(stream, {"step": step, "params": params})
+    if not key:
+        return None
+
+    path = index_path(key)
+    try:
+        with open(path) as src:
+            return OffsetIndex(step, json.load(src))
+    except FileNotFoundError:
+        pass
+
+    positions = build()
+    log.debug("Build offset index %s with %s entries", key, len(positions))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as dest:
+        json.dump(positions, dest)
+    os.replace(tmp, path)
+
+    return OffsetIndex(step, positions)
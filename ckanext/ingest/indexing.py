@@ -0,0 +1,146 @@
+"""Deferred search indexing.
+
+Inside `deferred` block, packages are not sent to the search index when they
+are created or updated. Instead, their IDs are collected and indexed later
+via `flush`, which sends all the packages from the batch and commits the
+index only once.
+
+CKAN does not provide a switch for automatic indexing, so the package search
+index registered in `ckan.lib.search` is replaced by its subclass that checks
+whether indexing is currently deferred. Replacement is active only while at
+least one `deferred` block is running, and the original index is restored
+when the last block exits.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator
+
+import ckan.plugins.toolkit as tk
+from ckan import model
+from ckan.lib import search
+
+log = logging.getLogger(__name__)
+
+# IDs of packages that must be indexed when indexing is deferred
+_deferred: ContextVar[set[str] | None] = ContextVar("ingest_deferred", default=None)
+
+
+class DeferredIndexMixin:
+    """Collect IDs of packages instead of indexing them, if it's deferred."""
+
+    def index_package(
+        self,
+        pkg_dict: dict[str, Any] | None,
+        defer_commit: bool = False,
+    ):
+        ids = _deferred.get()
+        if ids is None or not pkg_dict:
+            return super().index_package(pkg_dict, defer_commit)  # type: ignore
+
+        ids.add(pkg_dict["id"])
+        return None
+
+
+class _Replacement:
+    """Number of active `installed` blocks and the index replaced by them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.original: Any = None
+
+    def acquire(self):
+        with self.lock:
+            if not self.active:
+                index = search._INDICES["package"]  # noqa: SLF001
+                if not issubclass(index, DeferredIndexMixin):
+                    self.original = index
+                    search._INDICES["package"] = type(  # noqa: SLF001
+                        f"Deferred{index.__name__}",
+                        (DeferredIndexMixin, index),
+                        {},
+                    )
+            self.active += 1
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+            if not self.active and self.original is not None:
+                search._INDICES["package"] = self.original  # noqa: SLF001
+                self.original = None
+
+
+_replacement = _Replacement()
+
+
+@contextlib.contextmanager
+def installed() -> Iterator[None]:
+    """Make package search index aware of deferred indexing inside the block.
+
+    Blocks can be nested or run by multiple threads. Index is replaced when
+    the first block starts and restored when the last block exits.
+
+    """
+    _replacement.acquire()
+    try:
+        yield
+    finally:
+        _replacement.release()
+
+
+@contextlib.contextmanager
+def deferred() -> Iterator[set[str]]:
+    """Collect IDs of packages that must be indexed inside the block."""
+    ids: set[str] = set()
+    with installed():
+        token = _deferred.set(ids)
+        try:
+            yield ids
+        finally:
+            _deferred.reset(token)
+
+
+def is_deferred() -> bool:
+    return _deferred.get() is not None
+
+
+def touch(ids: Iterable[str]):
+    """Add packages indexed outside of the current context(e.g, by worker)."""
+    current = _deferred.get()
+    if current is not None:
+        current.update(ids)
+
+
+def flush(ids: set[str]):
+    """Index collected packages and commit the search index once.
+
+    IDs are removed from the set as soon as packages are indexed.
+
+    """
+    if not ids:
+        return
+
+    context: Any = {"ignore_auth": True, "validate": False, "use_cache": False}
+    token = _deferred.set(None)
+    try:
+        index = search.index_for(model.Package)
+        for id_ in sorted(ids):
+            try:
+                pkg_dict = tk.get_action("package_show")(context.copy(), {"id": id_})
+            except tk.ObjectNotFound:
+                index.delete_package({"id": id_})
+                continue
+
+            index.update_dict(pkg_dict, True)
+
+        index.commit()
+        log.debug("Indexed %s deferred packages", len(ids))
+        ids.clear()
+
+    finally:
+        _deferred.reset(token)
@@ -8,8 +8,13 @@ from . import shared
 class IIngest(Interface):
     """Hook into ckanext-ingest."""
 
-    def get_ingest_strategies(
-        self,
-    ) -> dict[str, type[shared.ExtractionStrategy]]:
-        """Return parsing strategies."""
+    def get_ingest_strategies(self) -> dict[str, shared.StrategyReference]:
+        """Return parsing strategies.
+
+        Strategy can be referred by its import path in `module:Class` form.
+        Such strategy is imported only when it's used for the first time.
+        Reference is imported during the first autodetection of strategy,
+        unless it's returned as `(path, mimetypes)` pair.
+
+        """
         return {}
@@ -0,0 +1,242 @@
+"""Background ingestion.
+
+Source is saved into the storage directory and ingestion is performed by CKAN
+background job. Job reports its progress into JSON file, which is available
+via `ingest_job_status` API action.
+
+Saved source is removed when job is finished or failed. Directory of the job
+with its status is removed when the job is not updated during
+`ckanext.ingest.job_ttl` seconds.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from typing import IO, Any
+
+import ckan.plugins.toolkit as tk
+from ckan import types
+
+from . import config, shared
+
+log = logging.getLogger(__name__)
+
+# progress of the background ingestion that is currently running
+_progress: ContextVar[Progress | None] = ContextVar("ingest_progress", default=None)
+
+
+class Progress:
+    """Status of the background ingestion.
+
+    Status is written into JSON file not more often than once per `interval`
+    seconds. Completion of ingestion is estimated either from `take` option or
+    from the position inside the source file.
+
+    """
+
+    source: IO[bytes] | None = None
+    total: int | None = None
+
+    def __init__(self, job_id: str, interval: float = 1):
+        self.job_id = job_id
+        self.interval = interval
+        self.status = read_status(job_id) or {"id": job_id}
+        self.saved_at = 0.0
+        self.started_at = 0.0
+
+    def start(self, source: IO[bytes], total: int | None = None):
+        self.source = source
+        self.total = total
+        self.started_at = time.time()
+        self.status.update(
+            {
+                "state": "running",
+                "started": datetime.utcnow().isoformat(),
+                "processed": 0,
+                "success": 0,
+                "fail": 0,
+            },
+        )
+        self.save()
+
+    def update(self, success: bool):
+        self.status["processed"] += 1
+        self.status["success" if success else "fail"] += 1
+
+        if time.time() - self.saved_at >= self.interval:
+            self.save()
+
+    def finish(self, result: Any):
+        self.status.update(
+            {
+                "state": "finished",
+                "finished": datetime.utcnow().isoformat(),
+                "result": result,
+                "completion": 1,
+                "eta": 0,
+            },
+        )
+        self.save()
+
+    def error(self, message: str):
+        self.status.update(
+            {
+                "state": "failed",
+                "finished": datetime.utcnow().isoformat(),
+                "error": message,
+            },
+        )
+        self.save()
+
+    def completion(self) -> float | None:
+        """Part of the source that is already processed."""
+        if self.total:
+            return min(self.status["processed"] / self.total, 1)
+
+        if not self.source:
+            return None
+
+        try:
+            position = self.source.tell()
+            size = os.fstat(self.source.fileno()).st_size
+        except (OSError, ValueError):
+            return None
+
+        return min(position / size, 1) if size else None
+
+    def save(self):
+        self.saved_at = time.time()
+
+        if not self.started_at:
+            write_status(self.job_id, self.status)
+            return
+
+        elapsed = self.saved_at - self.started_at
+        self.status["rate"] = self.status["processed"] / elapsed if elapsed else 0
+
+        if self.status["state"] == "running":
+            completion = self.completion()
+            self.status["completion"] = completion
+            self.status["eta"] = (
+                elapsed * (1 - completion) / completion if completion else None
+            )
+
+        write_status(self.job_id, self.status)
+
+
+def current_progress() -> Progress | None:
+    """Progress of the background ingestion running in current context."""
+    return _progress.get()
+
+
+def jobs_root() -> str:
+    return os.path.join(config.storage_path(), "jobs")
+
+
+def job_path(job_id: str, *parts: str) -> str:
+    return os.path.join(jobs_root(), job_id, *parts)
+
+
+def read_status(job_id: str) -> dict[str, Any] | None:
+    try:
+        with open(job_path(job_id, "status.json")) as src:
+            return json.load(src)
+    except FileNotFoundError:
+        return None
+
+
+def write_status(job_id: str, status: dict[str, Any]):
+    path = job_path(job_id, "status.json")
+    with open(path + ".tmp", "w") as dest:
+        json.dump(status, dest)
+    os.replace(path + ".tmp", path)
+
+
+def enqueue(context: types.Context, data_dict: dict[str, Any]) -> dict[str, Any]:
+    """Save the source and schedule its ingestion.
+
+    Returns initial status of the job.
+
+    """
+    expired = shared.remove_expired(jobs_root(), config.job_ttl())
+    if expired:
+        log.debug("Remove expired ingestion jobs: %s", expired)
+
+    job_id = str(uuid.uuid4())
+    os.makedirs(job_path(job_id))
+
+    source: shared.Storage = data_dict["source"]
+    with open(job_path(job_id, "source"), "wb") as dest:
+        shutil.copyfileobj(source.stream, dest)
+
+    payload = {k: v for k, v in data_dict.items() if k not in {"source", "background"}}
+    payload["source_name"] = source.filename
+    payload["source_mimetype"] = source.mimetype
+
+    status = {
+        "id": job_id,
+        "state": "queued",
+        "created": datetime.utcnow().isoformat(),
+        "source": source.filename,
+        "user": context.get("user"),
+    }
+    write_status(job_id, status)
+
+    tk.enqueue_job(
+        run,
+        [job_id, payload, context.get("user"), context.get("ignore_auth", False)],
+        title=f"Ingest {source.filename or job_id}",
+        rq_kwargs={"job_id": job_id},
+    )
+    return status
+
+
+def run(
+    job_id: str,
+    payload: dict[str, Any],
+    user: str,
+    ignore_auth: bool = False,
+):
+    """Ingest the source saved by `enqueue`.
+
+    Action is called on behalf of the `user` who created the job. When job
+    was created with `ignore_auth` flag, authorization is skipped inside the
+    job as well.
+
+    """
+    progress = Progress(job_id)
+    data_dict = dict(payload)
+    name = data_dict.pop("source_name", None)
+    mimetype = data_dict.pop("source_mimetype", None)
+
+    try:
+        with open(job_path(job_id, "source"), "rb") as src:
+            data_dict["source"] = shared.make_storage(src, name, mimetype)
+            progress.start(src, data_dict.get("take"))
+
+            token = _progress.set(progress)
+            try:
+                result = tk.get_action("ingest_import_records")(
+                    {"user": user, "ignore_auth": ignore_auth},
+                    data_dict,
+                )
+            except Exception as e:
+                log.exception("Background ingestion %s failed", job_id)
+                progress.error(str(e))
+                raise
+            finally:
+                _progress.reset(token)
+
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(job_path(job_id, "source"))
+
+    progress.finish(result)
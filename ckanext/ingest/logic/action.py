@@ -1,16 +1,28 @@
 from __future__ import annotations
 
+import contextlib
 import itertools
 import logging
 import mimetypes
+from collections import deque
 from typing import Any, Iterable
 
+from sqlalchemy.exc import SQLAlchemyError
+
 import ckan.plugins.toolkit as tk
-from ckan import types
+from ckan import model, types
 from ckan.logic import validate
 
-from ckanext.ingest import shared
-from ckanext.ingest.artifact import make_artifacts
+from ckanext.ingest import (
+    checkpoint,
+    config,
+    indexing,
+    job,
+    pipeline,
+    profiling,
+    shared,
+)
+from ckanext.ingest.artifact import make_artifacts, project, read_report
 
 from . import schema
 
@@ -44,14 +56,15 @@ def ingest_extract_records(
 
     """
     tk.check_access("ingest_extract_records", context, data_dict)
-    records = iter_records(data_dict)
+    parser = _get_strategy(data_dict)
 
     start = data_dict["skip"]
     stop = data_dict.get("take")
     if stop is not None:
         stop += start
 
-    return [r.data for r in itertools.islice(records, start, stop)]
+    records = _extract(parser, data_dict, start, stop)
+    return [r.data for r in _transform(records, config.prefetch_window())]
 
 
 @validate(schema.import_records)
@@ -79,46 +92,422 @@ def ingest_import_records(context: types.Context, data_dict: dict[str, Any]):
         skip: int - number of records that are skipped without ingestion
 
         take: int - max number of records that will be ingested
+
+        workers: int - number of workers ingesting records concurrently. By
+        default, records are ingested one by one
+
+        workers_backend: str - `thread`(default) or `process` pool of
+        workers. Processes are forked, so they are available only when the
+        current process is single-threaded, e.g. in CLI commands and
+        background jobs
+
+        background: bool - save the source and ingest it using CKAN background
+        job. Status of the job is returned immediately and its progress can be
+        checked via `ingest_job_status`. Saved source is removed when job is
+        finished, and status is kept for `ckanext.ingest.job_ttl` seconds
+
+        checkpoint: int - save checkpoint every N ingested records. Default: 0,
+        checkpoints are not saved
+
+        resume: bool - continue ingestion from the last checkpoint of the same
+        source ingested with the same parameters. Strategies that support it
+        jump straight to the position of the checkpoint, others skip already
+        processed records. `stats`, `tmp` and `stream` reports are restored as
+        well, while `details` report includes only records after the
+        checkpoint
+
+        defer_index: bool - do not index packages one by one. Instead, collect
+        their IDs and index them in bulk, committing search index once per
+        batch
+
+        index_batch_size: int - number of packages in the batch of deferred
+        indexing. Default: `ckanext.ingest.index_batch_size`
+
+        batch: bool - ingest records inside a single transaction, which is
+        committed every `batch_size` records. Every record is ingested inside
+        a savepoint, so failed record rolls back only its own changes. Not
+        available for workers. If ingestion is interrupted, uncommitted
+        records are rolled back and checkpoint is saved only after commit.
+        Records are reported only after commit. If commit fails, records of
+        the transaction are reported as failed
+
+        batch_size: int - number of records in the transaction of batched
+        ingestion. Default: `ckanext.ingest.batch_size`
+
+        skip_unchanged: bool - do not ingest records that update existing
+        entities, if their data did not change since the previous ingestion.
+        Such records are reported as `unchanged`. Requires the table created
+        by `ckan db upgrade -p ingest`
+
+        report: str - `stats`(default) counts records, `details` returns the
+        result of every record, `tmp` writes results into a temporary JSONL
+        file, `stream` writes results into a compressed JSONL report of
+        limited size, that can be read via `ingest_report_show`
+
+        report_fields: list[str] - keep only listed fields(e.g, `id`, `name`,
+        `action`) of the created entity in the report. Failed records keep
+        listed fields of their transformed data under the `data` key, or of
+        the source row under the `source` key, if record was not transformed
+
+        timing: bool - measure time of extraction, transformation and
+        ingestion. Report contains time of stages for every record, while
+        `stats`, `tmp` and `stream` reports include wall and CPU time
+        histograms of every stage and the slowest records under the `timing`
+        key. Stages inside process workers are not measured
     """
 
     tk.check_access("ingest_import_records", context, data_dict)
 
-    start = data_dict["skip"]
-    stop = data_dict.get("take")
-    if stop is not None:
-        stop += start
+    if data_dict["background"]:
+        return job.enqueue(context, data_dict)
 
-    artifacts = make_artifacts(data_dict["report"])
-    records = iter_records(data_dict)
+    _validate_workers(data_dict)
 
-    for record in itertools.islice(records, start, stop):
-        record.fill(data_dict["defaults"], data_dict["overrides"])
+    parser = _get_strategy(data_dict)
+    ingestion = _Ingestion(parser, data_dict, context.get("user"))
+    start, stop = ingestion.resume()
+
+    records = profiling.timed(_extract(parser, data_dict, start, stop), "extract")
+    if ingestion.key:
+        records = _track(records, parser, ingestion.positions)
+
+    records = _transform(records, config.prefetch_window())
+    outcomes = pipeline.ingest(
+        _fill(records, data_dict),
+        context,
+        data_dict["workers"],
+        data_dict["workers_backend"],
+        savepoints=data_dict["batch"],
+        skip_unchanged=data_dict["skip_unchanged"],
+    )
+
+    index_queue = (
+        indexing.deferred()
+        if data_dict["defer_index"]
+        else contextlib.nullcontext(None)
+    )
+    timing = (
+        profiling.profile() if data_dict["timing"] else contextlib.nullcontext(None)
+    )
+
+    with index_queue as touched, timing as profile:
+        ingestion.run(outcomes, touched, profile)
+
+    return ingestion.finish()
+
+
+@tk.side_effect_free
+@validate(schema.job_status)
+def ingest_job_status(
+    context: types.Context,
+    data_dict: dict[str, Any],
+) -> dict[str, Any]:
+    """Show the status of background ingestion.
+
+    Status contains state of the job(`queued`, `running`, `finished` or
+    `failed`), number of `processed` records, `success` and `fail` counters,
+    `rate` of ingestion(records per second), estimated `completion`(from 0 to
+    1) and `eta`(seconds). When job is finished, status contains the `result`
+    of ingestion. Only the `user` who created the job and sysadmins can check
+    its status.
+
+    Args:
+
+        id: str - ID of the job, returned by `ingest_import_records` called
+        with `background` flag
+    """
+    tk.check_access("ingest_job_status", context, data_dict)
+
+    status = job.read_status(data_dict["id"])
+    if status is None:
+        raise tk.ObjectNotFound(tk._("Ingestion job not found"))
+
+    return status
+
+
+@tk.side_effect_free
+@validate(schema.report_show)
+def ingest_report_show(
+    context: types.Context,
+    data_dict: dict[str, Any],
+) -> dict[str, Any]:
+    """Show a page of the report produced by ingestion with `stream` report.
+
+    Result contains total `count` of records in the report, `truncated` flag
+    which is set when report reached its size limit, and `results` of
+    records from the requested page. Report is read sequentially, so pages with
+    big `offset` take more time. Only the `user` who produced the report and
+    sysadmins can read it.
+
+    Args:
+
+        id: str - `report_id` returned by `ingest_import_records`
+
+        offset: int - number of records to skip. Default: 0
+
+        limit: int - max number of records on the page. Default: 100
+    """
+    tk.check_access("ingest_report_show", context, data_dict)
+
+    report = read_report(data_dict["id"], data_dict["offset"], data_dict["limit"])
+    if report is None:
+        raise tk.ObjectNotFound(tk._("Report not found"))
+
+    return report
+
+
+def _validate_workers(data_dict: dict[str, Any]):
+    """Check if workers can be used for ingestion."""
+    if not data_dict["workers"]:
+        return
+
+    if data_dict["batch"]:
+        raise tk.ValidationError(
+            {"batch": [tk._("Batched transactions require serial ingestion")]},
+        )
+
+    if data_dict["workers_backend"] == "process" and not shared.can_fork():
+        raise tk.ValidationError(
+            {
+                "workers_backend": [
+                    tk._(
+                        "Process workers are available only in CLI"
+                        " commands and background jobs",
+                    ),
+                ],
+            },
+        )
 
-        try:
-            result = record.ingest(tk.fresh_context(context))
-            log.debug("Record ingestion: %s", result)
-
-        except tk.ValidationError as e:
-            log.debug("Validation error: %s. Record: %s", e.error_dict, record)
-            artifacts.fail({"error": e.error_dict, "source": record.raw})
-
-        except tk.ObjectNotFound as e:
-            log.debug("Object not found: %s. Record: %s", e, record)
-            artifacts.fail(
-                {
-                    "error": e.message or "Not found",
-                    "source": record.raw,
-                },
-            )
 
+class _Ingestion:
+    """Reporting, batched transactions and checkpoints of the ingestion.
+
+    Outcomes of records are added to artifacts and to the progress of the
+    background job. In batched mode, outcomes are kept until transaction is
+    committed. Checkpoint is saved only when all ingested records are
+    reported, so that resumed ingestion never skips uncommitted records.
+
+    """
+
+    def __init__(
+        self,
+        parser: shared.ExtractionStrategy,
+        data_dict: dict[str, Any],
+        user: str | None,
+    ):
+        self.parser = parser
+        self.data_dict = data_dict
+        self.artifacts = make_artifacts(data_dict["report"], user)
+        self.progress = job.current_progress()
+        self.fields: list[str] | None = data_dict.get("report_fields")
+        self.batch: bool = data_dict["batch"]
+        self.processed = 0
+
+        # outcomes of records in the current transaction
+        self.pending: list[tuple[shared.Record, bool, dict[str, Any]]] = []
+
+        # positions of the strategy after extracted records
+        self.positions: deque[Any] = deque()
+        self.position = None
+        # checkpoint is reached, but it's not saved until records are reported
+        self.due = False
+
+        self.key = None
+        if data_dict["checkpoint"] or data_dict["resume"]:
+            self.key = checkpoint.fingerprint(data_dict["source"], parser, data_dict)
+            if not self.key:
+                log.warning("Checkpoints are not available for non-seekable source")
+
+    def resume(self) -> tuple[int, int | None]:
+        """Restore the saved checkpoint and compute the range of records."""
+        start = self.data_dict["skip"]
+        saved = self.key and self.data_dict["resume"] and checkpoint.load(self.key)
+        if saved:
+            log.info("Resume ingestion after %s records", saved["processed"])
+            self.processed = saved["processed"]
+            self.artifacts.restore(saved["artifacts"])
+
+            if saved["position"] is None:
+                start += self.processed
+            else:
+                self.parser.seek(saved["position"])
+                start = 0
+
+        stop = self.data_dict.get("take")
+        if stop is not None:
+            stop = max(stop - self.processed, 0) + start
+
+        return start, stop
+
+    def run(
+        self,
+        outcomes: Iterable[tuple[shared.Record, pipeline.Outcome]],
+        touched: set[str] | None,
+        profile: profiling.Profile | None,
+    ):
+        """Report outcomes of records and flush deferred search index."""
+        try:
+            for record, (success, data) in outcomes:
+                timing = {"timing": profile.finish(record)} if profile else {}
+                self.add(record, success, dict(data, **timing))
+                if not self.pending:
+                    self.settle(touched)
+
+            if self.batch:
+                self.commit()
+
+            if profile:
+                self.artifacts.timing(profile.summary())
+
+        except Exception:
+            if self.batch:
+                model.Session.rollback()
+            raise
+
+        finally:
+            if touched:
+                indexing.flush(touched)
+
+    def add(self, record: shared.Record, success: bool, data: dict[str, Any]):
+        """Register outcome of the record."""
+        self.processed += 1
+        if self.key:
+            self.position = self.positions.popleft()
+            interval = self.data_dict["checkpoint"]
+            self.due = self.due or bool(interval and not self.processed % interval)
+
+        if not self.batch:
+            self.report(record, success, data)
+            return
+
+        self.pending.append((record, success, data))
+        if len(self.pending) >= self.data_dict["batch_size"]:
+            self.commit()
+
+    def report(self, record: shared.Record, success: bool, data: dict[str, Any]):
+        """Add outcome of the record to artifacts and to the job progress."""
+        if self.progress:
+            self.progress.update(success)
+
+        if self.fields:
+            data = project(data, self.fields, record.transformed)
+
+        if data.get("unchanged"):
+            self.artifacts.unchanged(data)
+        elif success:
+            self.artifacts.success(data)
         else:
-            artifacts.success({"result": result})
+            self.artifacts.fail(data)
 
-    return artifacts.collect()
+    def commit(self):
+        """Commit the transaction and report outcomes of its records.
 
+        If commit fails, changes of all the records are rolled back, and
+        records that changed something are reported as failed.
 
-def iter_records(data_dict: dict[str, Any]) -> Iterable[shared.Record]:
-    """Produce iterable over all extracted records.
+        """
+        try:
+            model.Session.commit()
+
+        except SQLAlchemyError as e:
+            log.exception("Cannot commit %s records", len(self.pending))
+            model.Session.rollback()
+
+            for idx, (record, success, data) in enumerate(self.pending):
+                if success and not data.get("unchanged"):
+                    failed = {"error": str(e), "source": record.raw}
+                    if "timing" in data:
+                        failed["timing"] = data["timing"]
+                    self.pending[idx] = (record, False, failed)
+
+        for record, success, data in self.pending:
+            self.report(record, success, data)
+
+        self.pending.clear()
+
+    def settle(self, touched: set[str] | None):
+        """Index reported records and save the checkpoint, if it's due."""
+        # records before the checkpoint must be searchable
+        limit = self.data_dict["index_batch_size"]
+        if touched and (self.due or len(touched) >= limit):
+            indexing.flush(touched)
+
+        if self.due and self.key:
+            state = self.artifacts.state()
+            checkpoint.save(self.key, self.processed, self.position, state)
+            self.due = False
+
+    def finish(self) -> Any:
+        """Drop the checkpoint of completed ingestion and collect artifacts."""
+        if self.key:
+            checkpoint.remove(self.key)
+
+        return self.artifacts.collect()
+
+
+def _transform(
+    records: Iterable[shared.Record],
+    size: int,
+) -> Iterable[shared.Record]:
+    """Transform every window of `size` records via `Record.transform_batch`."""
+    if size < 1:
+        yield from records
+        return
+
+    iterator = iter(records)
+    while window := list(itertools.islice(iterator, size)):
+        shared.transform_batch(window)
+        yield from window
+
+
+def _fill(
+    records: Iterable[shared.Record],
+    data_dict: dict[str, Any],
+) -> Iterable[shared.Record]:
+    """Apply defaults and overrides to records."""
+    for record in records:
+        record.fill(data_dict["defaults"], data_dict["overrides"])
+        yield record
+
+
+def _extract(
+    parser: shared.ExtractionStrategy,
+    data_dict: dict[str, Any],
+    start: int,
+    stop: int | None,
+) -> Iterable[shared.Record]:
+    """Extract records from `start` to `stop`.
+
+    If strategy can locate records, extraction begins from the closest
+    located record, otherwise all records before `start` are extracted and
+    dropped.
+
+    """
+    source: shared.Storage = data_dict["source"]
+
+    if start and (located := parser.locate(source, data_dict["options"], start)):
+        number, position = located
+        parser.seek(position)
+        start -= number
+        if stop is not None:
+            stop -= number
+
+    return itertools.islice(parser.extract(source, data_dict["options"]), start, stop)
+
+
+def _track(
+    records: Iterable[shared.Record],
+    parser: shared.ExtractionStrategy,
+    positions: deque[Any],
+) -> Iterable[shared.Record]:
+    """Remember position of the strategy after every extracted record."""
+    for record in records:
+        positions.append(parser.tell())
+        yield record
+
+
+def _get_strategy(data_dict: dict[str, Any]) -> shared.ExtractionStrategy:
+    """Initialize extraction strategy for the source.
 
     When `strategy` is present in `data_dict`, it explicitly defines extraction
     strategy. If `strategy` is missing, the most suitable strategy is chosen
@@ -128,22 +517,32 @@ def iter_records(data_dict: dict[str, Any]) -> Iterable[shared.Record]:
     source: shared.Storage = data_dict["source"]
 
     if "strategy" in data_dict:
-        parser = shared.strategies[data_dict["strategy"]]()
+        return shared.strategies[data_dict["strategy"]]()
+
+    mime = None
+
+    if source.filename:
+        mime, _encoding = mimetypes.guess_type(source.filename)
 
-    else:
-        mime = None
+    if not mime:
+        mime = source.content_type
 
-        if source.filename:
-            mime, _encoding = mimetypes.guess_type(source.filename)
+    parser = shared.get_handler_for_mimetype(mime, source)
 
-        if not mime:
-            mime = data_dict["source"].content_type
+    if not parser:
+        raise tk.ValidationError(
+            {"source": [tk._("Unsupported MIMEType {mime}").format(mime=mime)]},
+        )
 
-        parser = shared.get_handler_for_mimetype(mime, data_dict["source"])
+    return parser
 
-        if not parser:
-            raise tk.ValidationError(
-                {"source": [tk._("Unsupported MIMEType {mime}").format(mime=mime)]},
-            )
 
+def iter_records(data_dict: dict[str, Any]) -> Iterable[shared.Record]:
+    """Produce iterable over all extracted records.
+
+    Strategy is either defined by `strategy` from `data_dict` or guessed from
+    `source`'s mimetype.
+
+    """
+    parser = _get_strategy(data_dict)
     return parser.extract(data_dict["source"], data_dict["options"])
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import uuid
 from typing import Any
 
+import ckan.plugins.toolkit as tk
 from ckan import authz, types
 
+from ckanext.ingest import artifact, job
+
 
 def ingest_use_ingest(context: types.Context, data_dict: dict[str, Any]):
     return authz.is_authorized("package_create", context, data_dict)
@@ -17,5 +21,45 @@ def ingest_extract_records(context: types.Context, data_dict: dict[str, Any]):
     return authz.is_authorized("ingest_use_ingest", context, data_dict)
 
 
+def ingest_job_status(context: types.Context, data_dict: dict[str, Any]):
+    result = authz.is_authorized("ingest_use_ingest", context, data_dict)
+    if not result["success"]:
+        return result
+
+    job_id = _uuid(data_dict.get("id"))
+    status = job.read_status(job_id) if job_id else None
+    if status and status.get("user") != context.get("user"):
+        return {
+            "success": False,
+            "msg": tk._("Only creator of the job can check its status"),
+        }
+
+    return result
+
+
+def ingest_report_show(context: types.Context, data_dict: dict[str, Any]):
+    result = authz.is_authorized("ingest_use_ingest", context, data_dict)
+    if not result["success"]:
+        return result
+
+    report_id = _uuid(data_dict.get("id"))
+    summary = artifact.read_summary(report_id) if report_id else None
+    if summary and summary.get("user") != context.get("user"):
+        return {
+            "success": False,
+            "msg": tk._("Only creator of the report can read it"),
+        }
+
+    return result
+
+
 def ingest_web_ui(context: types.Context, data_dict: dict[str, Any]):
     return authz.is_authorized("sysadmin", context, data_dict)
+
+
+def _uuid(value: Any) -> str | None:
+    """Normalized UUID, or `None` if value is not a valid UUID."""
+    try:
+        return str(uuid.UUID(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import cgi
 import mimetypes
+import uuid
 from io import BytesIO
 from typing import Any
 
@@ -11,7 +12,7 @@ import ckan.plugins.toolkit as tk
 from ckan import types
 from ckan.logic.schema import validator_args
 
-from ckanext.ingest import artifact, shared
+from ckanext.ingest import artifact, config, pipeline, shared
 
 
 def into_uploaded_file(value: Any):
@@ -72,14 +73,78 @@ def import_records(
     convert_to_json_if_string: types.Validator,
     dict_only: types.Validator,
     one_of: types.ValidatorFactory,
+    natural_number_validator: types.Validator,
+    boolean_validator: types.Validator,
+    is_positive_integer: types.Validator,
+    ignore_missing: types.Validator,
+    convert_to_list_if_string: types.Validator,
+    list_of_strings: types.Validator,
 ) -> types.Schema:
     schema = extract_records()
     schema.update(
         {
             "report": [default("stats"), one_of([t.name for t in artifact.Type])],
+            "report_fields": [
+                ignore_missing,
+                convert_to_list_if_string,
+                list_of_strings,
+            ],
             "defaults": [default("{}"), convert_to_json_if_string, dict_only],
             "overrides": [default("{}"), convert_to_json_if_string, dict_only],
+            "workers": [default(0), natural_number_validator],
+            "workers_backend": [default("thread"), one_of(pipeline.BACKENDS)],
+            "background": [default(False), boolean_validator],
+            "checkpoint": [default(0), natural_number_validator],
+            "resume": [default(False), boolean_validator],
+            "defer_index": [default(False), boolean_validator],
+            "index_batch_size": [
+                default(config.index_batch_size()),
+                natural_number_validator,
+            ],
+            "batch": [default(False), boolean_validator],
+            "batch_size": [default(config.batch_size()), is_positive_integer],
+            "skip_unchanged": [default(False), boolean_validator],
+            "timing": [default(False), boolean_validator],
         },
     )
 
     return schema
+
+
+def _job_id(value: Any):
+    """Accept only job IDs produced by `ingest_import_records`."""
+    try:
+        return str(uuid.UUID(value))
+    except (TypeError, ValueError, AttributeError) as e:
+        raise tk.Invalid(tk._("Invalid job ID")) from e
+
+
+@validator_args
+def job_status(
+    not_empty: types.Validator,
+    unicode_safe: types.Validator,
+) -> types.Schema:
+    return {"id": [not_empty, unicode_safe, _job_id]}
+
+
+def _report_id(value: Any):
+    """Accept only report IDs produced by `ingest_import_records`."""
+    try:
+        return str(uuid.UUID(value))
+    except (TypeError, ValueError, AttributeError) as e:
+        raise tk.Invalid(tk._("Invalid report ID")) from e
+
+
+@validator_args
+def report_show(
+    not_empty: types.Validator,
+    unicode_safe: types.Validator,
+    default: types.ValidatorFactory,
+    natural_number_validator: types.Validator,
+    is_positive_integer: types.Validator,
+) -> types.Schema:
+    return {
+        "id": [not_empty, unicode_safe, _report_id],
+        "offset": [default(0), natural_number_validator],
+        "limit": [default(100), is_positive_integer],
+    }
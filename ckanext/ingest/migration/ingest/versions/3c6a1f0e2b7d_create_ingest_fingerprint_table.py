@@ -0,0 +1,28 @@
+"""create ingest_fingerprint table
+
+Revision ID: 3c6a1f0e2b7d
+Revises:
+Create Date: 2026-10-18 10:12:31.418203
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3c6a1f0e2b7d"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ingest_fingerprint",
+        sa.Column("key", sa.UnicodeText, primary_key=True),
+        sa.Column("digest", sa.UnicodeText, nullable=False),
+        sa.Column("modified_at", sa.DateTime, nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("ingest_fingerprint")
@@ -0,0 +1,142 @@
+"""Extraction of independent parts of the source in parallel.
+
+Strategies that split the source into independent units(sheets of workbook,
+members of archive) can parse every unit in a separate process. Source is
+copied into a named temporary file, so that every process opens it
+independently, and records of every unit are sent back to the caller, which
+merges them into a single stream.
+
+Number of units that are submitted but not yet consumed is limited, so memory
+usage depends on the size of units rather than the size of the source.
+
+Workers are forked, which is not safe in multi-threaded process, like web
+server with request threads. In such process, sources are extracted
+sequentially, even if `processes` extra is set.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import IO, Any, Callable, Iterable, Iterator, TypeVar
+
+from . import shared
+
+T = TypeVar("T")
+
+log = logging.getLogger(__name__)
+
+# strategy options that cannot be sent to a worker process
+_local_options = ["locator"]
+
+
+@contextlib.contextmanager
+def materialize(stream: IO[bytes]) -> Iterator[str]:
+    """Copy the rest of the stream into named temporary file.
+
+    Yields the path to the file. File is removed when block is finished.
+
+    """
+    with tempfile.NamedTemporaryFile() as dest:
+        shutil.copyfileobj(stream, dest)
+        dest.flush()
+        yield dest.name
+
+
+def portable(options: shared.StrategyOptions) -> shared.StrategyOptions:
+    """Copy of options that can be sent to a worker process.
+
+    Callables, like `locator`, are removed. Workers extract units
+    sequentially, so `processes` extra is removed as well.
+
+    """
+    result: Any = {k: v for k, v in options.items() if k not in _local_options}
+    return shared.with_extras(result, {"processes": 0}, patch=True)
+
+
+def pool_size(options: shared.StrategyOptions) -> int:
+    """Number of worker processes requested by `processes` extra.
+
+    Number is limited by the number of CPUs. `0` means that the source must
+    be extracted sequentially, either because parallel extraction is not
+    requested, or because workers cannot be forked from the current process.
+
+    """
+    value: Any = shared.get_extra(options, "processes", 0)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        msg = f"processes must be a non-negative integer: {value!r}"
+        raise ValueError(msg)
+
+    if not value:
+        return 0
+
+    if not shared.can_fork():
+        log.warning("Processes cannot be forked, source is extracted sequentially")
+        return 0
+
+    return min(value, os.cpu_count() or 1)
+
+
+def extract(
+    units: Iterable[T],
+    worker: Callable[[T], list[shared.Record]],
+    processes: int,
+    ordered: bool = False,
+    inflight: int = 0,
+) -> Iterator[shared.Record]:
+    """Extract records from every unit using a pool of processes.
+
+    `worker` receives a unit and returns all records extracted from it. Both
+    worker and units must be picklable. When `ordered` is set, records are
+    produced in order of units. Otherwise, records of the unit are produced
+    as soon as the unit is processed. At most `inflight`(default: double
+    number of processes) units are processed or kept in memory at once.
+
+    """
+    if not shared.can_fork():
+        msg = "Processes cannot be forked from multi-threaded process"
+        raise ValueError(msg)
+
+    limit = inflight or processes * 2
+
+    # workers rely on registered strategies and configuration of the current
+    # process, so they must be forked
+    ctx = multiprocessing.get_context("fork")
+
+    with ProcessPoolExecutor(processes, ctx) as executor:
+        pending: deque[Future[list[shared.Record]]] = deque()
+
+        try:
+            for unit in units:
+                pending.append(executor.submit(worker, unit))
+                if len(pending) >= limit:
+                    yield from _collect(pending, ordered)
+
+            while pending:
+                yield from _collect(pending, ordered)
+
+        finally:
+            # consumer stopped early, e.g. because of `take`
+            for future in pending:
+                future.cancel()
+
+
+def _collect(
+    pending: deque[Future[list[shared.Record]]],
+    ordered: bool,
+) -> Iterator[shared.Record]:
+    """Produce records of the first unit, or of all finished units."""
+    if ordered:
+        yield from pending.popleft().result()
+        return
+
+    done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+    for future in [f for f in pending if f in done]:
+        pending.remove(future)
+        yield from future.result()
@@ -0,0 +1,488 @@
+"""Ingestion of extracted records.
+
+Records are ingested either one by one, in the current thread, or using a pool
+of workers. In the latter case, records with the same `Record.affinity` are
+always sent to the same worker, so that they are ingested in the order of
+extraction. When search indexing is deferred, workers report IDs of packages
+that must be indexed back to the caller.
+
+"""
+from __future__ import annotations
+
+import contextvars
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import Any, Iterable, Iterator, Tuple, Union
+
+import flask
+from typing_extensions import TypeAlias
+
+import ckan.plugins.toolkit as tk
+from ckan import model, types
+
+from . import config, indexing, profiling, shared
+from .db import Fingerprint, digest
+
+log = logging.getLogger(__name__)
+
+# success flag and data for artifacts
+Outcome: TypeAlias = Tuple[bool, "dict[str, Any]"]
+
+# outcome of the record and IDs of packages with deferred indexing
+WorkerOutcome: TypeAlias = Tuple[Outcome, "list[str]"]
+
+# outcome of the record that is not received from the worker yet
+PendingOutcome: TypeAlias = Union["Future[WorkerOutcome]", "PendingResult"]
+
+BACKENDS = ["thread", "process"]
+
+# context members that can be sent to a worker process
+_portable_context = ["user", "ignore_auth", "defer_commit"]
+
+# state of the current thread worker, initialized by the executor
+_worker = threading.local()
+
+
+def ingest_record(
+    record: shared.Record,
+    context: types.Context,
+    skip_unchanged: bool = False,
+) -> Outcome:
+    """Ingest the record and turn the result into data for artifacts.
+
+    When `skip_unchanged` is set, record is not ingested if its data did not
+    change since the last ingestion of the same entity. Outcome of such
+    record has `unchanged` flag.
+
+    """
+    fingerprint = None
+    if skip_unchanged:
+        fingerprint = digest(record.data)
+        key = record.fingerprint_key()
+        stored = record.stored_digest
+        if key and stored is None:
+            stored = Fingerprint.lookup(key)
+
+        if key and stored == fingerprint:
+            log.debug("Record is not changed: %s", key)
+            return True, {"unchanged": True, "key": key}
+
+    try:
+        with profiling.measure("ingest", record):
+            result = record.ingest(context)
+        log.debug("Record ingestion: %s", result)
+
+    except tk.ValidationError as e:
+        log.debug("Validation error: %s. Record: %s", e.error_dict, record)
+        return False, {"error": e.error_dict, "source": record.raw}
+
+    except tk.ObjectNotFound as e:
+        log.debug("Object not found: %s. Record: %s", e, record)
+        return False, {
+            "error": e.message or "Not found",
+            "source": record.raw,
+        }
+
+    # entity created by the record gets its key only after ingestion
+    if fingerprint and (key := record.fingerprint_key()):
+        Fingerprint.store(key, fingerprint, context.get("defer_commit", False))
+
+    return True, {"result": result}
+
+
+def ingest_in_savepoint(
+    record: shared.Record,
+    context: types.Context,
+    skip_unchanged: bool = False,
+) -> Outcome:
+    """Ingest the record without committing the current transaction.
+
+    Changes of the failed record are rolled back to the savepoint. Actions
+    that commit unconditionally(e.g, `resource_create`) release the
+    savepoint, but still do not commit the outer transaction.
+
+    """
+    context = tk.fresh_context(context)
+    context["defer_commit"] = True
+    savepoint = model.Session.begin_nested()
+
+    try:
+        success, data = ingest_record(record, context, skip_unchanged)
+    except Exception:
+        if savepoint.is_active:
+            savepoint.rollback()
+        raise
+
+    if savepoint.is_active:
+        if success:
+            savepoint.commit()
+        else:
+            savepoint.rollback()
+
+    return success, data
+
+
+def ingest(
+    records: Iterable[shared.Record],
+    context: types.Context,
+    workers: int = 0,
+    backend: str = "thread",
+    savepoints: bool = False,
+    skip_unchanged: bool = False,
+) -> Iterator[tuple[shared.Record, Outcome]]:
+    """Ingest records and produce outcome of every record.
+
+    Outcomes are produced in the order of records. When `workers` is zero,
+    records are ingested in the current thread. In this case, `savepoints`
+    flag makes every record to run inside a savepoint of the current
+    transaction, leaving the commit to the caller. `skip_unchanged` is
+    passed to `ingest_record`.
+
+    """
+    window = config.prefetch_window()
+
+    if not workers:
+        for record in prefetch(records, window, skip_unchanged):
+            if savepoints:
+                yield record, ingest_in_savepoint(record, context, skip_unchanged)
+            else:
+                yield record, ingest_record(
+                    record,
+                    tk.fresh_context(context),
+                    skip_unchanged,
+                )
+        return
+
+    if savepoints:
+        msg = "Savepoints are not supported by workers"
+        raise ValueError(msg)
+
+    pool = Pool(workers, backend, skip_unchanged)
+    try:
+        yield from pool.map(records, context, indexing.is_deferred(), window)
+    finally:
+        pool.shutdown()
+
+
+def prefetch(
+    records: Iterable[shared.Record],
+    size: int,
+    digests: bool = False,
+) -> Iterator[shared.Record]:
+    """Call `Record.prefetch` for every window of records."""
+    for window in windows(records, size, digests):
+        yield from window
+
+
+def windows(
+    records: Iterable[shared.Record],
+    size: int,
+    digests: bool = False,
+) -> Iterator[Iterable[shared.Record]]:
+    """Split records into prefetched windows of `size` records.
+
+    Records inside the window are grouped by class, and every group is
+    prefetched using a single call. When `digests` flag is set, digests
+    stored by previous ingestion are loaded for the whole window using a
+    single query as well. Window is prefetched only when the next window is
+    requested, so the caller decides when details are loaded. When `size` is
+    less than 1, all the records form a single window that is not
+    prefetched.
+
+    """
+    if size < 1:
+        yield records
+        return
+
+    iterator = iter(records)
+    while window := list(itertools.islice(iterator, size)):
+        groups: dict[type[shared.Record], list[shared.Record]] = {}
+        for record in window:
+            groups.setdefault(type(record), []).append(record)
+
+        for cls, group in groups.items():
+            cls.prefetch(group)
+
+        if digests:
+            prefetch_digests(window)
+
+        yield window
+
+
+def prefetch_digests(records: list[shared.Record]):
+    """Load digests of entities updated by records, using a single query.
+
+    Entity, updated by multiple records from the window, can be changed by
+    the first of them, so its digest is loaded right before ingestion of
+    every record.
+
+    """
+    keys = [record.fingerprint_key() for record in records]
+    counts = Counter(keys)
+    unique = [key for key in counts if key and counts[key] == 1]
+    if not unique:
+        return
+
+    stored = Fingerprint.lookup_many(unique)
+    for record, key in zip(records, keys):
+        if key and counts[key] == 1:
+            record.stored_digest = stored.get(key, "")
+
+
+class Pool:
+    """Set of single-worker executors or worker processes.
+
+    Every worker processes records sequentially, so records with the same
+    affinity never race each other. Number of records submitted but not yet
+    reported is limited, so that the pool does not consume the whole source
+    in advance.
+
+    Process workers are forked all at once, when the pool is created, before
+    queues used for communication start their feeder threads.
+
+    """
+
+    executors: list[ThreadPoolExecutor]
+    processes: list[ProcessWorker]
+
+    def __init__(
+        self,
+        size: int,
+        backend: str = "thread",
+        skip_unchanged: bool = False,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(backend)
+
+        if backend == "process" and not shared.can_fork():
+            msg = "Process workers cannot be forked from multi-threaded process"
+            raise ValueError(msg)
+
+        self.size = size
+        self.backend = backend
+        self.skip_unchanged = skip_unchanged
+        self.limit = size * 2
+
+        app = None
+        if flask.has_app_context():
+            app = flask.current_app._get_current_object()  # type: ignore
+
+        self.executors = []
+        self.processes = []
+        if backend == "process":
+            # workers rely on application and configuration of the current
+            # process, so they must be forked
+            ctx = multiprocessing.get_context("fork")
+            self.processes = [ProcessWorker(ctx) for _ in range(size)]
+            for worker in self.processes:
+                worker.start(app)
+        else:
+            self.executors = [
+                ThreadPoolExecutor(1, initializer=_init_thread, initargs=(app,))
+                for _ in range(size)
+            ]
+
+    def map(
+        self,
+        records: Iterable[shared.Record],
+        context: types.Context,
+        defer_index: bool = False,
+        window: int = 0,
+    ) -> Iterator[tuple[shared.Record, Outcome]]:
+        """Ingest records and produce outcome of every record in order.
+
+        When `defer_index` is set, workers defer search indexing and IDs of
+        packages that must be indexed are added to the deferred set of the
+        caller. `skip_unchanged` of the pool is passed to `ingest_record`.
+        Records are prefetched by `window`, and every window is ingested
+        completely before the next window is prefetched.
+
+        """
+        pending: deque[tuple[shared.Record, PendingOutcome]] = deque()
+        robin = itertools.count()
+
+        for group in windows(records, window, self.skip_unchanged):
+            for record in group:
+                affinity = record.affinity()
+                idx = (next(robin) if affinity is None else hash(affinity)) % self.size
+                future = self._submit(idx, record, context, defer_index)
+                pending.append((record, future))
+
+                if len(pending) >= self.limit:
+                    yield self._report(*pending.popleft())
+
+            # entities created by records in flight are not visible to the
+            # prefetch of the next window
+            while pending:
+                yield self._report(*pending.popleft())
+
+    def _report(
+        self,
+        record: shared.Record,
+        future: PendingOutcome,
+    ) -> tuple[shared.Record, Outcome]:
+        outcome, touched = future.result()
+        indexing.touch(touched)
+        return record, outcome
+
+    def shutdown(self):
+        for executor in self.executors:
+            executor.submit(model.Session.remove)
+            executor.shutdown()
+
+        for worker in self.processes:
+            worker.stop()
+
+    def _submit(
+        self,
+        idx: int,
+        record: shared.Record,
+        context: types.Context,
+        defer_index: bool,
+    ) -> PendingOutcome:
+        if self.backend == "process":
+            portable = {k: context[k] for k in _portable_context if k in context}
+            return self.processes[idx].submit(
+                record,
+                portable,
+                defer_index,
+                self.skip_unchanged,
+            )
+
+        # thread workers share profiling and other context of the caller
+        return self.executors[idx].submit(
+            contextvars.copy_context().run,
+            _work,
+            record,
+            tk.fresh_context(context),
+            defer_index,
+            self.skip_unchanged,
+        )
+
+
+class ProcessWorker:
+    """Forked process that ingests records received through the queue.
+
+    Records are ingested in the order of submission and outcomes are sent
+    back in the same order, so the outcome of the oldest submitted record is
+    always the next one in the queue of results.
+
+    """
+
+    def __init__(self, ctx: BaseContext):
+        self.tasks: Any = ctx.Queue()
+        self.results: Any = ctx.Queue()
+        self.ctx = ctx
+        self.process: Any = None
+
+    def start(self, app: flask.Flask | None):
+        self.process = self.ctx.Process(  # type: ignore
+            target=_serve,
+            args=(self.tasks, self.results, app),
+        )
+        self.process.start()
+
+    def submit(self, *args: Any) -> PendingResult:
+        self.tasks.put(args)
+        return PendingResult(self)
+
+    def receive(self) -> WorkerOutcome:
+        while True:
+            try:
+                success, value = self.results.get(timeout=1)
+            except queue.Empty:
+                if self.process.is_alive():
+                    continue
+                msg = f"Worker process exited with code {self.process.exitcode}"
+                raise RuntimeError(msg) from None
+
+            if not success:
+                raise value
+            return value
+
+    def stop(self):
+        """Let the worker finish submitted records and wait for its exit."""
+        self.tasks.put(None)
+
+        # worker cannot exit while its outcomes are not consumed
+        while self.process.is_alive():
+            try:
+                self.results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+        self.process.join()
+        self.tasks.close()
+        self.results.close()
+
+
+class PendingResult:
+    """Outcome of the record submitted to the process worker."""
+
+    def __init__(self, worker: ProcessWorker):
+        self.worker = worker
+
+    def result(self) -> WorkerOutcome:
+        return self.worker.receive()
+
+
+def _serve(tasks: Any, results: Any, app: flask.Flask | None):
+    """Ingest records received by the worker process until `None` arrives."""
+    _init_process(app)
+    for args in iter(tasks.get, None):
+        try:
+            results.put((True, _work(*args)))
+        except Exception as e:  # noqa: BLE001
+            results.put((False, e))
+
+
+def _work(
+    record: shared.Record,
+    context: Any,
+    defer_index: bool,
+    skip_unchanged: bool,
+) -> WorkerOutcome:
+    """Ingest the record inside the worker."""
+    if not defer_index:
+        return _ingest_in_app(record, context, skip_unchanged), []
+
+    with indexing.deferred() as touched:
+        return _ingest_in_app(record, context, skip_unchanged), list(touched)
+
+
+def _ingest_in_app(
+    record: shared.Record,
+    context: Any,
+    skip_unchanged: bool,
+) -> Outcome:
+    app: flask.Flask | None = getattr(_worker, "app", None)
+    if app is None or flask.has_request_context():
+        return ingest_record(record, context, skip_unchanged)
+
+    with app.test_request_context():
+        return ingest_record(record, context, skip_unchanged)
+
+
+def _init_thread(app: flask.Flask | None):
+    """Remember application of the pool that owns the thread."""
+    _worker.app = app
+
+
+def _init_process(app: flask.Flask | None):
+    """Detach forked worker from DB connections of the parent.
+
+    Application is passed into the forked process without pickling.
+
+    """
+    model.Session.registry.clear()
+    if model.meta.engine:
+        model.meta.engine.dispose(close=False)
+
+    if app:
+        app.test_request_context().push()
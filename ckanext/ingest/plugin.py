@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+from importlib.util import find_spec
+
 import ckan.plugins.toolkit as tk
 from ckan import common, plugins
 
-from . import config, interfaces, shared
+from . import config, interfaces, shared, transform
 
 
 @tk.blanket.auth_functions
@@ -26,6 +28,7 @@ class IngestPlugin(plugins.SingletonPlugin):
 
     def configure(self, config_: common.CKANConfig):
         shared.strategies.clear()
+        transform.clear_plans()
 
         whitelist = config.allowed_strategies()
         blacklist = config.disabled_strategies()
@@ -33,7 +36,7 @@ class IngestPlugin(plugins.SingletonPlugin):
 
         for plugin in plugins.PluginImplementations(interfaces.IIngest):
             for name, s in plugin.get_ingest_strategies().items():
-                final_name = name_mapping.get(f"{s.__module__}:{s.__name__}", name)
+                final_name = name_mapping.get(shared.reference(s), name)
 
                 if whitelist and final_name not in whitelist:
                     continue
@@ -44,14 +47,32 @@ class IngestPlugin(plugins.SingletonPlugin):
                 shared.strategies.update({final_name: s})
 
     # IIngest
-    def get_ingest_strategies(self) -> dict[str, type[shared.ExtractionStrategy]]:
-        from .strategy import csv, xlsx, zip
-
-        strategies = {
-            "ingest:recursive_zip": zip.ZipStrategy,
-            "ingest:scheming_csv": csv.CsvStrategy,
+    def get_ingest_strategies(self) -> dict[str, shared.StrategyReference]:
+        # strategies are imported on the first use, so openpyxl is not loaded
+        # unless XLSX sources are ingested. Strategies selected only by
+        # mimetype are registered with it, so that autodetection does not
+        # import them. JSON Lines strategy checks extension of the source and
+        # is imported during the first autodetection.
+        strategies: dict[str, shared.StrategyReference] = {
+            "ingest:recursive_zip": (
+                "ckanext.ingest.strategy.zip:ZipStrategy",
+                ["application/zip"],
+            ),
+            "ingest:scheming_csv": (
+                "ckanext.ingest.strategy.csv:CsvStrategy",
+                ["text/csv"],
+            ),
+            "ingest:jsonl": "ckanext.ingest.strategy.json:JsonlStrategy",
+            # not used during autodetection
+            "ingest:json_array": (
+                "ckanext.ingest.strategy.json:JsonArrayStrategy",
+                [],
+            ),
         }
-        if xlsx.is_installed:
-            strategies["ingest:xlsx"] = xlsx.XlsxStrategy
+        if find_spec("openpyxl"):
+            strategies["ingest:xlsx"] = (
+                "ckanext.ingest.strategy.xlsx:XlsxStrategy",
+                ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"],
+            )
 
         return strategies
@@ -0,0 +1,231 @@
+"""Timing of ingestion stages.
+
+When profiling is enabled via `profile` block, every stage wrapped into
+`measure` adds its wall and CPU time to the histogram of the stage. Time of
+stages that belong to the record is accumulated per record as well, and
+records with the longest processing time are kept as samples.
+
+Built-in stages are `extract`(parsing of the source), `transform`(data
+transformation inside `Record.data`) and `ingest`(`Record.ingest`). Custom
+strategies and records can measure their own stages using `measure`:
+
+    with profiling.measure("download", record):
+        ...
+
+Stages that process a group of records at once, like batch transformation,
+are measured by `measure_batch`, which splits their time between records.
+
+When profiling is disabled, `measure` does nothing.
+
+"""
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import heapq
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# upper bounds of histogram buckets, seconds
+BUCKETS = [0.001, 0.01, 0.1, 1, 10]
+
+_profile: ContextVar[Profile | None] = ContextVar("ingest_profile", default=None)
+
+
+@dataclasses.dataclass
+class Stage:
+    """Time spent on the stage."""
+
+    count: int = 0
+    wall: float = 0
+    cpu: float = 0
+    max: float = 0
+    histogram: list[int] = dataclasses.field(
+        default_factory=lambda: [0] * (len(BUCKETS) + 1),
+    )
+
+    def add(self, wall: float, cpu: float):
+        self.count += 1
+        self.wall += wall
+        self.cpu += cpu
+        self.max = max(self.max, wall)
+
+        for idx, bound in enumerate(BUCKETS):
+            if wall < bound:
+                self.histogram[idx] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def summary(self) -> dict[str, Any]:
+        labels = [f"<{_format(bound)}" for bound in BUCKETS]
+        labels.append(f">={_format(BUCKETS[-1])}")
+
+        return {
+            "count": self.count,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "mean": self.wall / self.count if self.count else 0,
+            "max": self.max,
+            "histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+class Profile:
+    """Timing of stages and the slowest records."""
+
+    def __init__(self, samples: int = 5):
+        self.samples = samples
+        self.stages: dict[str, Stage] = {}
+        # time of stages for every record that is not finished yet
+        self.records: dict[int, dict[str, float]] = {}
+        # heap of the slowest records: total time, order, sample
+        self.slowest: list[tuple[float, int, dict[str, Any]]] = []
+        self.order = itertools.count()
+        # thread workers report their stages concurrently
+        self.lock = threading.Lock()
+
+    def add(self, stage: str, wall: float, cpu: float, record: Any = None):
+        """Add time of the stage, optionally attributing it to the record."""
+        with self.lock:
+            self.stages.setdefault(stage, Stage()).add(wall, cpu)
+
+            if record is not None:
+                timing = self.records.setdefault(id(record), {})
+                timing[stage] = timing.get(stage, 0) + wall
+
+    def add_shared(
+        self,
+        stage: str,
+        wall: float,
+        cpu: float,
+        records: Sequence[Any],
+    ):
+        """Add time of the stage that processed multiple records at once.
+
+        Time is split evenly between records, so that every record reports
+        its share of the stage.
+
+        """
+        if not records:
+            return
+
+        for record in records:
+            self.add(stage, wall / len(records), cpu / len(records), record)
+
+    def finish(self, record: Any) -> dict[str, float]:
+        """Stop tracking the record and return time of its stages."""
+        with self.lock:
+            timing = self.records.pop(id(record), {})
+
+        sample = {
+            "total": sum(timing.values()),
+            "stages": timing,
+            "source": getattr(record, "raw", None),
+        }
+
+        item = (sample["total"], next(self.order), sample)
+        if len(self.slowest) < self.samples:
+            heapq.heappush(self.slowest, item)
+        else:
+            heapq.heappushpop(self.slowest, item)
+
+        return timing
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "stages": {name: stage.summary() for name, stage in self.stages.items()},
+            "slowest": [item[2] for item in sorted(self.slowest, reverse=True)],
+        }
+
+
+def current() -> Profile | None:
+    """Profile of the ingestion running in the current context."""
+    return _profile.get()
+
+
+@contextlib.contextmanager
+def profile(samples: int = 5) -> Iterator[Profile]:
+    """Enable profiling inside the block."""
+    active = Profile(samples)
+    token = _profile.set(active)
+    try:
+        yield active
+    finally:
+        _profile.reset(token)
+
+
+@contextlib.contextmanager
+def measure(stage: str, record: Any = None) -> Iterator[None]:
+    """Measure time of the stage, if profiling is enabled."""
+    active = _profile.get()
+    if active is None:
+        yield
+        return
+
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        active.add(
+            stage,
+            time.perf_counter() - wall,
+            time.thread_time() - cpu,
+            record,
+        )
+
+
+@contextlib.contextmanager
+def measure_batch(stage: str, records: Sequence[Any]) -> Iterator[None]:
+    """Measure time of the stage that processes all the records at once."""
+    active = _profile.get()
+    if active is None:
+        yield
+        return
+
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        active.add_shared(
+            stage,
+            time.perf_counter() - wall,
+            time.thread_time() - cpu,
+            records,
+        )
+
+
+def timed(items: Iterable[T], stage: str) -> Iterator[T]:
+    """Measure production of every item by iterable as a stage of this item."""
+    active = _profile.get()
+    if active is None:
+        yield from items
+        return
+
+    iterator = iter(items)
+    while True:
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+
+        active.add(
+            stage,
+            time.perf_counter() - wall,
+            time.thread_time() - cpu,
+            item,
+        )
+        yield item
+
+
+def _format(seconds: float) -> str:
+    return f"{seconds * 1000:g}ms" if seconds < 1 else f"{seconds:g}s"
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import dataclasses
-from typing import Any
+from collections import Counter
+from typing import Any, Sequence
+
+import sqlalchemy as sa
 
 import ckan.plugins.toolkit as tk
 from ckan import model, types
@@ -19,33 +22,158 @@ class PackageRecord(shared.Record):
         field's attribute `{profile}_options` that contains transformation
         rules.
 
+        extras["patch"]: when existing package is updated, send only changed
+        fields via `package_patch`. Resources are matched with existing
+        resources by ID or URL. Nothing is sent when data is not changed.
+
     """
 
     type: str = "dataset"
     profile: str = dataclasses.field(init=False)
 
+    # existing package, loaded in advance by `prefetch`
+    prefetched: bool = dataclasses.field(default=False, init=False, repr=False)
+    existing: dict[str, Any] | None = dataclasses.field(
+        default=None,
+        init=False,
+        repr=False,
+    )
+
     def __post_init__(self):
         self.profile = self.options.get("extras", {}).get("profile", "ingest")
         super().__post_init__()
 
+    @classmethod
+    def prefetch(cls, records: Sequence[PackageRecord]):
+        keys = {r.id_or_name(): r for r in records}
+        wanted = _unique_keys([r.id_or_name() for r in records])
+        if not wanted:
+            return
+
+        found: dict[str, dict[str, Any]] = {}
+        query = model.Session.query(
+            model.Package.id,
+            model.Package.name,
+            model.Package.state,
+        ).filter(sa.or_(model.Package.id.in_(wanted), model.Package.name.in_(wanted)))
+
+        # package is identified by ID first, just as in model.Package.get
+        rows = [dict(row._mapping) for row in query]
+        found.update((row["name"], row) for row in rows)
+        found.update((row["id"], row) for row in rows)
+
+        for key in wanted:
+            keys[key].prefetched = True
+            keys[key].existing = found.get(key)
+
     def transform(self, raw: Any):
-        return transform.transform_package(raw, self.type, self.profile)
+        return transform.transform_package(
+            raw,
+            self.type,
+            self.profile,
+            self.header,
+        )
+
+    @classmethod
+    def transform_batch(cls, records: Sequence[PackageRecord]):
+        for (type_, profile, header), group in _pending(records).items():
+            rows = [r.raw for r in group]
+            for record, data in zip(
+                group,
+                transform.transform_packages(rows, type_, profile, header),
+            ):
+                record.data = data
+
+    def affinity(self):
+        # the same package can be referred by ID in one record and by name in
+        # another, so existing packages are identified by ID
+        pkg = self._existing()
+        if pkg:
+            return pkg["id"]
+
+        return self.data.get("name") or self.data.get("id")
+
+    def id_or_name(self) -> str | None:
+        return self.data.get("id", self.data.get("name"))
+
+    def fingerprint_key(self) -> str | None:
+        if not self.options.get("update_existing"):
+            return None
+
+        pkg = self._existing()
+        if not pkg or pkg["state"] != "active":
+            return None
+
+        return f"package:{pkg['id']}"
+
+    def _existing(self) -> dict[str, Any] | None:
+        if self.prefetched:
+            return self.existing
+
+        pkg = model.Package.get(self.id_or_name())
+        return pkg and {"id": pkg.id, "name": pkg.name, "state": pkg.state}
 
     def ingest(self, context: types.Context) -> shared.IngestionResult:
-        id_or_name = self.data.get("id", self.data.get("name"))
-        pkg = model.Package.get(id_or_name)
+        pkg = self._existing()
+        details: dict[str, Any] = {}
 
-        action = "package_" + (
-            "update" if pkg and self.options.get("update_existing") else "create"
-        )
-        result = tk.get_action(action)(context, self.data)
+        if not pkg or not self.options.get("update_existing"):
+            action = "package_create"
+            result = tk.get_action(action)(context, self.data)
+
+        elif self.get_extra("patch", False):
+            result, details["changed"] = self._patch(context, pkg["id"])
+            action = "package_patch" if details["changed"] else "noop"
+
+        else:
+            action = "package_update"
+            result = tk.get_action(action)(context, self.data)
+
+        self.prefetched = True
+        self.existing = {
+            "id": result["id"],
+            "name": result["name"],
+            "state": result["state"],
+        }
 
         return {
             "success": True,
             "result": result,
-            "details": {"action": action},
+            "details": dict(details, action=action),
         }
 
+    def _patch(
+        self,
+        context: types.Context,
+        pkg_id: str,
+    ) -> tuple[dict[str, Any], list[str]]:
+        """Patch fields that differ from the existing package.
+
+        Returns the package and the list of changed fields.
+
+        """
+        pkg = tk.get_action("package_show")(
+            tk.fresh_context(context),
+            {"id": pkg_id},
+        )
+
+        changes: dict[str, Any] = {}
+        for key, value in self.data.items():
+            new = value
+            if key == "resources" and isinstance(value, list):
+                new = _merge_resources(value, pkg.get("resources", []))
+
+            if not _is_subset(new, pkg.get(key)):
+                changes[key] = new
+
+        if not changes:
+            return pkg, []
+
+        # resources are sent only when at least one of them is changed,
+        # otherwise they are left intact by package_patch
+        result = tk.get_action("package_patch")(context, dict(changes, id=pkg_id))
+        return result, sorted(changes)
+
 
 @dataclasses.dataclass
 class ResourceRecord(shared.Record):
@@ -62,22 +190,123 @@ class ResourceRecord(shared.Record):
     type: str = "dataset"
     profile: str = dataclasses.field(init=False)
 
+    # existing resource, loaded in advance by `prefetch`
+    prefetched: bool = dataclasses.field(default=False, init=False, repr=False)
+    existing: dict[str, Any] | None = dataclasses.field(
+        default=None,
+        init=False,
+        repr=False,
+    )
+    # ID of the package referred by `package_id`, loaded in advance by
+    # `prefetch`
+    owner: str | None = dataclasses.field(default=None, init=False, repr=False)
+
     def __post_init__(self):
         self.profile = self.options.get("extras", {}).get("profile", "ingest")
 
         super().__post_init__()
 
+    @classmethod
+    def prefetch(cls, records: Sequence[ResourceRecord]):
+        refs = {r.data.get("package_id") for r in records} - {None, ""}
+        if refs:
+            query = model.Session.query(model.Package.id, model.Package.name).filter(
+                sa.or_(model.Package.id.in_(refs), model.Package.name.in_(refs)),
+            )
+            owners = {row.name: row.id for row in query}
+            owners.update((pkg_id, pkg_id) for pkg_id in owners.values())
+
+            for record in records:
+                record.owner = owners.get(record.data.get("package_id", ""))
+
+        keys = {r.data.get("id", ""): r for r in records}
+        wanted = _unique_keys([r.data.get("id", "") for r in records])
+        if not wanted:
+            return
+
+        query = model.Session.query(
+            model.Resource.id,
+            model.Resource.package_id,
+            model.Resource.state,
+        ).filter(model.Resource.id.in_(wanted))
+        found = {row.id: dict(row._mapping) for row in query}
+
+        for key in wanted:
+            keys[key].prefetched = True
+            keys[key].existing = found.get(key)
+
     def transform(self, raw: Any):
-        return transform.transform_resource(raw, self.type, self.profile)
+        return transform.transform_resource(
+            raw,
+            self.type,
+            self.profile,
+            self.header,
+        )
+
+    @classmethod
+    def transform_batch(cls, records: Sequence[ResourceRecord]):
+        for (type_, profile, header), group in _pending(records).items():
+            rows = [r.raw for r in group]
+            for record, data in zip(
+                group,
+                transform.transform_resources(rows, type_, profile, header),
+            ):
+                record.data = data
+
+    def affinity(self):
+        # resources are added to the package via package_update. Package can
+        # be referred either by ID or by name, so it's identified by ID.
+        return self._owner()
+
+    def _owner(self) -> str | None:
+        """ID of the package referred by `package_id`, or the reference itself
+        when package does not exist.
+
+        """
+        if self.owner:
+            return self.owner
+
+        ref = self.data.get("package_id")
+        pkg = model.Package.get(ref) if ref else None
+        if pkg:
+            self.owner = pkg.id
+
+        return pkg.id if pkg else ref
+
+    def fingerprint_key(self) -> str | None:
+        if not self.options.get("update_existing"):
+            return None
+
+        existing = self._existing()
+        if (
+            not existing
+            or existing["state"] != "active"
+            or existing["package_id"] != self._owner()
+        ):
+            return None
+
+        return f"resource:{existing['id']}"
+
+    def _existing(self) -> dict[str, Any] | None:
+        if self.prefetched:
+            return self.existing
+
+        res = model.Resource.get(self.data.get("id", ""))
+        return res and {
+            "id": res.id,
+            "package_id": res.package_id,
+            "state": res.state,
+        }
 
     def ingest(self, context: types.Context) -> shared.IngestionResult:
-        existing = model.Resource.get(self.data.get("id", ""))
-        prefer_update = existing and existing.state == "active"
+        existing = self._existing()
+
+        prefer_update = existing and existing["state"] == "active"
 
         if (
             existing
             and prefer_update
-            and existing.package_id != self.data.get("package_id")
+            and existing["package_id"] != self.data.get("package_id")
         ):
             if config.allow_transfer():
                 prefer_update = False
@@ -87,7 +316,7 @@ class ResourceRecord(shared.Record):
                     {
                         "id": (
                             "Resource already belogns to the package"
-                            f" {existing.package_id} and cannot be transfered"
+                            f" {existing['package_id']} and cannot be transfered"
                             f" to {self.data.get('package_id')}"
                         ),
                     },
@@ -100,8 +329,98 @@ class ResourceRecord(shared.Record):
         )
 
         result = tk.get_action(action)(context, self.data)
+
+        self.prefetched = True
+        self.existing = {
+            "id": result["id"],
+            "package_id": result["package_id"],
+            "state": result["state"],
+        }
+
         return {
             "success": True,
             "result": result,
             "details": {"action": action},
         }
+
+
+def _pending(records: Sequence[Any]) -> dict[tuple[Any, ...], list[Any]]:
+    """Group records that are not transformed yet by type, profile and
+    header.
+
+    """
+    groups: dict[tuple[Any, ...], list[Any]] = {}
+    for record in records:
+        if record._data is None:  # noqa: SLF001
+            header = tuple(record.header) if record.header else None
+            key = (record.type, record.profile, header)
+            groups.setdefault(key, []).append(record)
+
+    return groups
+
+
+def _merge_resources(
+    new: list[dict[str, Any]],
+    old: list[dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """Apply new resources to the resources of existing package.
+
+    New resource updates the existing resource with the same `id`, or, if
+    there is no such resource, the first existing resource with the same
+    `url` that is not updated by other new resource. Matched resources keep
+    their IDs and position, unmatched new resources are added after the
+    existing ones. Existing resources that are not mentioned by new resources
+    are kept.
+
+    """
+    updated: dict[str, dict[str, Any]] = {}
+    added: list[dict[str, Any]] = []
+    ids = {res["id"]: res for res in old}
+
+    for res in new:
+        key = res.get("id")
+        if key not in ids and res.get("url"):
+            key = next(
+                (
+                    r["id"]
+                    for r in old
+                    if r["id"] not in updated and r.get("url") == res["url"]
+                ),
+                None,
+            )
+
+        if key in ids:
+            updated[key] = dict(updated.get(key, ids[key]), **res)
+        else:
+            added.append(res)
+
+    return [updated.get(res["id"], res) for res in old] + added
+
+
+def _is_subset(new: Any, old: Any) -> bool:
+    """Check whether existing value already contains the new value.
+
+    Dictionaries are compared only by keys of the new value, because existing
+    entities contain generated fields(timestamps, IDs, etc.). Lists are
+    compared item by item.
+
+    """
+    if isinstance(new, dict) and isinstance(old, dict):
+        return all(_is_subset(v, old.get(k)) for k, v in new.items())
+
+    if isinstance(new, list) and isinstance(old, list):
+        return len(new) == len(old) and all(map(_is_subset, new, old))
+
+    return new == old
+
+
+def _unique_keys(keys: list[Any]) -> list[Any]:
+    """Keys that can be prefetched.
+
+    Entity, referred by multiple records from the same window, can be created
+    by the first of them. Such entities are not prefetched, and records check
+    their existence right before ingestion.
+
+    """
+    counts = Counter(keys)
+    return [key for key in counts if key and counts[key] == 1]
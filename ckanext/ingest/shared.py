@@ -1,19 +1,42 @@
 from __future__ import annotations
 
 import dataclasses
+import hashlib
+import itertools
+import json
 import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
 from copy import deepcopy
 from io import BytesIO
-from typing import IO, Any, Callable, ClassVar, Iterable, TypeVar
+from typing import (
+    IO,
+    Any,
+    Callable,
+    ClassVar,
+    Hashable,
+    Iterable,
+    Iterator,
+    MutableMapping,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from typing_extensions import TypedDict
 from werkzeug.datastructures import FileStorage
+from werkzeug.utils import import_string
 
 from ckan import types
 
-log = logging.getLogger(__name__)
+from . import profiling
 
-strategies: dict[str, type[ExtractionStrategy]] = {}
+log = logging.getLogger(__name__)
 
 Storage = FileStorage
 T = TypeVar("T")
@@ -67,7 +90,9 @@ class IngestionResult(TypedDict, total=False):
 class Record:
     """Single element produced by extraction strategy.
 
-    The record is responsible for creating/updating the data.
+    The record is responsible for creating/updating the data. Raw data is
+    transformed on the first access to `data`, so records that are skipped
+    during ingestion never pay for transformation.
     """
 
     # original data extracted by strategy
@@ -76,11 +101,56 @@ class Record:
     # options received from extraction strategy
     options: RecordOptions = dataclasses.field(default_factory=RecordOptions)
 
-    # transformed data adapted to the record needs
-    data: dict[str, Any] = dataclasses.field(init=False)
+    # names of source's columns, when strategy knows them in advance. Used to
+    # bind transformation rules to columns once per source.
+    header: Sequence[str] | None = dataclasses.field(
+        default=None,
+        init=False,
+        repr=False,
+        compare=False,
+    )
+
+    # digest of the data stored by the previous ingestion of the same
+    # entity. Loaded in advance when unchanged records are skipped. `None`
+    # means that digest is not loaded, empty string - that it does not exist.
+    stored_digest: str | None = dataclasses.field(
+        default=None,
+        init=False,
+        repr=False,
+        compare=False,
+    )
+
+    # transformed data adapted to the record needs. Computed lazily.
+    _data: dict[str, Any] | None = dataclasses.field(
+        default=None,
+        init=False,
+        repr=False,
+        compare=False,
+    )
 
     def __post_init__(self):
-        self.data = self.transform(self.raw)
+        pass
+
+    @property
+    def data(self) -> dict[str, Any]:
+        """Transformed data adapted to the record needs."""
+        if self._data is None:
+            with profiling.measure("transform", self):
+                self._data = self.transform(self.raw)
+
+        return self._data
+
+    @data.setter
+    def data(self, value: dict[str, Any]):
+        self._data = value
+
+    @property
+    def transformed(self) -> dict[str, Any] | None:
+        """Transformed data, if it's already computed.
+
+        Unlike `data`, it never triggers transformation.
+        """
+        return self._data
 
     def get_extra(self, key: str, default: T) -> T:
         """Get an option from `self.options["extras"]`.
@@ -91,10 +161,51 @@ class Record:
         """
         return get_extra(self.options, key, default)
 
+    @classmethod
+    def prefetch(cls, records: Sequence[Any]) -> None:
+        """Load details required by the window of upcoming records in bulk.
+
+        Called with a group of records of this class right before their
+        ingestion. Records may keep prefetched details and use them instead
+        of querying the DB one by one.
+
+        """
+
+    def affinity(self) -> Hashable | None:
+        """Identifier of the entity affected by the record.
+
+        Records with the same affinity are never ingested concurrently. `None`
+        means that the record can be ingested by any worker.
+
+        """
+        return None
+
+    def fingerprint_key(self) -> str | None:
+        """Identifier of the existing entity updated by the record.
+
+        Used to skip records whose data did not change since the previous
+        ingestion. Called before the ingestion to check whether the record
+        must be skipped, and after successful ingestion to remember its
+        data. `None` means that the record is always ingested.
+
+        """
+        return None
+
     def transform(self, raw: dict[str, Any]) -> dict[str, Any]:
         """Transform arbitrary data into a data that has sense for a record."""
         return raw
 
+    @classmethod
+    def transform_batch(cls, records: Sequence[Any]) -> None:
+        """Transform data of multiple records at once.
+
+        Called with a group of records of this class before their data is
+        used. Implementation may process the raw data column by column and
+        assign `data` of every record. Records that are left without data are
+        transformed one by one, when their data is accessed.
+
+        """
+
     def fill(self, defaults: dict[str, Any], overrides: dict[str, Any]):
         """Apply default and overrides to the data."""
         self.data = {**defaults, **self.data, **overrides}
@@ -114,11 +225,17 @@ class ExtractionStrategy:
 
     Attributes:
         mimetypes: collection of mimetypes supported by the strategy
+        content_independent: strategy is selected without reading the source
     """
 
     mimetypes: ClassVar[set[str]] = set()
     record_factory: type[Record] = Record
 
+    # `can_handle` and `must_handle` depend only on mimetype and extension of
+    # the source's filename, so their result can be cached. Strategies that
+    # do not override these methods are always content-independent.
+    content_independent: ClassVar[bool] = False
+
     @classmethod
     def can_handle(cls, mime: str | None, source: Storage) -> bool:
         """Check if strategy can handle given mimetype/source."""
@@ -134,6 +251,58 @@ class ExtractionStrategy:
         suitable for Record creation."""
         return []
 
+    def chunks_batched(
+        self,
+        source: Storage,
+        options: StrategyOptions,
+        size: int,
+    ) -> Iterable[list[Any]]:
+        """Iterate over lists of at most `size` chunks.
+
+        By default, chunks are grouped in order. Strategies that can parse
+        multiple chunks at once more efficiently may override it.
+
+        """
+        iterator = iter(self.chunks(source, options))
+        while batch := list(itertools.islice(iterator, size)):
+            yield batch
+
+    def tell(self) -> Any:
+        """Position of the record that follows the last extracted record.
+
+        Position is an arbitrary JSON-serializable value that can be passed
+        into `seek`. `None` means that strategy cannot resume extraction from
+        the middle of the source.
+
+        """
+        return None
+
+    def seek(self, position: Any):
+        """Start the next extraction from the position reported by `tell`.
+
+        Strategy that reports positions must override this method. Otherwise,
+        extraction would silently restart from the beginning of the source.
+
+        """
+        msg = f"{type(self).__name__} cannot resume extraction from {position!r}"
+        raise ValueError(msg)
+
+    def locate(
+        self,
+        source: Storage,
+        options: StrategyOptions,
+        number: int,
+    ) -> tuple[int, Any] | None:
+        """Find position of the record that precedes the record `number`.
+
+        Returns the number of the found record and the position that can be
+        passed into `seek`, so that extraction skips all records before
+        it. `None` means that strategy cannot locate records and the source
+        must be extracted from the beginning.
+
+        """
+        return None
+
     def chunk_into_record(self, chunk: Any, options: StrategyOptions) -> Record:
         return self.record_factory(
             chunk,
@@ -155,6 +324,198 @@ class ExtractionStrategy:
         for chunk in self.chunks(source, options):
             yield self.chunk_into_record(chunk, options)
 
+    def extract_batched(
+        self,
+        source: Storage,
+        options: StrategyOptions,
+        size: int,
+    ) -> Iterable[list[Record]]:
+        """Return iterable over lists of at most `size` transformed records.
+
+        Records are created from `chunks_batched` and transformed via
+        `Record.transform_batch`. Strategies that override `extract` produce
+        records in their own way, which are grouped and transformed
+        afterwards.
+
+        """
+        if type(self).extract is ExtractionStrategy.extract:
+            batches: Iterable[list[Record]] = (
+                [self.chunk_into_record(chunk, options) for chunk in chunks]
+                for chunks in self.chunks_batched(source, options, size)
+            )
+        else:
+            iterator = iter(self.extract(source, options))
+            batches = iter(lambda: list(itertools.islice(iterator, size)), [])
+
+        for records in batches:
+            transform_batch(records)
+            yield records
+
+
+def transform_batch(records: Sequence[Record]):
+    """Transform records using `Record.transform_batch` of their classes.
+
+    Records of every class are transformed as a single group.
+
+    """
+    groups: dict[type[Record], list[Record]] = {}
+    for record in records:
+        groups.setdefault(type(record), []).append(record)
+
+    for cls, group in groups.items():
+        with profiling.measure_batch("transform", group):
+            cls.transform_batch(group)
+
+
+# strategy class, its import path in `module:Class` form, or import path
+# together with mimetypes handled by the strategy
+StrategyReference = Union[Type[ExtractionStrategy], str, Tuple[str, Iterable[str]]]
+
+
+class Registry(MutableMapping[str, Type[ExtractionStrategy]]):
+    """Registered extraction strategies by name.
+
+    Strategy can be registered as a class or as a lazy reference in
+    `module:Class` form. Reference is imported when strategy is accessed for
+    the first time, so modules of unused strategies and their dependencies
+    are never imported.
+
+    Strategies that rely on default `can_handle` and `must_handle` are indexed
+    by their mimetypes, so only suitable strategies and strategies with custom
+    checks are considered during resolution. When all considered strategies
+    are `content_independent`, result of resolution is cached for the
+    combination of mimetype and extension of the source. Index and cache are
+    dropped whenever registry changes.
+
+    Plain lazy reference is imported during the first resolution, because
+    registry cannot index it otherwise. To avoid this, register reference as
+    `(path, mimetypes)` pair. Such strategy is considered only for listed
+    mimetypes, and it's imported only when one of them is resolved.
+
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self._items: dict[str, type[ExtractionStrategy] | str] = {}
+        # mimetypes of lazy references registered together with them
+        self._mimetypes: dict[str, frozenset[str]] = {}
+        self._reset()
+        self.update(*args, **kwargs)
+
+    def _reset(self):
+        # candidates for every mimetype, in order of registration
+        self._candidates: dict[str | None, list[type[ExtractionStrategy]]] = {}
+        # resolved strategy by mimetype and extension
+        self._resolved: dict[
+            tuple[str | None, str],
+            type[ExtractionStrategy] | None,
+        ] = {}
+
+    def __getitem__(self, key: str) -> type[ExtractionStrategy]:
+        strategy = self._items[key]
+        if isinstance(strategy, str):
+            strategy = self._items[key] = import_string(strategy)
+
+        return strategy
+
+    def __setitem__(self, key: str, value: StrategyReference):
+        if isinstance(value, tuple):
+            value, mimetypes = value
+            self._mimetypes[key] = frozenset(mimetypes)
+        else:
+            self._mimetypes.pop(key, None)
+
+        self._items[key] = value
+        self._reset()
+
+    def __delitem__(self, key: str):
+        del self._items[key]
+        self._mimetypes.pop(key, None)
+        self._reset()
+
+    def __contains__(self, key: object) -> bool:
+        # default implementation imports the strategy
+        return key in self._items
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._items!r})"
+
+    def reference(self, key: str) -> str:
+        """Import path of the strategy, without importing it."""
+        return reference(self._items[key])
+
+    def candidates(self, mime: str | None) -> list[type[ExtractionStrategy]]:
+        """Strategies that may handle the mimetype, in order of registration."""
+        if mime not in self._candidates:
+            candidates: list[type[ExtractionStrategy]] = []
+            for key in self._items:
+                if key in self._mimetypes:
+                    if mime in self._mimetypes[key]:
+                        candidates.append(self[key])
+                    continue
+
+                strategy = self[key]
+                if mime in strategy.mimetypes or not _has_default_checks(strategy):
+                    candidates.append(strategy)
+
+            self._candidates[mime] = candidates
+
+        return self._candidates[mime]
+
+    def resolve(
+        self,
+        mime: str | None,
+        source: Storage,
+    ) -> type[ExtractionStrategy] | None:
+        """Select the most suitable strategy for the MIMEType.
+
+        The first strategy that `must_handle` is returned. If there is no such
+        strategy, the first that `can_handle` is returned.
+
+        """
+        key = (mime, os.path.splitext(source.filename or "")[1].lower())
+        if key in self._resolved:
+            return self._resolved[key]
+
+        cacheable = True
+        choice: type[ExtractionStrategy] | None = None
+
+        for strategy in self.candidates(mime):
+            cacheable = cacheable and _is_content_independent(strategy)
+            if not strategy.can_handle(mime, source):
+                continue
+
+            if strategy.must_handle(mime, source):
+                choice = strategy
+                break
+
+            if choice is None:
+                choice = strategy
+
+        if cacheable:
+            self._resolved[key] = choice
+
+        return choice
+
+
+strategies = Registry()
+
+
+def reference(strategy: StrategyReference) -> str:
+    """Import path of the strategy in `module:Class` form."""
+    if isinstance(strategy, tuple):
+        return strategy[0]
+
+    if isinstance(strategy, str):
+        return strategy
+
+    return f"{strategy.__module__}:{strategy.__name__}"
+
 
 def get_handler_for_mimetype(
     mime: str | None,
@@ -166,20 +527,24 @@ def get_handler_for_mimetype(
     strategy, the first that `can_handle` is returned.
 
     """
-    choices: list[type[ExtractionStrategy]] = []
-    for strategy in strategies.values():
-        if not strategy.can_handle(mime, source):
-            continue
+    strategy = strategies.resolve(mime, source)
+    if strategy:
+        return strategy()
 
-        if strategy.must_handle(mime, source):
-            return strategy()
+    return None
 
-        choices.append(strategy)
 
-    if choices:
-        return choices[0]()
+def _has_default_checks(strategy: type[ExtractionStrategy]) -> bool:
+    """Check if strategy is selected only by its mimetypes."""
+    return all(
+        getattr(getattr(strategy, name), "__func__", None)
+        is getattr(ExtractionStrategy, name).__func__
+        for name in ["can_handle", "must_handle"]
+    )
 
-    return None
+
+def _is_content_independent(strategy: type[ExtractionStrategy]) -> bool:
+    return strategy.content_independent or _has_default_checks(strategy)
 
 
 def make_storage(
@@ -200,6 +565,90 @@ def make_storage(
     return Storage(stream, name, content_type=mimetype)
 
 
+def is_seekable(stream: IO[bytes]) -> bool:
+    """Check if stream supports random access."""
+    try:
+        return stream.seekable()
+    except AttributeError:
+        # SpooledTemporaryFile does not implement `seekable` before py3.11
+        return hasattr(stream, "seek")
+
+
+def can_fork() -> bool:
+    """Check if worker processes can be safely forked from the current process.
+
+    Forked child gets only the thread that forked it, so locks held by other
+    threads(e.g. of the web server) remain locked forever. Process workers
+    are available only in single-threaded processes, like CLI commands and
+    background jobs.
+
+    """
+    return threading.active_count() == 1
+
+
+def remove_expired(directory: str, ttl: int) -> list[str]:
+    """Remove entries of the directory that were not modified for `ttl` seconds.
+
+    Entries are files and subdirectories. Returns names of removed
+    entries. Nothing is removed when `ttl` is 0.
+
+    """
+    if not ttl or not os.path.isdir(directory):
+        return []
+
+    deadline = time.time() - ttl
+    removed: list[str] = []
+    for entry in os.scandir(directory):
+        try:
+            if entry.stat().st_mtime >= deadline:
+                continue
+
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # removed concurrently
+            continue
+
+        removed.append(entry.name)
+
+    return removed
+
+
+def spool(stream: IO[bytes]) -> IO[bytes]:
+    """Copy the rest of the stream into anonymous temporary file.
+
+    The file is removed as soon as it's closed. Use it when the source must
+    be seekable, but its content is too big to keep in memory.
+
+    """
+    output = tempfile.TemporaryFile()
+    shutil.copyfileobj(stream, output)
+    output.seek(0)
+    return output
+
+
+def fingerprint(stream: IO[bytes], params: Any = None) -> str | None:
+    """Compute SHA256 of the stream content and JSON-serializable params.
+
+    Stream is rewound to the original position after reading. If stream is
+    not seekable, `None` is returned.
+
+    """
+    if not is_seekable(stream):
+        return None
+
+    digest = hashlib.sha256()
+    start = stream.tell()
+    while chunk := stream.read(1024 * 1024):
+        digest.update(chunk)
+    stream.seek(start)
+
+    digest.update(json.dumps(params, sort_keys=True, default=repr).encode())
+    return digest.hexdigest()
+
+
 def get_extra(options: StrategyOptions | RecordOptions, key: str, default: T) -> T:
     """Safely return an item from `extras` member of strategy or record
     options.
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
+import codecs
 import csv
 import logging
-from io import StringIO
-from typing import Any, Iterable
+from typing import IO, Any, Iterable, Iterator
 
-from ckanext.ingest import shared
+from ckanext.ingest import index, shared
 from ckanext.ingest.record import PackageRecord
 
 log = logging.getLogger(__name__)
@@ -19,15 +19,192 @@ class CsvStrategy(shared.ExtractionStrategy):
     `ingest_options: {aliases: [DESCRIPTION]}`, `DESCRIPTION` column from CSV
     will be used as a data source for this field.
 
+    Source is decoded and parsed row by row, so memory consumption does not
+    depend on the size of the source. For seekable sources in ASCII-compatible
+    encodings, strategy reports byte offset of every row, so that ingestion
+    can be resumed from the checkpoint without parsing previous rows.
+
+    Options[extras]:
+
+        reader_options: dict[str, Any] - keyword arguments for csv.DictReader
+
+        encoding: str - encoding of the source. Default: `utf-8-sig`, which
+        is the same as `utf-8`, but also removes BOM from the beginning of the
+        source.
+
+        encoding_errors: str - error handling scheme for decoder. Default:
+        `strict`
+
+        offset_index: int - build an index with offset of every N-th row. Index
+        is cached using the hash of the source and `skip` jumps to the closest
+        indexed row instead of parsing all the rows before it.
+
     """
 
     mimetypes = {"text/csv"}
     record_factory = PackageRecord
 
+    # lines of the source that is currently parsed
+    _lines: OffsetLines | None = None
+    # byte offset of the first row for the next extraction
+    _start: int | None = None
+    # columns of the source that is currently parsed
+    _header: tuple[str, ...] | None = None
+
     def chunks(
         self, source: shared.Storage, options: shared.StrategyOptions,
     ) -> Iterable[dict[str, Any]]:
         reader_options: dict[str, Any] = shared.get_extra(options, "reader_options", {})
-        str_stream = StringIO(source.read().decode())
+        encoding = shared.get_extra(options, "encoding", "utf-8-sig")
+        errors = shared.get_extra(options, "encoding_errors", "strict")
+
+        if not is_ascii_compatible(encoding) or not shared.is_seekable(source.stream):
+            self._lines = None
+            reader = csv.DictReader(
+                decode_lines(source, encoding, errors),
+                **reader_options,
+            )
+            self._header = _header(reader)
+            return reader
+
+        lines = self._lines = OffsetLines(source.stream, encoding, errors)
+        reader = csv.DictReader(lines, **reader_options)
+
+        # header is parsed before jumping to the rows that follow it
+        self._header = _header(reader)
+        if self._start is not None and self._header is not None:
+            lines.seek(self._start)
+
+        return reader
+
+    def chunk_into_record(
+        self,
+        chunk: Any,
+        options: shared.StrategyOptions,
+    ) -> shared.Record:
+        record = super().chunk_into_record(chunk, options)
+        record.header = self._header
+        return record
+
+    def locate(
+        self,
+        source: shared.Storage,
+        options: shared.StrategyOptions,
+        number: int,
+    ) -> tuple[int, Any] | None:
+        step: int = shared.get_extra(options, "offset_index", 0)
+        encoding = shared.get_extra(options, "encoding", "utf-8-sig")
+        if not step or not is_ascii_compatible(encoding):
+            return None
+
+        params = {
+            "encoding": encoding,
+            "encoding_errors": shared.get_extra(options, "encoding_errors", "strict"),
+            "reader_options": shared.get_extra(options, "reader_options", {}),
+        }
+
+        offsets = index.get_index(
+            source.stream,
+            step,
+            params,
+            lambda: self._build_index(source, options, step),
+        )
+        return offsets.locate(number) if offsets else None
+
+    def _build_index(
+        self,
+        source: shared.Storage,
+        options: shared.StrategyOptions,
+        step: int,
+    ) -> list[int]:
+        start = source.stream.tell()
+        positions: list[int] = []
+
+        strategy = type(self)()
+        reader = iter(strategy.chunks(source, options))
+        position = strategy.tell()
+
+        for number, _row in enumerate(reader):
+            if not number % step:
+                positions.append(position)
+            position = strategy.tell()
+
+        source.stream.seek(start)
+        return positions
+
+    def tell(self) -> int | None:
+        """Byte offset of the row that follows the last extracted row."""
+        return self._lines.offset if self._lines else None
+
+    def seek(self, position: int):
+        self._start = position
+
+
+class OffsetLines:
+    """Lines of the source in ASCII-compatible encoding with their offsets.
+
+    Source is split into lines before decoding, so `offset` always points to
+    the beginning of the next line and can be used to continue reading from
+    the same place later.
+
+    """
+
+    def __init__(self, stream: IO[bytes], encoding: str, errors: str = "strict"):
+        self.stream = stream
+        self.encoding = encoding
+        self.errors = errors
+        self.offset = stream.tell()
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.stream.readline()
+        if not line:
+            raise StopIteration
+
+        self.offset += len(line)
+        return self.decoder.decode(line)
+
+    def seek(self, offset: int):
+        self.stream.seek(offset)
+        self.offset = offset
+        self.decoder = codecs.getincrementaldecoder(self.encoding)(self.errors)
+
+
+def _header(reader: csv.DictReader[str]) -> tuple[str, ...] | None:
+    """Parse names of columns from the first line of the source."""
+    fieldnames = reader.fieldnames
+    return tuple(fieldnames) if fieldnames is not None else None
+
+
+def is_ascii_compatible(encoding: str) -> bool:
+    """Check if newline is encoded as a single standalone `\\n` byte."""
+    return "\n\n".encode(encoding).endswith(b"\n\n")
+
+
+def decode_lines(
+    stream: IO[bytes],
+    encoding: str,
+    errors: str = "strict",
+) -> Iterator[str]:
+    """Lazily decode binary stream into lines.
+
+    Every produced line, except the last one, ends with `\\n`, as expected by
+    `csv` module. Incremental decoder is used, so multibyte characters and
+    encodings that do not keep `\\n` as a standalone byte(UTF-16) are
+    supported.
+
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    tail = ""
+
+    for chunk in stream:
+        *lines, tail = (tail + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line + "\n"
 
-        return csv.DictReader(str_stream, **reader_options)
+    tail += decoder.decode(b"", True)
+    if tail:
+        yield tail
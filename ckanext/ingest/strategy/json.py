@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import codecs
+import json
+import logging
+import re
+from typing import IO, Any, Iterable, Iterator
+
+from ckanext.ingest import index, shared
+from ckanext.ingest.record import PackageRecord
+from ckanext.ingest.strategy.csv import OffsetLines, decode_lines, is_ascii_compatible
+
+log = logging.getLogger(__name__)
+
+# number of bytes read from the source at once by JsonItems
+CHUNK_SIZE = 64 * 1024
+
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+class JsonlStrategy(shared.ExtractionStrategy):
+    """Records from JSON Lines source, one per line.
+
+    Every non-empty line of the source must contain a JSON value, which is
+    used as a raw data of the record. Source is decoded and parsed line by
+    line, so memory consumption does not depend on the size of the
+    source. For seekable sources in ASCII-compatible encodings, strategy
+    reports byte offset of every line, so that ingestion can be resumed from
+    the checkpoint without parsing previous lines.
+
+    Options[extras]:
+
+        encoding: str - encoding of the source. Default: `utf-8-sig`
+
+        encoding_errors: str - error handling scheme for decoder. Default:
+        `strict`
+
+        offset_index: int - build an index with offset of every N-th record,
+        just as `CsvStrategy` does.
+
+    """
+
+    mimetypes = {
+        "application/jsonl",
+        "application/x-jsonlines",
+        "application/x-ndjson",
+    }
+    extensions = (".jsonl", ".ndjson")
+    record_factory = PackageRecord
+
+    # sources are recognized by extension of the filename
+    content_independent = True
+
+    # lines of the source that is currently parsed
+    _lines: OffsetLines | None = None
+    # byte offset of the first record for the next extraction
+    _start: int | None = None
+
+    @classmethod
+    def can_handle(cls, mime: str | None, source: shared.Storage) -> bool:
+        filename = (source.filename or "").lower()
+        return super().can_handle(mime, source) or filename.endswith(cls.extensions)
+
+    def chunks(
+        self,
+        source: shared.Storage,
+        options: shared.StrategyOptions,
+    ) -> Iterable[Any]:
+        encoding = shared.get_extra(options, "encoding", "utf-8-sig")
+        errors = shared.get_extra(options, "encoding_errors", "strict")
+
+        if not is_ascii_compatible(encoding) or not shared.is_seekable(source.stream):
+            self._lines = None
+            return _parse_lines(decode_lines(source.stream, encoding, errors))
+
+        lines = self._lines = OffsetLines(source.stream, encoding, errors)
+        if self._start is not None:
+            lines.seek(self._start)
+
+        return _parse_lines(lines)
+
+    def locate(
+        self,
+        source: shared.Storage,
+        options: shared.StrategyOptions,
+        number: int,
+    ) -> tuple[int, Any] | None:
+        step: int = shared.get_extra(options, "offset_index", 0)
+        encoding = shared.get_extra(options, "encoding", "utf-8-sig")
+        if not step or not is_ascii_compatible(encoding):
+            return None
+
+        offsets = index.get_index(
+            source.stream,
+            step,
+            {"format": "jsonl"},
+            lambda: self._build_index(source.stream, step),
+        )
+        return offsets.locate(number) if offsets else None
+
+    def _build_index(self, stream: IO[bytes], step: int) -> list[int]:
+        """Offsets of every `step`-th non-empty line.
+
+        Lines are not decoded or parsed, because in ASCII-compatible
+        encodings empty lines consist only of whitespace bytes.
+
+        """
+        start = offset = stream.tell()
+        positions: list[int] = []
+        number = 0
+
+        for line in iter(stream.readline, b""):
+            if line.strip():
+                if not number % step:
+                    positions.append(offset)
+                number += 1
+            offset += len(line)
+
+        stream.seek(start)
+        return positions
+
+    def tell(self) -> int | None:
+        """Byte offset of the line that follows the last extracted record."""
+        return self._lines.offset if self._lines else None
+
+    def seek(self, position: int):
+        self._start = position
+
+
+class JsonArrayStrategy(shared.ExtractionStrategy):
+    """Records from elements of the array inside JSON document.
+
+    Document is parsed incrementally: only the current element of the array
+    is kept in memory. Values that precede the array inside the document are
+    parsed and discarded, and the rest of the document after the array is not
+    read at all.
+
+    Strategy is not used during autodetection, because JSON documents have
+    arbitrary structure. Select it explicitly, or subclass it and specify
+    `mimetypes`.
+
+    Options[extras]:
+
+        pointer: str - JSON pointer(RFC 6901) to the array, e.g.
+        `/data/items`. Default: empty string, i.e. the whole document is an
+        array. If pointer refers to a value that is not an array, this value
+        is used as the only record. If pointer refers to the missing value,
+        nothing is extracted.
+
+        encoding: str - encoding of the source. Default: `utf-8-sig`
+
+        encoding_errors: str - error handling scheme for decoder. Default:
+        `strict`
+
+    """
+
+    record_factory = PackageRecord
+
+    def chunks(
+        self,
+        source: shared.Storage,
+        options: shared.StrategyOptions,
+    ) -> Iterable[Any]:
+        return JsonItems(
+            source.stream,
+            shared.get_extra(options, "pointer", ""),
+            shared.get_extra(options, "encoding", "utf-8-sig"),
+            shared.get_extra(options, "encoding_errors", "strict"),
+        )
+
+
+class JsonItems:
+    """Elements of the array inside JSON document, parsed one by one.
+
+    Source is decoded by chunks into a buffer, and every value is parsed by
+    `json.JSONDecoder.raw_decode` as soon as the buffer contains the whole
+    value. Consumed part of the buffer is dropped when the next chunk is read.
+
+    """
+
+    def __init__(
+        self,
+        stream: IO[bytes],
+        pointer: str = "",
+        encoding: str = "utf-8-sig",
+        errors: str = "strict",
+        size: int = CHUNK_SIZE,
+    ):
+        self.stream = stream
+        self.path = parse_pointer(pointer)
+        self.size = size
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors)
+        self.parser = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self._find():
+            log.warning("JSON pointer %s does not exist", format_pointer(self.path))
+            return
+
+        if self._peek() != "[":
+            yield self._value()
+            return
+
+        self.pos += 1
+        if self._peek() == "]":
+            return
+
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
+
+    def _find(self) -> bool:
+        """Move to the value referred by the pointer."""
+        for key in self.path:
+            char = self._peek()
+            if char == "{":
+                found = self._member(key)
+            elif char == "[" and key.isdigit():
+                found = self._element(int(key))
+            else:
+                found = False
+
+            if not found:
+                return False
+
+        return True
+
+    def _member(self, key: str) -> bool:
+        """Move to the value of the object's member."""
+        self.pos += 1
+        if self._peek() == "}":
+            return False
+
+        while True:
+            self._expect('"', consume=False)
+            name = self._value()
+            self._expect(":")
+            if name == key:
+                return True
+
+            self._value()
+            if self._expect(",}") == "}":
+                return False
+
+    def _element(self, number: int) -> bool:
+        """Move to the element of the array."""
+        self.pos += 1
+        if self._peek() == "]":
+            return False
+
+        for _ in range(number):
+            self._value()
+            if self._expect(",]") == "]":
+                return False
+
+        return True
+
+    def _fill(self) -> bool:
+        """Read the next chunk of the source into the buffer.
+
+        The more data is required to complete the current value, the bigger
+        chunk is read, so big values are not re-parsed too many times.
+
+        """
+        if self.eof:
+            return False
+
+        chunk = self.stream.read(max(self.size, len(self.buffer) - self.pos))
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos :] + self.decoder.decode(chunk, self.eof)
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespaces and return the next character."""
+        while True:
+            self.pos = _whitespace.match(self.buffer, self.pos).end()  # type: ignore
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str, consume: bool = True) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            msg = "Expecting " + " or ".join(f"'{c}'" for c in chars)
+            raise json.JSONDecodeError(msg, self.buffer, self.pos)
+
+        if consume:
+            self.pos += 1
+        return char
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self.parser.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+
+            # number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+
+            self.pos = end
+            return value
+
+
+def _parse_lines(lines: Iterable[str]) -> Iterator[Any]:
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def parse_pointer(pointer: str) -> list[str]:
+    """Split JSON pointer into unescaped keys."""
+    if not pointer:
+        return []
+
+    if not pointer.startswith("/"):
+        msg = f"JSON pointer must start with '/': {pointer}"
+        raise ValueError(msg)
+
+    return [
+        key.replace("~1", "/").replace("~0", "~") for key in pointer[1:].split("/")
+    ]
+
+
+def format_pointer(path: list[str]) -> str:
+    return "".join("/" + key.replace("~", "~0").replace("/", "~1") for key in path)
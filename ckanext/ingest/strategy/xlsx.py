@@ -6,13 +6,28 @@ resources to rewrite it and create a proper base XLSX strategy.
 """
 from __future__ import annotations
 
+import functools
 import logging
-from typing import IO, Callable, Iterable, TypedDict, cast
+import posixpath
+import zipfile
+from typing import IO, Any, Callable, Iterable, Iterator, TypedDict, cast
 
-from ckanext.ingest import shared
+from ckanext.ingest import parallel, shared
 
 try:
     from openpyxl import Workbook, load_workbook
+    from openpyxl.styles.numbers import (
+        BUILTIN_FORMATS,
+        is_date_format,
+        is_timedelta_format,
+    )
+    from openpyxl.utils.cell import range_boundaries
+    from openpyxl.utils.datetime import (
+        MAC_EPOCH,
+        WINDOWS_EPOCH,
+        from_excel,
+        from_ISO8601,
+    )
     from openpyxl.worksheet.worksheet import Worksheet
 
     is_installed = True
@@ -21,11 +36,21 @@ except ImportError:
 
 log = logging.getLogger(__name__)
 
+_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_DIMENSION = f"{{{_MAIN}}}dimension"
+_ROW = f"{{{_MAIN}}}row"
+_CELL = f"{{{_MAIN}}}c"
+_VALUE = f"{{{_MAIN}}}v"
+_INLINE = f"{{{_MAIN}}}is"
+_TEXT = f"{{{_MAIN}}}t"
+_RUN = f"{{{_MAIN}}}r"
+
 
 class XlsxChunk(TypedDict):
-    sheet: Worksheet
-    document: Workbook
-    locator: Callable[[str], Worksheet | None]
+    sheet: Worksheet | LxmlWorksheet
+    document: Workbook | LxmlWorkbook
+    locator: Callable[[str], Worksheet | LxmlWorksheet | None]
 
 
 class XlsxStrategy(shared.ExtractionStrategy):
@@ -41,6 +66,27 @@ class XlsxStrategy(shared.ExtractionStrategy):
         with_header: bool - parse rows as dict, using the first row for names.
         When unset, every row parsed as a list.
 
+        engine: str - `openpyxl`(default) or `lxml`. `lxml` engine reads
+        values directly from the XML of sheets and it's noticeably faster on
+        big sheets. Chunks produced by it contain `LxmlWorksheet` and
+        `LxmlWorkbook` instead of objects from openpyxl. lxml is imported
+        only when this engine is used.
+
+        processes: int - parse sheets in parallel, using the given number of
+        processes(at most, the number of CPUs). Records of every sheet are
+        collected by the worker and sent back together, so memory is bounded
+        by the size of sheets, not by the number of rows. Ignored when the
+        current process is multi-threaded, e.g. inside web request.
+
+        ordered: bool - produce records of sheets in order of sheets, when
+        `processes` is set. By default, records of the sheet that is parsed
+        first are produced first.
+
+        inflight: int - max number of sheets that are parsed or kept in
+        memory at once, when `processes` is set. Default: `2 * processes`.
+        Every one of them holds all records of the sheet, so lower it when
+        workbook contains big sheets.
+
     """
 
     mimetypes = {"application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
@@ -50,7 +96,7 @@ class XlsxStrategy(shared.ExtractionStrategy):
         source: shared.Storage,
         options: shared.StrategyOptions,
     ) -> Iterable[XlsxChunk]:
-        doc = load_workbook(cast(IO[bytes], source), read_only=True, data_only=True)
+        doc = self._open(cast(IO[bytes], source.stream), options)
         sheets = options.get("extras", {}).get("sheets", doc.sheetnames)
 
         for sheet in doc:
@@ -63,27 +109,433 @@ class XlsxStrategy(shared.ExtractionStrategy):
                 "locator": lambda name: doc[name] if name in doc else None,
             }
 
+    def _open(
+        self,
+        stream: IO[bytes],
+        options: shared.StrategyOptions,
+    ) -> Workbook | LxmlWorkbook:
+        """Open workbook using the engine from options."""
+        if shared.get_extra(options, "engine", "openpyxl") == "lxml":
+            return LxmlWorkbook(stream)
+
+        return load_workbook(stream, read_only=True, data_only=True)
+
+    def rows(
+        self,
+        chunk: XlsxChunk,
+        options: shared.StrategyOptions,
+    ) -> Iterable[dict[str, Any] | list[Any]]:
+        """Values of rows from the sheet of the chunk."""
+        extras = options.get("extras", {})
+
+        rows = chunk["sheet"].iter_rows(
+            min_row=extras.get("min_row"),
+            max_row=extras.get("max_row"),
+            min_col=extras.get("min_col"),
+            max_col=extras.get("max_col"),
+            values_only=True,
+        )
+        if not extras.get("with_header"):
+            yield from map(list, rows)
+            return
+
+        header = next(rows, None)
+        if header is None:
+            return
+
+        for values in rows:
+            yield dict(zip(header, values))
+
     def extract(
         self, source: shared.Storage, options: shared.StrategyOptions,
     ) -> Iterable[shared.Record]:
-        extras = options.get("extras", {})
+        processes = parallel.pool_size(options)
+        if processes:
+            yield from self._extract_parallel(source, options, processes)
+            return
 
         for chunk in self.chunks(source, options):
-            rows = chunk["sheet"].iter_rows(
-                min_row=extras.get("min_row"),
-                max_row=extras.get("max_row"),
-                min_col=extras.get("min_col"),
-                max_col=extras.get("max_col"),
-            )
-            header = None
-            if extras.get("with_header"):
-                header = [c.value for c in next(rows)]
-
-            for row in rows:
-                values = [c.value for c in row]
-                data = dict(zip(header, values)) if header else values
-
+            for data in self.rows(chunk, options):
                 yield self.chunk_into_record(
                     {"row": data},
                     options,
                 )
+
+    def _extract_parallel(
+        self,
+        source: shared.Storage,
+        options: shared.StrategyOptions,
+        processes: int,
+    ) -> Iterable[shared.Record]:
+        with parallel.materialize(cast(IO[bytes], source.stream)) as path:
+            with open(path, "rb") as stream:
+                doc = self._open(stream, options)
+                try:
+                    titles = doc.sheetnames
+                finally:
+                    doc.close()
+
+            sheets = shared.get_extra(options, "sheets", titles)
+            worker = functools.partial(
+                self._extract_sheet,
+                path,
+                parallel.portable(options),
+            )
+            yield from parallel.extract(
+                [title for title in titles if title in sheets],
+                worker,
+                processes,
+                shared.get_extra(options, "ordered", False),
+                shared.get_extra(options, "inflight", 0),
+            )
+
+    def _extract_sheet(
+        self,
+        path: str,
+        options: shared.StrategyOptions,
+        title: str,
+    ) -> list[shared.Record]:
+        """Extract records from the single sheet inside worker process."""
+        options = shared.with_extras(options, {"sheets": [title]}, patch=True)
+        with open(path, "rb") as stream:
+            return list(self.extract(shared.make_storage(stream), options))
+
+
+class LxmlWorkbook:
+    """Workbook that reads values of cells directly from XML of sheets.
+
+    Implements the part of read-only `openpyxl.Workbook` interface that is
+    used by `XlsxStrategy`: iteration over worksheets, access to worksheets
+    by title and `sheetnames`. Shared strings and styles are parsed once, when
+    values of any sheet are requested for the first time.
+
+    """
+
+    def __init__(self, stream: IO[bytes]):
+        self.archive = zipfile.ZipFile(stream)
+        self.epoch = WINDOWS_EPOCH
+        self.loaded = False
+        self.strings: list[str] = []
+        # indexes of cell styles that format numbers as dates or durations
+        self.dates: set[int] = set()
+        self.durations: set[int] = set()
+
+        workbook = _rels_target(self.archive, "", "officeDocument")
+        base = posixpath.dirname(workbook)
+        self._parts = _relationships(self.archive, workbook)
+
+        root = _parse(self.archive.read(workbook))
+        props = root.find(f"{{{_MAIN}}}workbookPr")
+        if props is not None and props.get("date1904") in ("1", "true"):
+            self.epoch = MAC_EPOCH
+
+        self._base = base
+        # paths to XML of worksheets by title
+        self.sheets: dict[str, str] = {}
+        for sheet in root.iter(f"{{{_MAIN}}}sheet"):
+            kind, target = self._parts.get(sheet.get(f"{{{_REL}}}id", ""), ("", ""))
+            if kind == "worksheet":
+                self.sheets[sheet.get("name", "")] = _join(base, target)
+
+    @property
+    def sheetnames(self) -> list[str]:
+        return list(self.sheets)
+
+    def __iter__(self) -> Iterator[LxmlWorksheet]:
+        return (LxmlWorksheet(self, title) for title in self.sheets)
+
+    def __contains__(self, title: str) -> bool:
+        return title in self.sheets
+
+    def __getitem__(self, title: str) -> LxmlWorksheet:
+        if title not in self.sheets:
+            raise KeyError(title)
+
+        return LxmlWorksheet(self, title)
+
+    def close(self):
+        self.archive.close()
+
+    def load(self):
+        """Parse shared strings and styles, if they are not parsed yet."""
+        from lxml import etree
+
+        if self.loaded:
+            return
+
+        self.loaded = True
+        self._parse_styles()
+
+        path = self._part("sharedStrings")
+        if path:
+            with self.archive.open(path) as src:
+                for _event, node in etree.iterparse(
+                    src,
+                    tag=f"{{{_MAIN}}}si",
+                    resolve_entities=False,
+                ):
+                    self.strings.append(_text(node).replace("x005F_", ""))
+                    node.clear()
+
+    def _part(self, kind: str) -> str | None:
+        for part, target in self._parts.values():
+            if part == kind:
+                return _join(self._base, target)
+
+        return None
+
+    def _parse_styles(self):
+        path = self._part("styles")
+        if not path:
+            return
+
+        root = _parse(self.archive.read(path))
+        formats = dict(BUILTIN_FORMATS)
+        for fmt in root.iter(f"{{{_MAIN}}}numFmt"):
+            formats[int(fmt.get("numFmtId", 0))] = fmt.get("formatCode", "")
+
+        xfs = root.find(f"{{{_MAIN}}}cellXfs")
+        if xfs is None:
+            return
+
+        for idx, xf in enumerate(xfs.iter(f"{{{_MAIN}}}xf")):
+            fmt = formats.get(int(xf.get("numFmtId", 0)))
+            if is_timedelta_format(fmt):
+                self.durations.add(idx)
+            elif is_date_format(fmt):
+                self.dates.add(idx)
+
+
+class LxmlWorksheet:
+    """Worksheet that produces values of cells using `lxml.etree.iterparse`.
+
+    Only `values_only` iteration is supported. Rows and cells missing from
+    XML are filled with `None`, using dimensions of the sheet, just as in
+    read-only mode of openpyxl.
+
+    Conversion of cells and filling of gaps follow `WorkSheetParser` from
+    `openpyxl.worksheet._reader` and `ReadOnlyWorksheet` from
+    `openpyxl.worksheet._read_only`(MIT license, Copyright (c) 2010 openpyxl).
+
+    """
+
+    def __init__(self, parent: LxmlWorkbook, title: str):
+        self.parent = parent
+        self.title = title
+        self.path = parent.sheets[title]
+        # converters of cell values by the type of the cell
+        self._converters: dict[str, Callable[[str, Any], Any]] = {
+            "n": self._number,
+            "s": self._string,
+            "b": lambda value, _cell: bool(int(value)),
+            "d": lambda value, _cell: from_ISO8601(value),
+        }
+
+    def iter_rows(  # noqa: PLR0913
+        self,
+        min_row: int | None = None,
+        max_row: int | None = None,
+        min_col: int | None = None,
+        max_col: int | None = None,
+        values_only: bool = True,
+    ) -> Iterator[tuple[Any, ...]]:
+        if not values_only:
+            msg = "lxml engine produces only values of cells"
+            raise ValueError(msg)
+
+        from lxml import etree
+
+        self.parent.load()
+        min_row = min_row or 1
+        min_col = min_col or 1
+        counter = min_row
+        idx = 0
+        empty: tuple[Any, ...] = ()
+
+        with self.parent.archive.open(self.path) as src:
+            for _event, node in etree.iterparse(
+                src,
+                tag=(_DIMENSION, _ROW),
+                resolve_entities=False,
+            ):
+                if node.tag == _DIMENSION:
+                    max_row, max_col, empty = _limits(node, min_col, max_row, max_col)
+                    continue
+
+                idx = int(node.get("r", idx + 1))
+                if max_row is not None and idx > max_row:
+                    break
+
+                # some rows are missing
+                for _ in range(counter, idx):
+                    counter += 1
+                    yield empty
+
+                if counter <= idx:
+                    counter += 1
+                    yield self._values(node, min_col, max_col)
+
+                _release(node)
+
+        if max_row is not None and max_row < idx:
+            for _ in range(counter, max_row + 1):
+                yield empty
+
+    def _values(
+        self,
+        row: Any,
+        min_col: int,
+        max_col: int | None,
+    ) -> tuple[Any, ...]:
+        cells: list[tuple[int, Any]] = []
+        column = 0
+        for cell in row.iterchildren(_CELL):
+            ref = cell.get("r")
+            column = _column(ref) if ref else column + 1
+            cells.append((column, self._value(cell)))
+
+        if not cells and not max_col:
+            return ()
+
+        last = max_col or cells[-1][0]
+        values: list[Any] = [None] * (last + 1 - min_col)
+        for column, value in cells:
+            if min_col <= column <= last:
+                values[column - min_col] = value
+
+        return tuple(values)
+
+    def _value(self, cell: Any) -> Any:
+        kind = cell.get("t", "n")
+        if kind == "inlineStr":
+            child = cell.find(_INLINE)
+            return None if child is None else _text(child)
+
+        value = cell.findtext(_VALUE) or None
+        if value is None:
+            return None
+
+        # errors(`e`) and formula strings(`str`) are kept as-is
+        convert = self._converters.get(kind)
+        return value if convert is None else convert(value, cell)
+
+    def _string(self, value: str, _cell: Any) -> str:
+        return self.parent.strings[int(value)]
+
+    def _number(self, value: str, cell: Any) -> Any:
+        style = int(cell.get("s", 0))
+        number = float(value) if any(c in value for c in ".Ee") else int(value)
+        if style not in self.parent.dates and style not in self.parent.durations:
+            return number
+
+        try:
+            return from_excel(
+                number,
+                self.parent.epoch,
+                timedelta=style in self.parent.durations,
+            )
+        except (OverflowError, ValueError):
+            # openpyxl treats such cells as errors
+            return "#VALUE!"
+
+
+def _parse(data: bytes) -> Any:
+    """Parse XML part of the workbook without resolving entities."""
+    # lxml is required only by lxml engine
+    from lxml import etree
+
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    return etree.fromstring(data, parser)  # noqa: S320
+
+
+def _release(node: Any):
+    """Free memory used by the processed element and its preceding siblings."""
+    node.clear()
+    while node.getprevious() is not None:
+        del node.getparent()[0]
+
+
+def _text(node: Any) -> str:
+    """Text of the string item, excluding phonetic runs."""
+    # plain string, without rich text
+    if len(node) == 1 and node[0].tag == _TEXT:
+        return node[0].text or ""
+
+    parts = [node.findtext(_TEXT) or ""]
+    parts.extend(run.findtext(_TEXT) or "" for run in node.iterchildren(_RUN))
+    return "".join(parts)
+
+
+def _column(ref: str) -> int:
+    """Index of the column from the cell reference(`AB12` -> 28)."""
+    column = 0
+    for char in ref:
+        if char.isdigit():
+            break
+        column = column * 26 + ord(char) - 64
+
+    return column
+
+
+def _limits(
+    dimension: Any,
+    min_col: int,
+    max_row: int | None,
+    max_col: int | None,
+) -> tuple[int | None, int | None, tuple[Any, ...]]:
+    """Last row and column of the scope and empty row, using sheet dimension.
+
+    Explicit limits take precedence over dimension of the sheet.
+
+    """
+    _min_col, _min_row, last_col, last_row = _boundaries(dimension.get("ref", ""))
+    max_col = max_col or last_col
+    max_row = max_row or last_row
+    empty = (None,) * (max_col + 1 - min_col) if max_col else ()
+    return max_row, max_col, empty
+
+
+def _boundaries(ref: str) -> tuple[int | None, ...]:
+    if not ref:
+        return None, None, None, None
+
+    return range_boundaries(ref)
+
+
+def _join(base: str, target: str) -> str:
+    if target.startswith("/"):
+        return target[1:]
+
+    return posixpath.normpath(posixpath.join(base, target))
+
+
+def _rels_target(archive: zipfile.ZipFile, path: str, kind: str) -> str:
+    for part, target in _relationships(archive, path).values():
+        if part == kind:
+            return _join(posixpath.dirname(path), target)
+
+    return "xl/workbook.xml"
+
+
+def _relationships(archive: zipfile.ZipFile, path: str) -> dict[str, tuple[str, str]]:
+    """Relationships of the package part as `{id: (type, target)}`.
+
+    Type contains only the last segment of the relationship type URI.
+
+    """
+    rels = posixpath.join(
+        posixpath.dirname(path),
+        "_rels",
+        posixpath.basename(path) + ".rels",
+    )
+    if rels not in archive.namelist():
+        return {}
+
+    root = _parse(archive.read(rels))
+    return {
+        rel.get("Id", ""): (
+            rel.get("Type", "").rsplit("/", 1)[-1],
+            rel.get("Target", ""),
+        )
+        for rel in root
+    }
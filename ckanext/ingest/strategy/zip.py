@@ -1,16 +1,17 @@
 from __future__ import annotations
 
+import contextlib
+import functools
 import logging
 import mimetypes
 import os
 import zipfile
 from fnmatch import fnmatch
-from io import BytesIO
 from typing import IO, Callable, Iterable
 
 from typing_extensions import TypedDict
 
-from ckanext.ingest import shared
+from ckanext.ingest import parallel, shared
 
 log = logging.getLogger(__name__)
 
@@ -29,6 +30,10 @@ class ZipStrategy(shared.ExtractionStrategy):
     strategies found, file is ignored. Every nested ZIP archive ingested in the
     same manner as a top-level archive.
 
+    Archive is read directly from the seekable source. Non-seekable sources
+    and nested archives are copied into temporary file first, so archive is
+    never kept in memory.
+
     Options:
 
         nested_strategy: str - extraction strategy applied to files in the
@@ -39,10 +44,38 @@ class ZipStrategy(shared.ExtractionStrategy):
         extras["relative_locator"]: bool - file locator treat names as relative
         to the currently parsed file
 
+        extras["processes"]: int - extract files in parallel, using the given
+        number of processes(at most, the number of CPUs). Records of every
+        file are collected by the worker and sent back together. Locator from
+        options is not available inside workers. Ignored when the current
+        process is multi-threaded, e.g. inside web request.
+
+        extras["ordered"]: bool - produce records of files in order of the
+        archive, when `processes` is set. By default, records of the file that
+        is parsed first are produced first.
+
+        extras["inflight"]: int - max number of files that are parsed or kept
+        in memory at once, when `processes` is set. Default: `2 * processes`.
+
     """
 
     mimetypes = {"application/zip"}
 
+    # instances of nested strategies, created once per import
+    _handlers: dict[type[shared.ExtractionStrategy], shared.ExtractionStrategy]
+
+    def __init__(self):
+        self._handlers = {type(self): self}
+
+    def _get_handler(
+        self,
+        strategy: type[shared.ExtractionStrategy],
+    ) -> shared.ExtractionStrategy:
+        if strategy not in self._handlers:
+            self._handlers[strategy] = strategy()
+
+        return self._handlers[strategy]
+
     def _make_locator(self, archive: zipfile.ZipFile, path: str | None = None):
         def locator(name: str):
             if path:
@@ -64,50 +97,152 @@ class ZipStrategy(shared.ExtractionStrategy):
         source: shared.Storage,
         options: shared.StrategyOptions,
     ) -> Iterable[ZipChunk]:
-        with zipfile.ZipFile(BytesIO(source.read())) as archive:
-            extras = options.get("extras", {})
-            glob: str = extras.get("glob", "")
+        with contextlib.ExitStack() as stack:
+            stream: IO[bytes] = source.stream
+            if isinstance(stream, zipfile.ZipExtFile) or not shared.is_seekable(
+                stream,
+            ):
+                # zipfile jumps between the central directory and members
+                # of the archive. Seeking inside nested archive requires
+                # decompression from the beginning of the member, so nested
+                # archives are spilled to disk just as non-seekable uploads.
+                stream = stack.enter_context(shared.spool(stream))
+
+            archive = stack.enter_context(zipfile.ZipFile(stream))
+            yield from self._members(archive, options)
+
+    def _members(
+        self,
+        archive: zipfile.ZipFile,
+        options: shared.StrategyOptions,
+    ) -> Iterable[ZipChunk]:
+        for info in self._infos(archive, options):
+            chunk = self._member(archive, info, options)
+            if not chunk:
+                continue
 
-            for item in archive.namelist():
-                if glob and not fnmatch(item, glob):
-                    continue
+            yield chunk
+            chunk["source"].close()
 
-                locator = self._make_locator(
-                    archive,
-                    os.path.dirname(item) if extras.get("relative_locator") else None,
-                )
+    def _infos(
+        self,
+        archive: zipfile.ZipFile,
+        options: shared.StrategyOptions,
+    ) -> Iterable[zipfile.ZipInfo]:
+        """Files from the archive that match `glob`."""
+        glob: str = options.get("extras", {}).get("glob", "")
+
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+
+            if glob and not fnmatch(info.filename, glob):
+                continue
+
+            yield info
 
-                mime, _encoding = mimetypes.guess_type(item)
-                if strategy := options.get("nested_strategy"):
-                    handler = shared.strategies[strategy]()
-                else:
-                    handler = shared.get_handler_for_mimetype(
-                        mime,
-                        shared.make_storage(
-                            archive.open(item),
-                            os.path.basename(item),
-                            mime,
-                        ),
-                    )
-                    if not handler:
-                        log.debug("Skip %s with MIMEType %s", item, mime)
-                        continue
-
-                yield {
-                    "handler": handler,
-                    "name": item,
-                    "source": shared.make_storage(archive.open(item)),
-                    "locator": locator,
-                }
+    def _member(
+        self,
+        archive: zipfile.ZipFile,
+        info: zipfile.ZipInfo,
+        options: shared.StrategyOptions,
+    ) -> ZipChunk | None:
+        """Open the file from archive, if there is a strategy for it."""
+        item = info.filename
+        relative = options.get("extras", {}).get("relative_locator")
+        locator = self._make_locator(
+            archive,
+            os.path.dirname(item) if relative else None,
+        )
+
+        mime, _encoding = mimetypes.guess_type(item)
+        member = shared.make_storage(
+            archive.open(info),
+            os.path.basename(item),
+            mime,
+        )
+
+        if name := options.get("nested_strategy"):
+            strategy = shared.strategies[name]
+        else:
+            strategy = shared.strategies.resolve(mime, member)
+            if not strategy:
+                log.debug("Skip %s with MIMEType %s", item, mime)
+                member.close()
+                return None
+
+            # strategy may read the member while checking if it's
+            # supported
+            if member.stream.tell():
+                member.stream.seek(0)
+
+        return {
+            "handler": self._get_handler(strategy),
+            "name": item,
+            "source": member,
+            "locator": locator,
+        }
 
     def extract(
         self,
         source: shared.Storage,
         options: shared.StrategyOptions,
     ) -> Iterable[shared.Record]:
+        processes = parallel.pool_size(options)
+        if processes:
+            yield from self._extract_parallel(source, options, processes)
+            return
+
         for chunk in self.chunks(source, options):
-            nested_options = shared.StrategyOptions(
-                options,
-                locator=chunk["locator"],
+            yield from self._extract_chunk(chunk, options)
+
+    def _extract_chunk(
+        self,
+        chunk: ZipChunk,
+        options: shared.StrategyOptions,
+    ) -> Iterable[shared.Record]:
+        nested_options = shared.StrategyOptions(
+            options,
+            locator=chunk["locator"],
+        )
+        return chunk["handler"].extract(chunk["source"], nested_options)
+
+    def _extract_parallel(
+        self,
+        source: shared.Storage,
+        options: shared.StrategyOptions,
+        processes: int,
+    ) -> Iterable[shared.Record]:
+        with parallel.materialize(source.stream) as path:
+            with zipfile.ZipFile(path) as archive:
+                names = [info.filename for info in self._infos(archive, options)]
+
+            worker = functools.partial(
+                self._extract_member,
+                path,
+                parallel.portable(options),
             )
-            yield from chunk["handler"].extract(chunk["source"], nested_options)
+            yield from parallel.extract(
+                names,
+                worker,
+                processes,
+                shared.get_extra(options, "ordered", False),
+                shared.get_extra(options, "inflight", 0),
+            )
+
+    def _extract_member(
+        self,
+        path: str,
+        options: shared.StrategyOptions,
+        name: str,
+    ) -> list[shared.Record]:
+        """Extract records from the single file inside worker process."""
+        with zipfile.ZipFile(path) as archive:
+            chunk = self._member(archive, archive.getinfo(name), options)
+            if not chunk:
+                return []
+
+            try:
+                return list(self._extract_chunk(chunk, options))
+            finally:
+                chunk["source"].close()
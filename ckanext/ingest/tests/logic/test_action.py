@@ -1,13 +1,19 @@
 import mimetypes
 import os
+import uuid
 from typing import Optional
+from unittest import mock
 
 import pytest
+from sqlalchemy.exc import SQLAlchemyError
 
 import ckan.plugins.toolkit as tk
+from ckan import model
 from ckan.tests.helpers import call_action
 
-from ckanext.ingest import shared
+from ckanext.ingest import config, job, shared
+from ckanext.ingest.db import Fingerprint
+from ckanext.ingest.record import PackageRecord
 
 
 @pytest.fixture(scope="session")
@@ -60,6 +66,394 @@ class TestImportRecords:
         with pytest.raises(tk.ValidationError):
             call_action("ingest_import_records")
 
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_thread_workers(self, source, workers):
+        result = call_action(
+            "ingest_import_records",
+            source=source("example.csv"),
+            workers=workers,
+            report="details",
+        )
+        assert [r["result"]["result"]["name"] for r in result] == ["hello", "world"]
+
     def test_unmapped(self, source):
         result = call_action("ingest_import_records", source=source("unmapped.csv"))
         assert result == {"fail": 2, "success": 0}
+
+    def test_same_entity_in_next_window(self, monkeypatch, ckan_config):
+        monkeypatch.setitem(ckan_config, config.CONFIG_PREFETCH_WINDOW, 1)
+        source = shared.make_storage(
+            "name,title\nhello,Hello\nhello,Updated\n",
+            "data.csv",
+            "text/csv",
+        )
+        result = call_action(
+            "ingest_import_records",
+            source=source,
+            workers=2,
+            options={"record_options": {"update_existing": True}},
+            report="details",
+        )
+
+        assert [r["result"]["details"]["action"] for r in result] == [
+            "package_create",
+            "package_update",
+        ]
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestResume:
+    @pytest.fixture()
+    def storage(self, monkeypatch, tmp_path, ckan_config):
+        monkeypatch.setitem(ckan_config, config.CONFIG_STORAGE_PATH, str(tmp_path))
+        return tmp_path
+
+    def test_resume_after_failure(self, source, storage, monkeypatch):
+        ingest = PackageRecord.ingest
+
+        def crash(self, context):
+            if self.data["name"] == "world":
+                raise RuntimeError
+            return ingest(self, context)
+
+        monkeypatch.setattr(PackageRecord, "ingest", crash)
+        with pytest.raises(RuntimeError):
+            call_action(
+                "ingest_import_records",
+                source=source("example.csv"),
+                checkpoint=1,
+            )
+
+        assert list((storage / "checkpoints").iterdir())
+
+        monkeypatch.setattr(PackageRecord, "ingest", ingest)
+        result = call_action(
+            "ingest_import_records",
+            source=source("example.csv"),
+            checkpoint=1,
+            resume=True,
+        )
+
+        assert result == {"fail": 0, "success": 2}
+        assert not list((storage / "checkpoints").iterdir())
+
+    def test_resume_without_checkpoint(self, source, storage):
+        result = call_action(
+            "ingest_import_records",
+            source=source("example.csv"),
+            resume=True,
+        )
+        assert result == {"fail": 0, "success": 2}
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestBatch:
+    def test_failed_record(self):
+        source = shared.make_storage(
+            "name\nfirst\nInvalid Name!\nsecond",
+            "data.csv",
+            "text/csv",
+        )
+        result = call_action(
+            "ingest_import_records",
+            source=source,
+            batch=True,
+            batch_size=2,
+        )
+
+        assert result == {"success": 2, "fail": 1}
+        assert call_action("package_show", id="first")
+        assert call_action("package_show", id="second")
+
+    @pytest.fixture()
+    def crash_on(self, monkeypatch):
+        ingest = PackageRecord.ingest
+
+        def setup(name: str):
+            def crash(self, context):
+                if self.data["name"] == name:
+                    raise RuntimeError
+                return ingest(self, context)
+
+            monkeypatch.setattr(PackageRecord, "ingest", crash)
+
+        return setup
+
+    def test_interrupted(self, crash_on):
+        source = shared.make_storage(
+            "name\nfirst\nsecond\nthird",
+            "data.csv",
+            "text/csv",
+        )
+        crash_on("third")
+
+        with pytest.raises(RuntimeError):
+            call_action(
+                "ingest_import_records",
+                source=source,
+                batch=True,
+                batch_size=2,
+            )
+
+        assert call_action("package_show", id="second")
+
+    def test_uncommitted_rolled_back(self, crash_on):
+        source = shared.make_storage("name\nfirst\nsecond", "data.csv", "text/csv")
+        crash_on("second")
+
+        with pytest.raises(RuntimeError):
+            call_action("ingest_import_records", source=source, batch=True)
+
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("package_show", id="first")
+
+    def test_workers_not_supported(self):
+        source = shared.make_storage("name\nfirst", "data.csv", "text/csv")
+        with pytest.raises(tk.ValidationError):
+            call_action("ingest_import_records", source=source, batch=True, workers=2)
+
+    def test_commit_failure(self, monkeypatch):
+        source = shared.make_storage(
+            "name\nfirst\nsecond\nthird",
+            "data.csv",
+            "text/csv",
+        )
+        commit = model.Session.commit
+        calls = []
+
+        def fail_once():
+            calls.append(True)
+            if len(calls) == 1:
+                raise SQLAlchemyError
+            commit()
+
+        monkeypatch.setattr(model.Session, "commit", fail_once)
+        result = call_action(
+            "ingest_import_records",
+            source=source,
+            batch=True,
+            batch_size=2,
+        )
+
+        assert result == {"success": 1, "fail": 2}
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("package_show", id="first")
+        assert call_action("package_show", id="third")
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestSkipUnchanged:
+    @pytest.fixture(autouse=True)
+    def migrate(self, migrate_db_for):
+        migrate_db_for("ingest")
+
+    def ingest(self, content: str):
+        return call_action(
+            "ingest_import_records",
+            source=shared.make_storage(content, "data.csv", "text/csv"),
+            options={"record_options": {"update_existing": True}},
+            skip_unchanged=True,
+        )
+
+    def test_unchanged(self):
+        content = "name,title\nfirst,First\nsecond,Second"
+        assert self.ingest(content) == {"success": 2, "fail": 0}
+        assert self.ingest(content) == {"success": 0, "fail": 0, "unchanged": 2}
+
+        result = self.ingest("name,title\nfirst,First\nsecond,Updated")
+        assert result == {"success": 1, "fail": 0, "unchanged": 1}
+        assert call_action("package_show", id="second")["title"] == "Updated"
+
+    def test_digests_prefetched(self, monkeypatch):
+        content = "name,title\nfirst,First\nsecond,Second"
+        self.ingest(content)
+
+        lookup = mock.Mock()
+        monkeypatch.setattr(Fingerprint, "lookup", lookup)
+
+        assert self.ingest(content) == {"success": 0, "fail": 0, "unchanged": 2}
+        assert not lookup.called
+
+    def test_deleted_entity(self):
+        content = "name,title\nfirst,First"
+        self.ingest(content)
+        call_action("package_delete", id="first")
+
+        assert self.ingest(content) == {"success": 1, "fail": 0}
+
+    def test_without_update(self):
+        content = "name,title\nfirst,First"
+        source = shared.make_storage(content, "data.csv", "text/csv")
+        call_action("ingest_import_records", source=source, skip_unchanged=True)
+
+        assert self.ingest(content) == {"success": 1, "fail": 0}
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestTiming:
+    def test_stats(self):
+        source = shared.make_storage(
+            "name\nfirst\nInvalid Name!",
+            "data.csv",
+            "text/csv",
+        )
+        result = call_action("ingest_import_records", source=source, timing=True)
+
+        stages = result["timing"]["stages"]
+        assert {"extract", "transform", "ingest"} <= set(stages)
+        assert stages["ingest"]["count"] == 2
+        assert sum(stages["ingest"]["histogram"].values()) == 2
+        assert len(result["timing"]["slowest"]) == 2
+
+    def test_details(self):
+        source = shared.make_storage("name\nfirst", "data.csv", "text/csv")
+        result = call_action(
+            "ingest_import_records",
+            source=source,
+            timing=True,
+            report="details",
+        )
+
+        assert set(result[0]["timing"]) == {"extract", "transform", "ingest"}
+
+    def test_disabled(self):
+        source = shared.make_storage("name\nfirst", "data.csv", "text/csv")
+        result = call_action("ingest_import_records", source=source)
+        assert "timing" not in result
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestStreamReport:
+    @pytest.fixture()
+    def storage(self, monkeypatch, tmp_path, ckan_config):
+        monkeypatch.setitem(ckan_config, config.CONFIG_STORAGE_PATH, str(tmp_path))
+        return tmp_path
+
+    def test_report_fields(self, storage):
+        source = shared.make_storage(
+            "name\nfirst\nInvalid Name!\nsecond",
+            "data.csv",
+            "text/csv",
+        )
+        result = call_action(
+            "ingest_import_records",
+            source=source,
+            report="stream",
+            report_fields=["name", "action"],
+        )
+        assert result["records"] == 3
+
+        page = call_action(
+            "ingest_report_show",
+            id=result["report_id"],
+            offset=1,
+            limit=1,
+        )
+        assert page["count"] == 3
+        assert page["results"] == [
+            {
+                "success": False,
+                "error": mock.ANY,
+                "data": {"name": "Invalid Name!"},
+            },
+        ]
+
+        last = call_action("ingest_report_show", id=result["report_id"], offset=2)
+        assert last["results"] == [
+            {"success": True, "result": {"name": "second", "action": "package_create"}},
+        ]
+
+    def test_missing_report(self, storage):
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("ingest_report_show", id=str(uuid.uuid4()))
+
+    def test_invalid_id(self, storage):
+        with pytest.raises(tk.ValidationError):
+            call_action("ingest_report_show", id="../../etc")
+
+
+@pytest.fixture()
+def fake_queue(monkeypatch, tmp_path, ckan_config):
+    """Collect background jobs instead of sending them to Redis."""
+    monkeypatch.setitem(ckan_config, config.CONFIG_STORAGE_PATH, str(tmp_path))
+    jobs = []
+
+    def enqueue_job(fn, args=None, kwargs=None, **rest):
+        jobs.append((fn, args or [], kwargs or {}))
+
+    def work():
+        while jobs:
+            fn, args, kwargs = jobs.pop(0)
+            fn(*args, **kwargs)
+
+    monkeypatch.setattr(tk, "enqueue_job", enqueue_job)
+    return work
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestBackgroundImport:
+    def test_queued(self, source, fake_queue):
+        status = call_action(
+            "ingest_import_records",
+            source=source("example.csv"),
+            background=True,
+        )
+        assert status["state"] == "queued"
+        assert call_action("ingest_job_status", id=status["id"]) == status
+
+    def test_finished(self, source, fake_queue):
+        status = call_action(
+            "ingest_import_records",
+            source=source("example.csv"),
+            background=True,
+        )
+        fake_queue()
+
+        status = call_action("ingest_job_status", id=status["id"])
+        assert status["state"] == "finished"
+        assert status["result"] == {"fail": 0, "success": 2}
+        assert status["processed"] == 2
+        assert status["completion"] == 1
+        assert call_action("package_show", id="hello")
+
+    def test_source_removed_after_failure(self, source, fake_queue, monkeypatch):
+        def crash(self, context):
+            raise RuntimeError
+
+        monkeypatch.setattr(PackageRecord, "ingest", crash)
+        status = call_action(
+            "ingest_import_records",
+            source=source("example.csv"),
+            background=True,
+        )
+        with pytest.raises(RuntimeError):
+            fake_queue()
+
+        assert call_action("ingest_job_status", id=status["id"])["state"] == "failed"
+        assert not os.path.exists(job.job_path(status["id"], "source"))
+
+    def test_expired_jobs_removed(self, source, fake_queue, ckan_config, monkeypatch):
+        monkeypatch.setitem(ckan_config, config.CONFIG_JOB_TTL, 60)
+        old = call_action(
+            "ingest_import_records",
+            source=source("example.csv"),
+            background=True,
+        )
+        os.utime(job.job_path(old["id"]), (0, 0))
+
+        call_action(
+            "ingest_import_records",
+            source=source("example.csv"),
+            background=True,
+        )
+
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("ingest_job_status", id=old["id"])
+
+    def test_missing_job(self, fake_queue):
+        with pytest.raises(tk.ObjectNotFound):
+            call_action("ingest_job_status", id=str(uuid.uuid4()))
+
+    def test_invalid_id(self, fake_queue):
+        with pytest.raises(tk.ValidationError):
+            call_action("ingest_job_status", id="../../etc")
@@ -0,0 +1,62 @@
+import os
+import uuid
+
+import pytest
+
+import ckan.plugins.toolkit as tk
+from ckan.tests import factories
+from ckan.tests.helpers import call_auth
+
+from ckanext.ingest import artifact, config, job
+
+
+@pytest.fixture()
+def storage(monkeypatch, tmp_path, ckan_config):
+    monkeypatch.setitem(ckan_config, config.CONFIG_STORAGE_PATH, str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.ckan_config("ckan.auth.create_unowned_dataset", True)
+@pytest.mark.usefixtures("clean_db", "storage")
+class TestJobStatus:
+    def make_job(self, user: str) -> str:
+        job_id = str(uuid.uuid4())
+        os.makedirs(job.job_path(job_id))
+        job.write_status(job_id, {"id": job_id, "user": user})
+        return job_id
+
+    def test_creator(self):
+        user = factories.User()
+        job_id = self.make_job(user["name"])
+        assert call_auth("ingest_job_status", {"user": user["name"]}, id=job_id)
+
+    def test_other_user(self):
+        user = factories.User()
+        job_id = self.make_job(factories.User()["name"])
+        with pytest.raises(tk.NotAuthorized):
+            call_auth("ingest_job_status", {"user": user["name"]}, id=job_id)
+
+    def test_sysadmin(self):
+        sysadmin = factories.Sysadmin()
+        job_id = self.make_job(factories.User()["name"])
+        assert call_auth("ingest_job_status", {"user": sysadmin["name"]}, id=job_id)
+
+
+@pytest.mark.ckan_config("ckan.auth.create_unowned_dataset", True)
+@pytest.mark.usefixtures("clean_db", "storage")
+class TestReportShow:
+    def make_report(self, user: str) -> str:
+        artifacts = artifact.make_artifacts("stream", user)
+        artifacts.collect()
+        return artifacts.id
+
+    def test_creator(self):
+        user = factories.User()
+        report_id = self.make_report(user["name"])
+        assert call_auth("ingest_report_show", {"user": user["name"]}, id=report_id)
+
+    def test_other_user(self):
+        user = factories.User()
+        report_id = self.make_report(factories.User()["name"])
+        with pytest.raises(tk.NotAuthorized):
+            call_auth("ingest_report_show", {"user": user["name"]}, id=report_id)
@@ -0,0 +1,65 @@
+from typing import Any
+
+import pytest
+
+from ckanext.ingest import shared
+
+
+class BatchRecord(shared.Record):
+    batches: list[int] = []
+
+    @classmethod
+    def transform_batch(cls, records: Any):
+        cls.batches.append(len(records))
+        for record in records:
+            record.data = dict(record.raw, batched=True)
+
+
+class NumberStrategy(shared.ExtractionStrategy):
+    record_factory = BatchRecord
+
+    def chunks(self, source: Any, options: Any):
+        return ({"number": n} for n in range(5))
+
+
+class NestedStrategy(NumberStrategy):
+    def extract(self, source: Any, options: Any):
+        yield from NumberStrategy().extract(source, options)
+
+
+class TestBatched:
+    def test_chunks(self):
+        source = shared.make_storage(b"")
+        batches = list(NumberStrategy().chunks_batched(source, {}, 2))
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+
+    def test_extract(self, monkeypatch):
+        monkeypatch.setattr(BatchRecord, "batches", [])
+        source = shared.make_storage(b"")
+
+        batches = list(NumberStrategy().extract_batched(source, {}, 3))
+
+        assert BatchRecord.batches == [3, 2]
+        assert [r.data for r in batches[0]] == [
+            {"number": 0, "batched": True},
+            {"number": 1, "batched": True},
+            {"number": 2, "batched": True},
+        ]
+
+    def test_custom_extract(self, monkeypatch):
+        monkeypatch.setattr(BatchRecord, "batches", [])
+        source = shared.make_storage(b"")
+
+        batches = list(NestedStrategy().extract_batched(source, {}, 4))
+
+        assert BatchRecord.batches == [4, 1]
+        assert sum(len(batch) for batch in batches) == 5
+
+
+class TestPosition:
+    def test_not_resumable(self):
+        strategy = NumberStrategy()
+
+        assert strategy.tell() is None
+        with pytest.raises(ValueError, match="NumberStrategy cannot resume"):
+            strategy.seek(10)
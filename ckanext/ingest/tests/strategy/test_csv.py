@@ -0,0 +1,101 @@
+import pytest
+
+from ckanext.ingest import config, shared
+from ckanext.ingest.strategy.csv import CsvStrategy, decode_lines
+
+
+class TestDecodeLines:
+    @pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16", "cp1251"])
+    def test_encodings(self, encoding):
+        text = "a,b\nпривіт,\"multi\nline\"\n"
+        stream = shared.make_storage(text.encode(encoding))
+
+        assert list(decode_lines(stream, encoding)) == [
+            "a,b\n",
+            "привіт,\"multi\n",
+            "line\"\n",
+        ]
+
+    def test_no_trailing_newline(self):
+        stream = shared.make_storage(b"a\r\nb")
+        assert list(decode_lines(stream, "utf-8")) == ["a\r\n", "b"]
+
+
+class TestCsvStrategy:
+    def test_bom_removed(self):
+        source = shared.make_storage("name,title\nhello,Hello\n".encode("utf-8-sig"))
+        rows = list(CsvStrategy().chunks(source, {}))
+
+        assert rows == [{"name": "hello", "title": "Hello"}]
+
+    def test_custom_encoding(self):
+        source = shared.make_storage("name\nпривіт\n".encode("utf-16"))
+        rows = list(CsvStrategy().chunks(source, {"extras": {"encoding": "utf-16"}}))
+
+        assert rows == [{"name": "привіт"}]
+
+    def test_resume_from_position(self):
+        source = shared.make_storage(b'name,title\na,"multi\nline"\nb,B\nc,C\n')
+        strategy = CsvStrategy()
+
+        rows = iter(strategy.chunks(source, {}))
+        assert next(rows) == {"name": "a", "title": "multi\nline"}
+        position = strategy.tell()
+
+        source.stream.seek(0)
+        strategy = CsvStrategy()
+        strategy.seek(position)
+
+        assert list(strategy.chunks(source, {})) == [
+            {"name": "b", "title": "B"},
+            {"name": "c", "title": "C"},
+        ]
+
+    def test_records_with_header(self):
+        source = shared.make_storage(b"name,title\nhello,Hello\n")
+        records = list(CsvStrategy().extract(source, {}))
+
+        assert records[0].header == ("name", "title")
+
+    def test_no_position_for_incompatible_encoding(self):
+        source = shared.make_storage("name\na\n".encode("utf-16"))
+        strategy = CsvStrategy()
+
+        list(strategy.chunks(source, {"extras": {"encoding": "utf-16"}}))
+        assert strategy.tell() is None
+
+
+class TestOffsetIndex:
+    @pytest.fixture()
+    def source(self):
+        rows = "".join(f'r{i},"multi\nline"\n' for i in range(50))
+        return shared.make_storage(f"name,title\n{rows}".encode())
+
+    @pytest.fixture(autouse=True)
+    def storage(self, monkeypatch, tmp_path, ckan_config):
+        monkeypatch.setitem(ckan_config, config.CONFIG_STORAGE_PATH, str(tmp_path))
+        return tmp_path
+
+    def test_disabled(self, source):
+        assert CsvStrategy().locate(source, {}, 30) is None
+
+    def test_locate(self, source, storage):
+        options: shared.StrategyOptions = {"extras": {"offset_index": 10}}
+        strategy = CsvStrategy()
+
+        number, position = strategy.locate(source, options, 35)
+        assert number == 30
+        assert source.stream.tell() == 0
+        assert list((storage / "indexes").iterdir())
+
+        strategy.seek(position)
+        assert next(iter(strategy.chunks(source, options)))["name"] == "r30"
+
+    def test_cached(self, source, monkeypatch):
+        options: shared.StrategyOptions = {"extras": {"offset_index": 10}}
+        CsvStrategy().locate(source, options, 35)
+
+        monkeypatch.setattr(CsvStrategy, "_build_index", None)
+        assert CsvStrategy().locate(source, options, 45) == CsvStrategy().locate(
+            source, options, 49,
+        )
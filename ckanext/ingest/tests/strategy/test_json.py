@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+from ckanext.ingest import config, shared
+from ckanext.ingest.record import PackageRecord
+from ckanext.ingest.strategy.json import (
+    JsonArrayStrategy,
+    JsonItems,
+    JsonlStrategy,
+    parse_pointer,
+)
+
+
+class TestJsonlStrategy:
+    def test_records(self):
+        source = shared.make_storage(b'{"name": "a"}\n\n  \n{"name": "b"}')
+        records = list(JsonlStrategy().extract(source, {}))
+
+        assert [r.raw for r in records] == [{"name": "a"}, {"name": "b"}]
+        assert all(isinstance(r, PackageRecord) for r in records)
+
+    @pytest.mark.parametrize(
+        ("mime", "filename", "expected"),
+        [
+            ("application/x-ndjson", "data", True),
+            (None, "DATA.JSONL", True),
+            (None, "data.ndjson", True),
+            ("application/json", "data.json", False),
+        ],
+    )
+    def test_can_handle(self, mime, filename, expected):
+        source = shared.make_storage("", filename)
+        assert JsonlStrategy.can_handle(mime, source) is expected
+
+    def test_resume_from_position(self):
+        source = shared.make_storage('{"name": "a"}\n\n{"name": "b"}\n[1]\n'.encode())
+        strategy = JsonlStrategy()
+
+        rows = iter(strategy.chunks(source, {}))
+        assert next(rows) == {"name": "a"}
+        position = strategy.tell()
+
+        source.stream.seek(0)
+        strategy = JsonlStrategy()
+        strategy.seek(position)
+
+        assert list(strategy.chunks(source, {})) == [{"name": "b"}, [1]]
+
+    def test_custom_encoding(self):
+        source = shared.make_storage('{"name": "привіт"}\n'.encode("utf-16"))
+        strategy = JsonlStrategy()
+        options: shared.StrategyOptions = {"extras": {"encoding": "utf-16"}}
+
+        assert list(strategy.chunks(source, options)) == [{"name": "привіт"}]
+        assert strategy.tell() is None
+
+
+class TestJsonlOffsetIndex:
+    @pytest.fixture()
+    def source(self):
+        rows = "\n".join(json.dumps({"name": f"r{i}"}) for i in range(50))
+        return shared.make_storage(f"\n{rows}\n\n".encode())
+
+    @pytest.fixture(autouse=True)
+    def storage(self, monkeypatch, tmp_path, ckan_config):
+        monkeypatch.setitem(ckan_config, config.CONFIG_STORAGE_PATH, str(tmp_path))
+        return tmp_path
+
+    def test_locate(self, source):
+        options: shared.StrategyOptions = {"extras": {"offset_index": 10}}
+        strategy = JsonlStrategy()
+
+        number, position = strategy.locate(source, options, 35)
+        assert number == 30
+        assert source.stream.tell() == 0
+
+        strategy.seek(position)
+        assert next(iter(strategy.chunks(source, options))) == {"name": "r30"}
+
+
+class TestJsonItems:
+    @pytest.mark.parametrize("size", [1, 3, 1024])
+    def test_chunk_size(self, size):
+        data = [{"name": "a", "tags": ["x", "y"]}, 12345, "привіт", None, [], {}]
+        stream = shared.make_storage(json.dumps(data, indent=2).encode()).stream
+
+        assert list(JsonItems(stream, size=size)) == data
+
+    @pytest.mark.parametrize(
+        ("pointer", "expected"),
+        [
+            ("", [{"a/b": [1, 2], "c": {"d": [3]}}]),
+            ("/a~1b", [1, 2]),
+            ("/c/d", [3]),
+            ("/c", [{"d": [3]}]),
+            ("/c/d/0", [3]),
+            ("/missing", []),
+            ("/c/d/1", []),
+            ("/a~1b/x", []),
+        ],
+    )
+    def test_pointer(self, pointer, expected):
+        stream = shared.make_storage(b'{"a/b": [1, 2], "c": {"d": [3]}}').stream
+        assert list(JsonItems(stream, pointer, size=2)) == expected
+
+    def test_rest_is_not_read(self):
+        stream = shared.make_storage(b'{"items": [1, 2], "tail": invalid').stream
+        assert list(JsonItems(stream, "/items")) == [1, 2]
+
+    def test_invalid(self):
+        stream = shared.make_storage(b"[1, 2 3]").stream
+        with pytest.raises(json.JSONDecodeError):
+            list(JsonItems(stream))
+
+    def test_parse_pointer(self):
+        assert parse_pointer("") == []
+        assert parse_pointer("/a~1b/~01/") == ["a/b", "~1", ""]
+        with pytest.raises(ValueError, match="must start"):
+            parse_pointer("data")
+
+
+class TestJsonArrayStrategy:
+    def test_records(self):
+        source = shared.make_storage(
+            b'{"meta": {"count": 2},'
+            b' "data": {"items": [{"name": "a"}, {"name": "b"}]}}',
+        )
+        options: shared.StrategyOptions = {"extras": {"pointer": "/data/items"}}
+        records = list(JsonArrayStrategy().extract(source, options))
+
+        assert [r.raw for r in records] == [{"name": "a"}, {"name": "b"}]
+        assert all(isinstance(r, PackageRecord) for r in records)
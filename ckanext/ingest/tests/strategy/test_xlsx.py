@@ -0,0 +1,94 @@
+import sys
+from datetime import datetime, time, timedelta
+from io import BytesIO
+
+import pytest
+
+from ckanext.ingest import shared
+from ckanext.ingest.benchmark import make_xlsx
+from ckanext.ingest.strategy import xlsx
+
+
+@pytest.mark.skipif(not xlsx.is_installed, reason="openpyxl is not installed")
+class TestXlsxStrategy:
+    def test_rows_with_header(self):
+        source = shared.make_storage(make_xlsx(4, 1, sheets=2))
+        records = xlsx.XlsxStrategy().extract(source, {"extras": {"with_header": True}})
+
+        assert [r.data["row"]["name"] for r in records] == [
+            "benchmark-0",
+            "benchmark-1",
+            "benchmark-0",
+            "benchmark-1",
+        ]
+
+    @pytest.mark.parametrize("extras", [{}, {"processes": 1}])
+    def test_openpyxl_engine_without_lxml(self, monkeypatch, extras):
+        monkeypatch.setitem(sys.modules, "lxml", None)
+        source = shared.make_storage(make_xlsx(2, 1, sheets=1))
+        records = xlsx.XlsxStrategy().extract(
+            source,
+            {"extras": dict(extras, with_header=True)},
+        )
+
+        assert [r.data["row"]["name"] for r in records] == [
+            "benchmark-0",
+            "benchmark-1",
+        ]
+
+    @pytest.mark.parametrize(
+        "extras",
+        [
+            {},
+            {"with_header": True},
+            {"min_row": 2, "max_row": 5, "min_col": 2, "max_col": 3},
+            {"max_row": 10},
+            {"sheets": ["Sheet 1"]},
+        ],
+    )
+    def test_lxml_engine(self, extras):
+        source = make_xlsx(9, 2, sheets=3)
+
+        def extract(engine: str):
+            options = {"extras": dict(extras, engine=engine)}
+            records = xlsx.XlsxStrategy().extract(shared.make_storage(source), options)
+            return [r.data["row"] for r in records]
+
+        assert extract("lxml") == extract("openpyxl")
+
+    def test_lxml_values(self):
+        from openpyxl import Workbook
+
+        doc = Workbook()
+        sheet = doc.active
+        sheet.append(["text", datetime(2020, 1, 2, 3, 4), True, 1.5, 10])
+        sheet["B3"] = "gap"
+        sheet["A4"] = time(10, 30)
+        sheet["B4"] = timedelta(hours=30)
+        output = BytesIO()
+        doc.save(output)
+
+        records = xlsx.XlsxStrategy().extract(
+            shared.make_storage(output.getvalue()),
+            {"extras": {"engine": "lxml"}},
+        )
+        assert [r.data["row"] for r in records] == [
+            ["text", datetime(2020, 1, 2, 3, 4), True, 1.5, 10],
+            [None, None, None, None, None],
+            [None, "gap", None, None, None],
+            [time(10, 30), timedelta(hours=30), None, None, None],
+        ]
+
+    @pytest.mark.parametrize("engine", ["openpyxl", "lxml"])
+    def test_processes(self, engine):
+        source = make_xlsx(9, 2, sheets=3)
+
+        def extract(extras: dict):
+            options = {"extras": dict(extras, engine=engine, with_header=True)}
+            records = xlsx.XlsxStrategy().extract(shared.make_storage(source), options)
+            return [r.data["row"] for r in records]
+
+        assert extract({"processes": 2, "ordered": True}) == extract({})
+        assert extract({"processes": 2, "sheets": ["Sheet 1"]}) == extract(
+            {"sheets": ["Sheet 1"]},
+        )
@@ -0,0 +1,75 @@
+import os
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from ckanext.ingest import shared
+from ckanext.ingest.benchmark import make_zip
+from ckanext.ingest.strategy.zip import ZipStrategy
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "logic", "data")
+
+
+class NonSeekable(BytesIO):
+    def seekable(self):
+        return False
+
+
+@pytest.fixture()
+def archive():
+    with open(os.path.join(DATA, "example.zip"), "rb") as src:
+        return src.read()
+
+
+class TestZipStrategy:
+    def test_members_opened_once(self, archive, monkeypatch):
+        opened = []
+        original = zipfile.ZipFile.open
+
+        def spy(self, name, *args, **kwargs):
+            opened.append(name)
+            return original(self, name, *args, **kwargs)
+
+        monkeypatch.setattr(zipfile.ZipFile, "open", spy)
+        chunks = list(ZipStrategy().chunks(shared.make_storage(archive), {}))
+
+        assert len(opened) == 1
+        assert [c["source"].filename for c in chunks] == ["example.csv"]
+
+    def test_non_seekable_source(self, archive):
+        source = shared.make_storage(NonSeekable(archive))
+        records = list(ZipStrategy().extract(source, {}))
+
+        assert [r.data["name"] for r in records] == ["hello", "world"]
+
+    def test_nested_archive_spilled(self, monkeypatch):
+        spooled = []
+        original = shared.spool
+
+        def spy(stream):
+            spooled.append(stream)
+            return original(stream)
+
+        monkeypatch.setattr(shared, "spool", spy)
+        with open(os.path.join(DATA, "zipped_zip.zip"), "rb") as src:
+            records = list(ZipStrategy().extract(shared.make_storage(src), {}))
+
+        assert [r.data["name"] for r in records] == ["hello", "world"]
+        assert len(spooled) == 1
+        assert isinstance(spooled[0], zipfile.ZipExtFile)
+
+    def test_processes(self):
+        source = make_zip(40, 2, files=3)
+
+        def extract(extras: dict):
+            records = ZipStrategy().extract(
+                shared.make_storage(source),
+                {"extras": extras},
+            )
+            return [r.data["name"] for r in records]
+
+        assert extract({"processes": 2, "ordered": True}) == extract({})
+        assert sorted(extract({"processes": 2, "glob": "data/*"})) == sorted(
+            extract({"glob": "data/*"}),
+        )
@@ -0,0 +1,166 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from ckanext.ingest import artifact, config
+
+
+class TestStatArtifacts:
+    def test_restore(self):
+        artifacts = artifact.StatArtifacts()
+        artifacts.success({})
+        artifacts.fail({})
+
+        restored = artifact.StatArtifacts()
+        restored.restore(artifacts.state())
+        restored.success({})
+
+        assert restored.collect() == {"success": 2, "fail": 1}
+
+
+class TestTmpArtifacts:
+    def test_restore(self):
+        artifacts = artifact.TmpArtifacts()
+        artifacts.success({"result": 1})
+        state = artifacts.state()
+        artifacts.success({"result": 2})
+        artifacts.collect()
+
+        restored = artifact.TmpArtifacts()
+        restored.restore(state)
+        restored.fail({"result": 3})
+        result = restored.collect()
+
+        assert result == {"report_path": state["report_path"]}
+        with open(result["report_path"]) as src:
+            assert src.read() == (
+                '{"success": true, "result": 1}\n{"success": false, "result": 3}\n'
+            )
+
+
+@pytest.fixture()
+def storage(monkeypatch, tmp_path, ckan_config):
+    monkeypatch.setitem(ckan_config, config.CONFIG_STORAGE_PATH, str(tmp_path))
+    return tmp_path
+
+
+def _read(report_id: str) -> list[dict]:
+    with gzip.open(artifact.report_path(report_id)) as src:
+        return [json.loads(line) for line in src]
+
+
+@pytest.mark.usefixtures("storage")
+class TestStreamArtifacts:
+    def test_collect(self):
+        artifacts = artifact.StreamArtifacts()
+        artifacts.success({"result": 1})
+        artifacts.fail({"error": "missing"})
+        result = artifacts.collect()
+
+        assert result == {
+            "success": 1,
+            "fail": 1,
+            "report_id": artifacts.id,
+            "records": 2,
+            "truncated": False,
+        }
+        assert _read(artifacts.id) == [
+            {"success": True, "result": 1},
+            {"success": False, "error": "missing"},
+        ]
+
+        assert artifact.read_summary(artifacts.id) == dict(result, user=None)
+
+        page = artifact.read_report(artifacts.id, 1, 10)
+        assert page == {
+            "count": 2,
+            "truncated": False,
+            "results": [{"success": False, "error": "missing"}],
+        }
+
+    def test_size_limit(self, monkeypatch, ckan_config):
+        monkeypatch.setitem(ckan_config, config.CONFIG_REPORT_SIZE_LIMIT, 70)
+
+        artifacts = artifact.StreamArtifacts()
+        for idx in range(3):
+            artifacts.success({"result": idx})
+        result = artifacts.collect()
+
+        assert result["success"] == 3
+        assert result["records"] == 2
+        assert result["truncated"]
+        assert len(_read(artifacts.id)) == 2
+
+    def test_restore(self):
+        artifacts = artifact.StreamArtifacts()
+        artifacts.success({"result": 1})
+        state = artifacts.state()
+        artifacts.success({"result": 2})
+        artifacts.collect()
+
+        restored = artifact.StreamArtifacts()
+        restored.restore(state)
+        restored.fail({"result": 3})
+        result = restored.collect()
+
+        assert result["report_id"] == artifacts.id
+        assert result["records"] == 2
+        assert _read(artifacts.id) == [
+            {"success": True, "result": 1},
+            {"success": False, "result": 3},
+        ]
+
+    def test_user(self):
+        artifacts = artifact.make_artifacts("stream", "owner")
+        result = artifacts.collect()
+
+        assert "user" not in result
+        assert artifact.read_summary(artifacts.id)["user"] == "owner"
+
+    def test_missing_report(self):
+        assert artifact.read_report("not-a-report", 0, 10) is None
+
+    def test_expired_reports_removed(self, monkeypatch, ckan_config):
+        monkeypatch.setitem(ckan_config, config.CONFIG_REPORT_TTL, 60)
+
+        old = artifact.StreamArtifacts()
+        old.collect()
+        for ext in ["jsonl.gz", "json"]:
+            os.utime(artifact.report_path(old.id, ext), (0, 0))
+
+        fresh = artifact.StreamArtifacts()
+        fresh.collect()
+
+        assert artifact.read_report(old.id, 0, 10) is None
+        assert artifact.read_report(fresh.id, 0, 10)
+
+
+class TestProject:
+    def test_success(self):
+        data = {
+            "result": {
+                "success": True,
+                "result": {"id": "123", "name": "hello", "notes": "..."},
+                "details": {"action": "create"},
+            },
+        }
+        assert artifact.project(data, ["id", "action"]) == {
+            "result": {"id": "123", "action": "create"},
+        }
+
+    def test_fail(self):
+        data = {"error": {"name": ["Invalid"]}, "source": {"name": "x", "title": "X"}}
+        assert artifact.project(data, ["name"]) == {
+            "error": {"name": ["Invalid"]},
+            "source": {"name": "x"},
+        }
+
+    def test_fail_transformed(self):
+        data = {"error": {"name": ["Invalid"]}, "source": {"Name": "x"}}
+        transformed = {"name": "x", "title": "X"}
+        assert artifact.project(data, ["name"], transformed) == {
+            "error": {"name": ["Invalid"]},
+            "data": {"name": "x"},
+        }
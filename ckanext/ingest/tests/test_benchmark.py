@@ -0,0 +1,59 @@
+import subprocess
+import sys
+
+import pytest
+
+from ckanext.ingest import benchmark, transform
+
+
+@pytest.mark.parametrize("case", list(benchmark.CASES))
+def test_run(case):
+    result = benchmark.run(case, 30)
+
+    assert result.rows in range(27, 31)
+    assert set(result.stages) == {"extract", "transform"}
+    assert result.peak_rss > 0
+
+
+def test_schema_converts_values():
+    plan = transform.compile_plan(benchmark.make_schema(3), "dataset_fields", "ingest")
+    assert [name for name, field in plan.fields.items() if not field.validators] == [
+        "name",
+    ]
+
+
+def test_not_imported_at_startup():
+    code = (
+        "import sys, ckanext.ingest.plugin, ckanext.ingest.cli;"
+        " print('ckanext.ingest.benchmark' in sys.modules)"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "False"
+
+
+def test_compare():
+    before = benchmark.run_all(["csv-narrow"], 10)
+    after = {
+        "results": [
+            dict(before["results"][0], rate={"extract": 1, "transform": 2}),
+        ],
+    }
+
+    metrics = {
+        metric: (old, new)
+        for _case, metric, old, new in benchmark.compare(before, after)
+    }
+    assert metrics["extract, rows/s"][1] == 1
+    assert metrics["transform, rows/s"][1] == 2
+    assert "peak RSS, KiB" in metrics
+
+
+def test_compare_startup():
+    results = {"results": []}
+    before = dict(results, startup={"seconds": 0.2, "modules": 100})
+    after = dict(results, startup={"seconds": 0.1, "modules": 80})
+
+    assert list(benchmark.compare(before, after)) == [
+        ("startup", "import, ms", 200, 100),
+        ("startup", "modules", 100, 80),
+    ]
@@ -0,0 +1,19 @@
+import pytest
+
+from ckanext.ingest.index import OffsetIndex
+
+
+class TestOffsetIndex:
+    @pytest.mark.parametrize(
+        ("number", "expected"),
+        [
+            (0, None),
+            (9, None),
+            (10, (10, 100)),
+            (29, (20, 200)),
+            (1000, (20, 200)),
+        ],
+    )
+    def test_locate(self, number, expected):
+        index = OffsetIndex(10, [0, 100, 200])
+        assert index.locate(number) == expected
@@ -0,0 +1,98 @@
+from typing import Any
+
+import pytest
+
+from ckan.lib import search
+from ckan.tests.helpers import call_action
+
+from ckanext.ingest import indexing, shared
+
+
+class FakeIndex(search.SearchIndex):
+    """Local stand-in for the package search index."""
+
+    indexed: list[str]
+    commits: int
+
+    def index_package(self, pkg_dict: Any, defer_commit: bool = False):
+        type(self).indexed.append(pkg_dict["id"])
+        if not defer_commit:
+            self.commit()
+
+    def update_dict(self, data: Any, defer_commit: bool = False):
+        self.index_package(data, defer_commit)
+
+    def insert_dict(self, data: Any):
+        self.index_package(data)
+
+    def delete_package(self, pkg_dict: Any):
+        pass
+
+    def commit(self):
+        type(self).commits += 1
+
+
+@pytest.fixture()
+def fake_index(monkeypatch):
+    monkeypatch.setattr(FakeIndex, "indexed", [], raising=False)
+    monkeypatch.setattr(FakeIndex, "commits", 0, raising=False)
+    monkeypatch.setitem(search._INDICES, "package", FakeIndex)
+    return FakeIndex
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestDeferred:
+    def test_collect_and_flush(self, fake_index):
+        with indexing.deferred() as touched:
+            pkg = call_action("package_create", name="hello")
+            assert fake_index.indexed == []
+            assert touched == {pkg["id"]}
+
+            indexing.flush(touched)
+
+        assert fake_index.indexed == [pkg["id"]]
+        assert fake_index.commits == 1
+        assert not touched
+
+    def test_not_deferred(self, fake_index):
+        call_action("package_create", name="hello")
+        assert fake_index.indexed
+        assert not indexing.is_deferred()
+
+
+class TestInstalled:
+    def test_restored(self, fake_index):
+        with indexing.deferred():
+            with indexing.deferred():
+                assert issubclass(
+                    search._INDICES["package"],
+                    indexing.DeferredIndexMixin,
+                )
+            assert search._INDICES["package"] is not fake_index
+
+        assert search._INDICES["package"] is fake_index
+
+    def test_restored_after_error(self, fake_index):
+        with pytest.raises(ValueError, match="failed"), indexing.deferred():
+            raise ValueError("failed")
+
+        assert search._INDICES["package"] is fake_index
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestImport:
+    @pytest.mark.parametrize("workers", [0, 2])
+    def test_batches(self, fake_index, workers):
+        source = "name\n" + "\n".join(f"pkg-{i}" for i in range(5))
+
+        result = call_action(
+            "ingest_import_records",
+            source=shared.make_storage(source, "data.csv", "text/csv"),
+            defer_index=True,
+            index_batch_size=2,
+            workers=workers,
+        )
+
+        assert result == {"success": 5, "fail": 0}
+        assert len(fake_index.indexed) == 5
+        assert fake_index.commits == 3
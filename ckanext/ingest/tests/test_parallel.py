@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from ckanext.ingest import parallel, shared
+
+
+def _records(number: int) -> list[shared.Record]:
+    # later units are finished first
+    time.sleep((3 - number) * 0.1)
+    return [shared.Record({"unit": number, "idx": idx}) for idx in range(2)]
+
+
+class TestExtract:
+    def test_ordered(self):
+        records = parallel.extract(range(4), _records, 4, ordered=True)
+        assert [r.raw["unit"] for r in records] == [0, 0, 1, 1, 2, 2, 3, 3]
+
+    def test_unordered(self):
+        records = list(parallel.extract(range(4), _records, 4))
+
+        assert sorted(r.raw["unit"] for r in records) == [0, 0, 1, 1, 2, 2, 3, 3]
+        assert records[0].raw["unit"] == 3
+
+    def test_inflight(self):
+        units = []
+
+        def produce():
+            for number in range(4):
+                units.append(number)
+                yield number
+
+        records = parallel.extract(produce(), _records, 2, ordered=True, inflight=1)
+        assert next(records).raw == {"unit": 0, "idx": 0}
+        assert units == [0]
+
+
+def test_portable():
+    options: shared.StrategyOptions = {
+        "locator": lambda name: None,
+        "extras": {"processes": 2, "glob": "*.csv"},
+    }
+    assert parallel.portable(options) == {
+        "extras": {"processes": 0, "glob": "*.csv"},
+    }
+    assert options["extras"]["processes"] == 2
+
+
+class TestPoolSize:
+    def test_disabled(self):
+        assert parallel.pool_size({}) == 0
+
+    def test_cpu_limit(self, monkeypatch):
+        monkeypatch.setattr(parallel.os, "cpu_count", lambda: 2)
+        assert parallel.pool_size({"extras": {"processes": 8}}) == 2
+
+    @pytest.mark.parametrize("value", [-1, "2", 1.5, True])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError, match="non-negative integer"):
+            parallel.pool_size({"extras": {"processes": value}})
+
+    def test_multi_threaded(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+
+        try:
+            assert parallel.pool_size({"extras": {"processes": 2}}) == 0
+            with pytest.raises(ValueError, match="multi-threaded"):
+                list(parallel.extract(range(2), _records, 2))
+        finally:
+            stop.set()
+            thread.join()
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from typing import Any
+
+import flask
+import pytest
+
+from ckanext.ingest import pipeline, shared
+from ckanext.ingest.db import Fingerprint
+
+
+class SharedRecord(shared.Record):
+    """Record that creates an entity visible to the prefetch of others."""
+
+    created: set[str] = set()
+    lock = threading.Lock()
+
+    @classmethod
+    def prefetch(cls, records: Any):
+        for record in records:
+            record.existing = record.raw["name"] in cls.created
+
+    def affinity(self):
+        return self.raw["name"]
+
+    def ingest(self, context: Any) -> shared.IngestionResult:
+        action = "update" if self.existing else "create"
+        time.sleep(0.01)
+        with self.lock:
+            self.created.add(self.raw["name"])
+
+        return {"success": True, "result": action, "details": {}}
+
+
+class AppRecord(shared.Record):
+    def ingest(self, context: Any) -> shared.IngestionResult:
+        return {"success": True, "result": flask.current_app.name, "details": {}}
+
+
+class PidRecord(shared.Record):
+    def affinity(self):
+        return self.raw["key"]
+
+    def ingest(self, context: Any) -> shared.IngestionResult:
+        return {"success": True, "result": os.getpid(), "details": {}}
+
+
+class FailingRecord(shared.Record):
+    def ingest(self, context: Any) -> shared.IngestionResult:
+        msg = "broken record"
+        raise RuntimeError(msg)
+
+
+class TestPool:
+    def test_window_waits_for_previous(self):
+        SharedRecord.created = set()
+        records = [SharedRecord({"name": name}) for name in ["a", "b", "a", "b"]]
+        pool = pipeline.Pool(2)
+
+        try:
+            outcomes = list(pool.map(records, {}, window=2))
+        finally:
+            pool.shutdown()
+
+        assert [data["result"]["result"] for _r, (_s, data) in outcomes] == [
+            "create",
+            "create",
+            "update",
+            "update",
+        ]
+
+    def test_app_of_pool(self):
+        pools = []
+        for name in ["first", "second"]:
+            with flask.Flask(name).app_context():
+                pools.append(pipeline.Pool(1))
+
+        try:
+            names = [
+                data["result"]["result"]
+                for pool in pools
+                for _r, (_s, data) in pool.map([AppRecord({})], {})
+            ]
+        finally:
+            for pool in pools:
+                pool.shutdown()
+
+        assert names == ["first", "second"]
+
+    def test_processes_forked_before_threads(self):
+        pool = pipeline.Pool(3, "process")
+        try:
+            assert threading.active_count() == 1
+            records = [PidRecord({"key": key}) for key in ["a", "b", "c", "a"]]
+            outcomes = list(pool.map(records, {}))
+        finally:
+            pool.shutdown()
+
+        pids = [data["result"]["result"] for _r, (_s, data) in outcomes]
+        assert os.getpid() not in pids
+        assert pids[0] == pids[3]
+        assert all(not worker.process.is_alive() for worker in pool.processes)
+
+    def test_process_error(self):
+        pool = pipeline.Pool(1, "process")
+        try:
+            with pytest.raises(RuntimeError, match="broken record"):
+                list(pool.map([FailingRecord({})], {}))
+        finally:
+            pool.shutdown()
+
+    def test_no_fork_from_threads(self):
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+
+        try:
+            with pytest.raises(ValueError, match="multi-threaded"):
+                pipeline.Pool(1, "process")
+        finally:
+            stop.set()
+            thread.join()
+
+
+class KeyRecord(shared.Record):
+    def fingerprint_key(self):
+        return self.raw.get("key")
+
+
+class TestPrefetchDigests:
+    def test_unique_keys(self, monkeypatch):
+        queries = []
+
+        def lookup_many(keys):
+            queries.append(sorted(keys))
+            return {"a": "digest"}
+
+        monkeypatch.setattr(Fingerprint, "lookup_many", lookup_many)
+        records = [KeyRecord({"key": key}) for key in ["a", "b", "c", "c", None]]
+
+        pipeline.prefetch_digests(records)
+
+        assert queries == [["a", "b"]]
+        assert [r.stored_digest for r in records] == ["digest", "", None, None, None]
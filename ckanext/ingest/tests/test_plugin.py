@@ -3,3 +3,25 @@
 
 def test_plugin():
     pass
+
+
+def test_strategies_are_lazy():
+    from ckanext.ingest.plugin import IngestPlugin
+
+    strategies = IngestPlugin().get_ingest_strategies()
+    assert strategies["ingest:scheming_csv"] == (
+        "ckanext.ingest.strategy.csv:CsvStrategy",
+        ["text/csv"],
+    )
+    assert all(isinstance(ref, (str, tuple)) for ref in strategies.values())
+
+
+def test_declared_mimetypes():
+    from werkzeug.utils import import_string
+
+    from ckanext.ingest.plugin import IngestPlugin
+
+    for ref in IngestPlugin().get_ingest_strategies().values():
+        if isinstance(ref, tuple):
+            path, mimetypes = ref
+            assert set(mimetypes) == import_string(path).mimetypes
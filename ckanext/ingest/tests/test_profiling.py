@@ -0,0 +1,50 @@
+from ckanext.ingest import profiling
+
+
+class TestProfile:
+    def test_disabled(self):
+        with profiling.measure("stage"):
+            pass
+
+        assert profiling.current() is None
+
+    def test_stages(self):
+        with profiling.profile() as profile:
+            with profiling.measure("stage"):
+                pass
+            with profiling.measure("stage"):
+                pass
+
+        summary = profile.summary()
+        assert summary["stages"]["stage"]["count"] == 2
+        assert summary["stages"]["stage"]["histogram"]["<1ms"] == 2
+        assert summary["slowest"] == []
+
+    def test_records(self):
+        records = [object() for _ in range(3)]
+
+        with profiling.profile(samples=2) as profile:
+            for record in profiling.timed(records, "extract"):
+                with profiling.measure("custom", record):
+                    pass
+
+            timing = [profile.finish(record) for record in records]
+
+        assert all(set(t) == {"extract", "custom"} for t in timing)
+        assert not profile.records
+
+        slowest = profile.summary()["slowest"]
+        assert len(slowest) == 2
+        assert slowest[0]["total"] >= slowest[1]["total"]
+
+    def test_batch(self):
+        records = [object() for _ in range(4)]
+
+        with profiling.profile() as profile:
+            with profiling.measure_batch("transform", records):
+                pass
+
+            timing = [profile.finish(record) for record in records]
+
+        assert all(set(t) == {"transform"} for t in timing)
+        assert profile.summary()["stages"]["transform"]["count"] == 4
@@ -0,0 +1,229 @@
+import pytest
+
+from ckan.tests import factories
+
+from ckanext.ingest import profiling, shared
+from ckanext.ingest.record import PackageRecord, ResourceRecord, _merge_resources
+
+
+class CountingRecord(shared.Record):
+    transformed = 0
+
+    def transform(self, raw):
+        CountingRecord.transformed += 1
+        return dict(raw, transformed=True)
+
+
+class TestLazyTransform:
+    def test_transform_on_access(self, monkeypatch):
+        monkeypatch.setattr(CountingRecord, "transformed", 0)
+        record = CountingRecord({"name": "hello"})
+        assert CountingRecord.transformed == 0
+
+        assert record.data == {"name": "hello", "transformed": True}
+        assert record.data is record.data
+        assert CountingRecord.transformed == 1
+
+    def test_fill(self):
+        record = CountingRecord({"name": "hello"})
+        record.fill({"name": "default", "title": "Hello"}, {"type": "dataset"})
+
+        assert record.data == {
+            "name": "hello",
+            "title": "Hello",
+            "transformed": True,
+            "type": "dataset",
+        }
+
+    def test_assign(self, monkeypatch):
+        monkeypatch.setattr(CountingRecord, "transformed", 0)
+        record = CountingRecord({"name": "hello"})
+        record.data = {"name": "world"}
+
+        assert record.data == {"name": "world"}
+        assert CountingRecord.transformed == 0
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestPackageRecordPrefetch:
+    def test_prefetch(self):
+        pkg = factories.Dataset()
+        existing = PackageRecord({"name": pkg["name"]})
+        missing = PackageRecord({"name": "not-real"})
+
+        PackageRecord.prefetch([existing, missing])
+
+        assert existing.prefetched
+        assert existing.existing["id"] == pkg["id"]
+        assert missing.prefetched
+        assert missing.existing is None
+
+    def test_duplicates_are_not_prefetched(self):
+        first = PackageRecord({"name": "hello"})
+        second = PackageRecord({"name": "hello"})
+
+        PackageRecord.prefetch([first, second])
+
+        assert not first.prefetched
+        assert not second.prefetched
+
+    def test_affinity(self):
+        pkg = factories.Dataset()
+        by_id = PackageRecord({})
+        by_id.data = {"id": pkg["id"]}
+        by_name = PackageRecord({})
+        by_name.data = {"name": pkg["name"]}
+
+        PackageRecord.prefetch([by_id, by_name])
+
+        assert by_id.affinity() == by_name.affinity() == pkg["id"]
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestResourceRecordPrefetch:
+    def test_affinity(self):
+        pkg = factories.Dataset()
+        records = []
+        for ref in [pkg["id"], pkg["name"]]:
+            record = ResourceRecord({})
+            record.data = {"package_id": ref, "url": "http://example.com"}
+            records.append(record)
+
+        assert [r.affinity() for r in records] == [pkg["id"]] * 2
+
+        ResourceRecord.prefetch(records)
+        assert [r.owner for r in records] == [pkg["id"]] * 2
+
+    def test_fingerprint_key_by_package_name(self):
+        pkg = factories.Dataset()
+        res = factories.Resource(package_id=pkg["id"])
+        record = ResourceRecord({}, {"update_existing": True})
+        record.data = {"id": res["id"], "package_id": pkg["name"]}
+
+        assert record.fingerprint_key() == f"resource:{res['id']}"
+
+        ResourceRecord.prefetch([record])
+        assert record.fingerprint_key() == f"resource:{res['id']}"
+
+
+@pytest.mark.usefixtures("clean_db")
+class TestPackageRecordPatch:
+    def make_record(self, data):
+        record = PackageRecord(
+            {},
+            {"update_existing": True, "extras": {"patch": True}},
+        )
+        record.data = data
+        return record
+
+    def test_unchanged(self):
+        pkg = factories.Dataset(resources=[{"url": "http://example.com"}])
+        record = self.make_record(
+            {
+                "name": pkg["name"],
+                "title": pkg["title"],
+                "resources": [{"url": "http://example.com"}],
+            },
+        )
+
+        result = record.ingest({})
+
+        assert result["details"] == {"action": "noop", "changed": []}
+        assert result["result"]["metadata_modified"] == pkg["metadata_modified"]
+
+    def test_changed(self):
+        pkg = factories.Dataset(resources=[{"url": "http://example.com"}])
+        record = self.make_record(
+            {
+                "name": pkg["name"],
+                "title": "Updated",
+                "resources": [{"url": "http://example.com"}],
+            },
+        )
+
+        result = record.ingest({})
+
+        assert result["details"]["changed"] == ["title"]
+        assert result["result"]["title"] == "Updated"
+        assert result["result"]["resources"][0]["id"] == pkg["resources"][0]["id"]
+
+    def test_resources_merged(self):
+        pkg = factories.Dataset(
+            resources=[
+                {"url": "http://example.com/a", "name": "A"},
+                {"url": "http://example.com/b", "name": "B"},
+            ],
+        )
+        first, second = pkg["resources"]
+        record = self.make_record(
+            {
+                "name": pkg["name"],
+                "resources": [
+                    {"url": "http://example.com/b", "name": "Updated"},
+                    {"url": "http://example.com/c", "name": "C"},
+                ],
+            },
+        )
+
+        result = record.ingest({})
+        resources = result["result"]["resources"]
+
+        assert result["details"] == {
+            "action": "package_patch",
+            "changed": ["resources"],
+        }
+        assert [r["id"] for r in resources[:2]] == [first["id"], second["id"]]
+        assert [r["name"] for r in resources] == ["A", "Updated", "C"]
+
+
+class TestMergeResources:
+    def test_match(self):
+        old = [
+            {"id": "1", "url": "a", "name": "A"},
+            {"id": "2", "url": "a", "name": "B"},
+            {"id": "3", "url": "c", "name": "C"},
+        ]
+        new = [
+            {"url": "a", "name": "first"},
+            {"url": "a", "name": "second"},
+            {"id": "3", "url": "changed"},
+            {"id": "3", "url": "dup"},
+            {"url": "new"},
+        ]
+
+        assert _merge_resources(new, old) == [
+            {"id": "1", "url": "a", "name": "first"},
+            {"id": "2", "url": "a", "name": "second"},
+            {"id": "3", "url": "dup", "name": "C"},
+            {"url": "new"},
+        ]
+
+
+class TestPackageRecordTransformBatch:
+    def test_transform_batch(self):
+        records = [
+            PackageRecord({"Title": "Hello", "name": "hello"}),
+            PackageRecord({"Title": "World", "name": "world"}),
+        ]
+        PackageRecord.transform_batch(records)
+
+        assert [r._data for r in records] == [
+            {"title": "Hello", "name": "hello", "type": "dataset"},
+            {"title": "World", "name": "world", "type": "dataset"},
+        ]
+
+    def test_transformed_records_are_kept(self):
+        record = PackageRecord({"Title": "Hello", "name": "hello"})
+        record.data = {"name": "custom"}
+        PackageRecord.transform_batch([record])
+
+        assert record.data == {"name": "custom"}
+
+    def test_timing(self):
+        records = [PackageRecord({"name": "hello"}), PackageRecord({"name": "world"})]
+
+        with profiling.profile() as profile:
+            shared.transform_batch(records)
+            timing = [profile.finish(record) for record in records]
+
+        assert all(set(t) == {"transform"} for t in timing)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from werkzeug.utils import import_string
+
+from ckanext.ingest import shared
+
+
+class Csv(shared.ExtractionStrategy):
+    mimetypes = {"text/csv"}
+
+
+class Sniffing(shared.ExtractionStrategy):
+    calls: list[str | None] = []
+
+    @classmethod
+    def can_handle(cls, mime: str | None, source: shared.Storage) -> bool:
+        cls.calls.append(mime)
+        return source.stream.read(1) == b"{"
+
+
+class ByExtension(shared.ExtractionStrategy):
+    content_independent = True
+    calls: list[str | None] = []
+
+    @classmethod
+    def can_handle(cls, mime: str | None, source: shared.Storage) -> bool:
+        cls.calls.append(mime)
+        return bool(source.filename and source.filename.lower().endswith(".tsv"))
+
+    @classmethod
+    def must_handle(cls, mime: str | None, source: shared.Storage) -> bool:
+        return True
+
+
+class TestRegistry:
+    def test_candidates(self):
+        registry = shared.Registry(csv=Csv, sniffing=Sniffing)
+
+        assert registry.candidates("text/csv") == [Csv, Sniffing]
+        assert registry.candidates("text/plain") == [Sniffing]
+
+    def test_must_handle_wins(self):
+        registry = shared.Registry(csv=Csv, tsv=ByExtension)
+        source = shared.make_storage("", "data.tsv")
+
+        assert registry.resolve("text/csv", source) is ByExtension
+        assert registry.resolve("text/csv", shared.make_storage("", "x.csv")) is Csv
+
+    def test_cached(self):
+        ByExtension.calls = []
+        registry = shared.Registry(csv=Csv, tsv=ByExtension)
+
+        for name in ["a.tsv", "b.TSV", "c.tsv"]:
+            assert registry.resolve(None, shared.make_storage("", name)) is ByExtension
+        assert registry.resolve(None, shared.make_storage("", "d.txt")) is None
+
+        assert ByExtension.calls == [None, None]
+
+    def test_content_dependent_not_cached(self):
+        Sniffing.calls = []
+        registry = shared.Registry(csv=Csv, sniffing=Sniffing)
+
+        assert registry.resolve(None, shared.make_storage("{}", "a.json")) is Sniffing
+        assert registry.resolve(None, shared.make_storage("[]", "b.json")) is None
+        assert len(Sniffing.calls) == 2
+
+    def test_reset_on_change(self):
+        registry = shared.Registry(csv=Csv)
+        source = shared.make_storage("", "data.tsv")
+        assert registry.resolve("text/csv", source) is Csv
+
+        registry["tsv"] = ByExtension
+        assert registry.resolve("text/csv", source) is ByExtension
+
+        del registry["tsv"]
+        assert registry.resolve("text/csv", source) is Csv
+
+    def test_lazy_reference(self, monkeypatch):
+        imported = []
+
+        def spy(name: str):
+            imported.append(name)
+            return import_string(name)
+
+        monkeypatch.setattr(shared, "import_string", spy)
+        path = f"{__name__}:Csv"
+        registry = shared.Registry(csv=path)
+
+        assert "csv" in registry
+        assert list(registry) == ["csv"]
+        assert registry.reference("csv") == path
+        assert not imported
+
+        assert registry["csv"] is Csv
+        assert registry["csv"] is Csv
+        assert registry.reference("csv") == path
+        assert imported == [path]
+
+    def test_lazy_reference_with_mimetypes(self, monkeypatch):
+        imported = []
+
+        def spy(name: str):
+            imported.append(name)
+            return import_string(name)
+
+        monkeypatch.setattr(shared, "import_string", spy)
+        path = f"{__name__}:Csv"
+        registry = shared.Registry(csv=(path, ["text/csv"]), sniffing=Sniffing)
+
+        assert registry.reference("csv") == path
+        assert registry.candidates("text/plain") == [Sniffing]
+        assert not imported
+
+        assert registry.candidates("text/csv") == [Csv, Sniffing]
+        assert imported == [path]
+
+        registry["csv"] = path
+        assert registry.candidates("text/plain") == [Sniffing]
@@ -0,0 +1,232 @@
+import pytest
+
+import ckan.plugins.toolkit as tk
+
+from ckanext.ingest import transform
+
+
+class TestPlan:
+    def test_fields(self):
+        plan = transform.get_plan("dataset", "dataset_fields", "ingest")
+        assert set(plan.fields) == {"title", "name"}
+        assert plan.fields["title"].options.aliases == ["Title"]
+
+    def test_cached(self):
+        plan = transform.get_plan("dataset", "dataset_fields", "ingest")
+        assert transform.get_plan("dataset", "dataset_fields", "ingest") is plan
+        assert transform.get_plan("dataset", "resource_fields", "ingest") is not plan
+
+    def test_rebuilt_after_schema_reload(self, monkeypatch):
+        plan = transform.get_plan("dataset", "dataset_fields", "ingest")
+        schema = dict(tk.h.scheming_get_dataset_schema("dataset"))
+        monkeypatch.setitem(tk.h, "scheming_get_dataset_schema", lambda type_: schema)
+
+        assert transform.get_plan("dataset", "dataset_fields", "ingest") is not plan
+
+
+class TestTransform:
+    def test_single_validation_pass(self, monkeypatch):
+        calls = []
+        validate = tk.navl_validate
+
+        def spy(*args):
+            calls.append(args)
+            return validate(*args)
+
+        monkeypatch.setattr(tk, "navl_validate", spy)
+        result = transform.transform_package({"Title": "Hello", "name": "hello"})
+
+        assert result == {"title": "Hello", "name": "hello", "type": "dataset"}
+        assert len(calls) == 1
+
+    def test_shared_alias(self):
+        schema = {
+            "dataset_fields": [
+                {
+                    "field_name": "title",
+                    "label": "Title",
+                    "ingest_options": {"aliases": ["Title"]},
+                },
+                {
+                    "field_name": "name",
+                    "label": "URL",
+                    "ingest_options": {
+                        "aliases": ["Title"],
+                        "convert": "ingest_munge_name",
+                    },
+                },
+            ],
+        }
+        plan = transform.compile_plan(schema, "dataset_fields", "ingest")
+        raw = {"Title": "Hello World"}
+
+        assert transform._transform(raw, plan) == {
+            "title": "Hello World",
+            "name": "hello-world",
+        }
+        assert len(plan.get_passes((("title", "Title"), ("name", "Title")))) == 2
+        assert raw == {"Title": "Hello World"}
+
+
+class TestTransformBatch:
+    def test_same_as_single(self):
+        schema = {
+            "dataset_fields": [
+                {
+                    "field_name": "title",
+                    "label": "Title",
+                    "ingest_options": {"aliases": ["Title", "Name"]},
+                },
+                {
+                    "field_name": "name",
+                    "label": "URL",
+                    "ingest_options": {
+                        "aliases": ["Name"],
+                        "convert": "ingest_munge_name",
+                    },
+                },
+                {
+                    "field_name": "license_id",
+                    "label": "License",
+                    "choices": [{"value": "cc-by", "label": "Attribution"}],
+                    "ingest_options": {"normalize_choice": True},
+                },
+                {
+                    "field_name": "notes",
+                    "label": "Notes",
+                    "ingest_options": {"default": "No notes"},
+                },
+            ],
+        }
+        plan = transform.compile_plan(schema, "dataset_fields", "ingest")
+        rows = [
+            {"Name": "Hello World", "License": "Attribution"},
+            {"Name": "Second", "License": "Other", "Notes": "Note"},
+            {"Title": "Title only", "License": ""},
+            {"Name": "Third", "License": "Attribution"},
+        ]
+
+        assert transform._transform_batch(rows, plan) == [
+            transform._transform(row, plan) for row in rows
+        ]
+
+    def test_transform_packages(self):
+        result = transform.transform_packages(
+            [{"Title": "Hello", "name": "hello"}, {"Title": "World"}],
+        )
+        assert result == [
+            {"title": "Hello", "name": "hello", "type": "dataset"},
+            {"title": "World", "type": "dataset"},
+        ]
+
+
+class TestBinding:
+    @pytest.fixture()
+    def plan(self):
+        schema = {
+            "dataset_fields": [
+                {
+                    "field_name": "title",
+                    "label": "Title",
+                    "ingest_options": {"aliases": ["Title", "Name"]},
+                },
+                {
+                    "field_name": "name",
+                    "label": "URL",
+                    "ingest_options": {"convert": "ingest_munge_name"},
+                },
+                {
+                    "field_name": "notes",
+                    "label": "Notes",
+                    "ingest_options": {"default": "No notes"},
+                },
+            ],
+        }
+        return transform.compile_plan(schema, "dataset_fields", "ingest")
+
+    def test_bind(self, plan, caplog):
+        binding = plan.bind(["Name", "Title", "url"])
+
+        assert binding.targets == (("title", "Title"), ("notes", "notes"))
+        assert binding.columns == {"Title": 1}
+        assert binding.defaults == {"notes": "No notes"}
+        assert binding.missing == ["name"]
+        assert "['name']" in caplog.text
+
+        caplog.clear()
+        assert plan.bind(("Name", "Title", "url")) is binding
+        assert not caplog.text
+
+    def test_same_as_unbound(self, plan):
+        header = ["URL", "Name"]
+        rows = [
+            {"URL": "Hello World", "Name": "Hello"},
+            {"URL": "second", "Name": ""},
+        ]
+        binding = plan.bind(header)
+
+        expected = [transform._transform(row, plan) for row in rows]
+        assert [transform._transform(row, plan, binding) for row in rows] == expected
+        assert transform._transform_batch(rows, plan, binding) == expected
+
+    def test_missing_column(self, plan):
+        binding = plan.bind(["URL", "Name"])
+        rows = [{"URL": "Hello World", "Name": "Hello"}, {"URL": "second"}]
+
+        expected = [transform._transform(row, plan, binding) for row in rows]
+        assert transform._transform_batch(rows, plan, binding) == expected
+        assert "title" not in expected[1]
+
+    def test_tuple_rows(self, plan):
+        binding = plan.bind(["URL", "Name"])
+        rows = [("Hello World", "Hello"), ("second",)]
+
+        assert transform._transform_batch(rows, plan, binding) == [
+            {"title": "Hello", "name": "hello-world", "notes": "No notes"},
+            {"title": None, "name": "second", "notes": "No notes"},
+        ]
+
+
+class TestChoices:
+    def make_plan(self, field: dict):
+        field = dict(
+            field,
+            field_name="license_id",
+            label="License",
+            ingest_options={"normalize_choice": True, "choice_separator": ";"},
+        )
+        return transform.compile_plan(
+            {"dataset_fields": [field]},
+            "dataset_fields",
+            "ingest",
+        )
+
+    def test_insensitive(self):
+        plan = self.make_plan(
+            {"choices": [{"value": "cc-by", "label": "Creative Commons"}]},
+        )
+        raw = {"License": " creative  COMMONS ;CC-BY;other"}
+
+        assert transform._transform(raw, plan) == {
+            "license_id": ["cc-by", "cc-by", "other"],
+        }
+
+    def test_helper_ttl(self, monkeypatch):
+        calls = []
+
+        def choices(field: dict):
+            calls.append(field)
+            return [{"value": "cc-by", "label": "Attribution"}]
+
+        monkeypatch.setitem(tk.h, "scheming_field_choices", choices)
+        plan = self.make_plan({"choices_helper": "licenses"})
+        rows = [{"License": "Attribution"}] * 3
+
+        assert transform._transform_batch(rows, plan) == [{"license_id": "cc-by"}] * 3
+        assert transform._transform(rows[0], plan) == {"license_id": "cc-by"}
+        assert len(calls) == 1
+
+        # choices expired
+        plan.fields["license_id"].expires = 1
+        transform._transform(rows[0], plan)
+        assert len(calls) == 2
@@ -1,16 +1,32 @@
 from __future__ import annotations
 
 import dataclasses
-from typing import Any
+import logging
+import time
+from typing import Any, Sequence
 
 from typing_extensions import TypeAlias
 
 import ckan.plugins.toolkit as tk
 
+from . import config
+
+log = logging.getLogger(__name__)
+
 TransformationSchema: TypeAlias = "dict[str, Field]"
 
+# pairs of (field name, key in raw data) selected for transformation
+Targets: TypeAlias = "tuple[tuple[str, str], ...]"
+
+# navl schema and targets processed by it during a single validation call
+ValidationPass: TypeAlias = "tuple[dict[str, list[Any]], list[tuple[str, str]]]"
+
 _default = object()
 
+# compiled transformation plans by (dataset type, fieldset, profile)
+_plans: dict[tuple[str, str, str], Plan] = {}
+
+
 @dataclasses.dataclass
 class Options:
     """Transformation options taken from `{profile}_options` attribute of field
@@ -59,12 +75,148 @@ class Field:
     field: dict[str, Any]
     # whole metadata schema
     schema: dict[str, Any]
+    # validators from `options.convert`, resolved during compilation
+    validators: list[Any] = dataclasses.field(default_factory=list)
+    # names of the field in the raw data, in order of priority
+    keys: list[Any] = dataclasses.field(default_factory=list)
+    # index of choices, built on demand
+    choices: dict[str, Any] | None = dataclasses.field(default=None, repr=False)
+    # monotonic time when choices produced by `choices_helper` expire
+    expires: float = dataclasses.field(default=0, repr=False)
+
+    def choice_index(self) -> dict[str, Any]:
+        """Mapping of normalized choice labels and values into values.
+
+        Static choices are indexed once. Choices produced by `choices_helper`
+        are indexed again after `ckanext.ingest.choices_ttl` seconds.
+
+        """
+        if self.choices is None or (self.expires and time.monotonic() > self.expires):
+            self.choices = _choice_index(tk.h.scheming_field_choices(self.field))
+            if "choices_helper" in self.field:
+                self.expires = time.monotonic() + config.choices_ttl()
+
+        return self.choices
+
+
+@dataclasses.dataclass
+class Binding:
+    """Fields of the plan bound to columns of the source's header.
+
+    Binding is resolved once per header, so rows that follow the header are
+    transformed without looking for aliases in every row.
+
+    """
+
+    # pairs of (field name, column) selected for transformation
+    targets: Targets
+    # default values for fields that have no column in the header
+    defaults: dict[str, Any]
+    # position of every selected column in the header
+    columns: dict[str, int]
+    # fields that have neither column nor default value
+    missing: list[str]
+
+    def pick(self, values: Sequence[Any]) -> dict[str, Any]:
+        """Convert row of values into dict with bound columns and defaults."""
+        size = len(values)
+        data = {
+            key: values[idx] if idx < size else None
+            for key, idx in self.columns.items()
+        }
+        data.update(self.defaults)
+        return data
+
+
+@dataclasses.dataclass
+class Plan:
+    """Transformation schema compiled from the fieldset of metadata schema.
+
+    Plan is built once for every combination of dataset type, fieldset and
+    profile and reused by all records. It keeps the reference to the metadata
+    schema it was built from, so that the plan is rebuilt when
+    ckanext-scheming reloads schemas.
+
+    """
+
+    # metadata schema used for compilation
+    schema: dict[str, Any]
+    # transformation rules for every field with `{profile}_options`
+    fields: TransformationSchema
+    # navl validation passes for every combination of targets
+    passes: dict[Targets, list[ValidationPass]] = dataclasses.field(
+        default_factory=dict,
+        repr=False,
+    )
+    # bindings for every header of the source
+    bindings: dict[tuple[str, ...], Binding] = dataclasses.field(
+        default_factory=dict,
+        repr=False,
+    )
+
+    def bind(self, header: Sequence[str]) -> Binding:
+        """Bind fields to columns of the header.
+
+        Fields that cannot be found in the header and have no default value
+        are reported only when the header is bound for the first time.
+
+        """
+        key = tuple(header)
+        if key not in self.bindings:
+            targets, defaults = _resolve(dict.fromkeys(key), self)
+            # later duplicate of the column overrides the former, as in
+            # csv.DictReader
+            positions = {name: idx for idx, name in enumerate(key)}
+            bound = {field for field, _k in targets}
+
+            binding = Binding(
+                targets,
+                defaults,
+                {k: positions[k] for _field, k in targets if k in positions},
+                [field for field in self.fields if field not in bound],
+            )
+            if binding.missing:
+                log.warning(
+                    "Fields %s are not found in the header %s",
+                    binding.missing,
+                    list(key),
+                )
+
+            self.bindings[key] = binding
+
+        return self.bindings[key]
+
+    def get_passes(self, targets: Targets) -> list[ValidationPass]:
+        """Combine validators of targets into the minimal number of navl
+        schemas.
+
+        Normally, every target is validated in a single pass. Additional pass
+        is required only when multiple fields are mapped to the same key of
+        the raw data.
+
+        """
+        if targets not in self.passes:
+            passes: list[ValidationPass] = []
+            for field, key in targets:
+                current = next((p for p in passes if key not in p[0]), None)
+                if current is None:
+                    current = ({}, [])
+                    passes.append(current)
+
+                schema, members = current
+                schema[key] = self.fields[field].validators
+                members.append((field, key))
+
+            self.passes[targets] = passes
+
+        return self.passes[targets]
 
 
 def transform_package(
-    data_dict: dict[str, Any],
+    data_dict: dict[str, Any] | Sequence[Any],
     type_: str = "dataset",
     profile: str = "ingest",
+    header: Sequence[str] | None = None,
 ) -> dict[str, Any]:
     """Transform raw data into package_create/package_update payload.
 
@@ -72,17 +224,22 @@ def transform_package(
     transformed from raw data using these options. Fields in schema that do not
     have `{profile}_options` attribute are ignored.
 
+    When `header` with the names of source's columns is known in advance,
+    fields are bound to columns once per header and raw data can be passed as
+    a sequence of values in the same order as columns.
+
     """
-    schema = _get_transformation_schema(type_, "dataset_fields", profile)
-    result = _transform(data_dict, schema)
+    plan = get_plan(type_, "dataset_fields", profile)
+    result = _transform(data_dict, plan, _bind(plan, header))
     result.setdefault("type", type_)
     return result
 
 
 def transform_resource(
-    data_dict: dict[str, Any],
+    data_dict: dict[str, Any] | Sequence[Any],
     type_: str = "dataset",
     profile: str = "ingest",
+    header: Sequence[str] | None = None,
 ) -> dict[str, Any]:
     """Transform raw data into resource_create/resource_update payload.
 
@@ -90,77 +247,331 @@ def transform_resource(
     transformed from raw data using these options. Fields in schema that do not
     have `{profile}_options` attribute are ignored.
 
+    Check `transform_package` for details about `header`.
+
     """
-    schema = _get_transformation_schema(type_, "resource_fields", profile)
-    return _transform(data_dict, schema)
+    plan = get_plan(type_, "resource_fields", profile)
+    return _transform(data_dict, plan, _bind(plan, header))
 
 
-def _get_transformation_schema(
-    type_: str,
-    fieldset: str,
-    profile: str,
-) -> TransformationSchema:
-    """Parse metadata schema into transformation schema."""
+def transform_packages(
+    rows: Sequence[dict[str, Any] | Sequence[Any]],
+    type_: str = "dataset",
+    profile: str = "ingest",
+    header: Sequence[str] | None = None,
+) -> list[dict[str, Any]]:
+    """Transform multiple rows of raw data into package payloads at once."""
+    plan = get_plan(type_, "dataset_fields", profile)
+    results = _transform_batch(rows, plan, _bind(plan, header))
+    for result in results:
+        result.setdefault("type", type_)
+    return results
+
+
+def transform_resources(
+    rows: Sequence[dict[str, Any] | Sequence[Any]],
+    type_: str = "dataset",
+    profile: str = "ingest",
+    header: Sequence[str] | None = None,
+) -> list[dict[str, Any]]:
+    """Transform multiple rows of raw data into resource payloads at once."""
+    plan = get_plan(type_, "resource_fields", profile)
+    return _transform_batch(rows, plan, _bind(plan, header))
+
+
+def get_plan(type_: str, fieldset: str, profile: str) -> Plan:
+    """Return compiled transformation plan for the fieldset of dataset type.
+
+    Plans are cached and compiled again only when metadata schema changes.
+
+    """
     schema = tk.h.scheming_get_dataset_schema(type_)
     if not schema:
         raise ValueError(type_)
 
-    return {
-        f["field_name"]: Field(Options(**(f[f"{profile}_options"] or {})), f, schema)
-        for f in schema[fieldset]
-        if f"{profile}_options" in f
-    }
+    key = (type_, fieldset, profile)
+    plan = _plans.get(key)
+    if plan is None or plan.schema is not schema:
+        plan = _plans[key] = compile_plan(schema, fieldset, profile)
 
+    return plan
 
-def _transform(data: dict[str, Any], schema: TransformationSchema) -> dict[str, Any]:
-    """Transform raw data using transformation schema."""
+
+def compile_plan(schema: dict[str, Any], fieldset: str, profile: str) -> Plan:
+    """Parse metadata schema into transformation plan."""
     from ckanext.scheming.validation import validators_from_string
 
     validators_from_string: Any
 
-    result: dict[str, Any] = {}
+    fields: TransformationSchema = {}
+    for f in schema[fieldset]:
+        if f"{profile}_options" not in f:
+            continue
+
+        options = Options(**(f[f"{profile}_options"] or {}))
+        fields[f["field_name"]] = Field(
+            options,
+            f,
+            schema,
+            validators_from_string(options.convert, f, schema),
+            options.aliases or [f["label"], f["field_name"]],
+        )
+
+    return Plan(schema, fields)
+
+
+def clear_plans():
+    """Drop all compiled transformation plans."""
+    _plans.clear()
+
+
+def _bind(plan: Plan, header: Sequence[str] | None) -> Binding | None:
+    return plan.bind(header) if header else None
+
+
+def _resolve(data: dict[str, Any], plan: Plan) -> tuple[Targets, dict[str, Any]]:
+    """Select keys of raw data for every field of the plan.
+
+    Returns targets and default values for fields missing from the data.
+
+    """
+    targets: list[tuple[str, str]] = []
+    defaults: dict[str, Any] = {}
 
-    for field, rules in schema.items():
-        for k in rules.options.aliases or [
-            rules.field["label"],
-            rules.field["field_name"],
-        ]:
+    for field, rules in plan.fields.items():
+        for k in rules.keys:
             if k in data:
                 break
         else:
             if rules.options.default is _default:
                 continue
+
             k = field
-            data[k] = rules.options.default
+            defaults[k] = rules.options.default
 
-        validators = validators_from_string(
-            rules.options.convert,
-            rules.field,
-            rules.schema,
-        )
-        valid_data, _err = tk.navl_validate(data, {k: validators})
+        targets.append((field, k))
 
-        # field was removed by one of ignore_* validators
-        if k not in valid_data:
-            continue
+    return tuple(targets), defaults
 
-        value = valid_data[k]
-        if rules.options.normalize_choice:
-            value = _normalize_choice(
-                value,
-                tk.h.scheming_field_choices(rules.field),
-                rules.options.choice_separator,
-            )
-        result[field] = value
+
+def _transform(
+    data: dict[str, Any] | Sequence[Any],
+    plan: Plan,
+    binding: Binding | None = None,
+) -> dict[str, Any]:
+    """Transform raw data using compiled transformation plan.
+
+    All fields are validated at once, using a single navl call, unless
+    multiple fields are mapped to the same key of raw data. When binding is
+    available, fields are taken from bound columns without alias lookup.
+
+    """
+    if binding is None:
+        targets, defaults = _resolve(data, plan)  # type: ignore[arg-type]
+    else:
+        targets, defaults = binding.targets, binding.defaults
+        if not isinstance(data, dict):
+            data, defaults = binding.pick(data), {}
+
+    if defaults:
+        # original raw data is preserved for reports
+        data = {**data, **defaults}
+
+    result: dict[str, Any] = {}
+
+    for schema, members in plan.get_passes(targets):
+        valid_data, _err = tk.navl_validate(data, schema)
+
+        for field, k in members:
+            # field was removed by one of ignore_* validators or bound column
+            # is missing from the data
+            value = valid_data.get(k, tk.missing)
+            if value is tk.missing:
+                continue
+
+            rules = plan.fields[field]
+            if rules.options.normalize_choice:
+                value = _map_choice(
+                    value,
+                    rules.choice_index(),
+                    rules.options.choice_separator,
+                )
+            result[field] = value
 
     return result
 
 
-def _normalize_choice(
+def _transform_batch(
+    rows: Sequence[dict[str, Any] | Sequence[Any]],
+    plan: Plan,
+    binding: Binding | None = None,
+) -> list[dict[str, Any]]:
+    """Transform multiple rows of raw data using compiled transformation plan.
+
+    Produces the same result as `_transform` applied to every row. Rows with
+    the same keys share targets, which are resolved only once, or taken from
+    the binding when all rows follow the same header. Then every field is
+    processed column by column: values that do not require conversion are
+    copied as-is, others are validated by navl and choices are normalized
+    using the mapping built once per batch.
+
+    """
+    results: list[dict[str, Any]] = [{} for _ in rows]
+
+    for indexes in _layouts(rows, binding):
+        if binding is None:
+            targets, defaults = _resolve(rows[indexes[0]], plan)  # type: ignore
+        else:
+            targets, defaults = binding.targets, binding.defaults
+
+        data = [_with_defaults(rows[idx], defaults, binding) for idx in indexes]
+        group = [results[idx] for idx in indexes]
+
+        validated = _copy_plain(data, targets, plan, group)
+        _validate_rows(data, validated, plan, group)
+        _normalize_choices(targets, plan, group)
+
+    return results
+
+
+def _layouts(
+    rows: Sequence[dict[str, Any] | Sequence[Any]],
+    binding: Binding | None,
+) -> list[list[int]]:
+    """Group indexes of rows with the same keys.
+
+    With binding, all rows follow the same header and form a single group.
+
+    """
+    if binding is not None:
+        return [list(range(len(rows)))] if rows else []
+
+    layouts: dict[tuple[str, ...], list[int]] = {}
+    for idx, row in enumerate(rows):
+        layouts.setdefault(tuple(row), []).append(idx)
+
+    return list(layouts.values())
+
+
+def _copy_plain(
+    data: list[dict[str, Any]],
+    targets: Targets,
+    plan: Plan,
+    results: list[dict[str, Any]],
+) -> Targets:
+    """Copy values of targets that do not require conversion.
+
+    Missing values are skipped, just as navl drops them. Returns targets that
+    must be validated.
+
+    """
+    validated: list[tuple[str, str]] = []
+    for field, k in targets:
+        if plan.fields[field].validators:
+            validated.append((field, k))
+            continue
+
+        for row, result in zip(data, results):
+            value = row.get(k, tk.missing)
+            if value is tk.missing:
+                continue
+
+            # navl expands nested structures, so they are always validated
+            if isinstance(value, (list, dict)):
+                _validate(row, (field, k), plan, result)
+            else:
+                result[field] = value
+
+    return tuple(validated)
+
+
+def _validate_rows(
+    data: list[dict[str, Any]],
+    targets: Targets,
+    plan: Plan,
+    results: list[dict[str, Any]],
+):
+    """Validate targets of every row, using the minimal number of navl calls."""
+    for schema, members in plan.get_passes(targets):
+        for row, result in zip(data, results):
+            valid_data, _err = tk.navl_validate(row, schema)
+            for field, k in members:
+                if k in valid_data:
+                    result[field] = valid_data[k]
+
+
+def _normalize_choices(targets: Targets, plan: Plan, results: list[dict[str, Any]]):
+    """Replace labels of choices with their values."""
+    for field, _k in targets:
+        rules = plan.fields[field]
+        if not rules.options.normalize_choice:
+            continue
+
+        index = rules.choice_index()
+        for result in results:
+            if field in result:
+                result[field] = _map_choice(
+                    result[field],
+                    index,
+                    rules.options.choice_separator,
+                )
+
+
+def _with_defaults(
+    row: dict[str, Any] | Sequence[Any],
+    defaults: dict[str, Any],
+    binding: Binding | None,
+) -> dict[str, Any]:
+    """Add default values to the row.
+
+    Sequence of values is converted into dict using the binding.
+
+    """
+    if binding is not None and not isinstance(row, dict):
+        return binding.pick(row)
+
+    return {**row, **defaults} if defaults else row
+
+
+def _validate(
+    data: dict[str, Any],
+    target: tuple[str, str],
+    plan: Plan,
+    result: dict[str, Any],
+):
+    """Validate single target of the data and add it to the result."""
+    field, k = target
+    valid_data, _err = tk.navl_validate(data, {k: plan.fields[field].validators})
+    if k in valid_data:
+        result[field] = valid_data[k]
+
+
+def _choice_key(value: Any) -> str:
+    """Normalize label of choice, ignoring case and whitespaces."""
+    return " ".join(str(value).split()).casefold()
+
+
+def _choice_index(choices: list[dict[str, Any]]) -> dict[str, Any]:
+    """Index choices by normalized labels and values.
+
+    Labels take precedence over values, when they are normalized into the same
+    key.
+
+    """
+    index = {_choice_key(o["value"]): o["value"] for o in choices if "value" in o}
+    index.update(
+        (_choice_key(o["label"]), o["value"])
+        for o in choices
+        if "label" in o and "value" in o
+    )
+    return index
+
+
+def _map_choice(
     value: Any,
-    choices: list[dict[str, str]],
+    index: dict[str, Any],
     separator: str,
-) -> str | list[str] | None:
+) -> Any | list[Any] | None:
     """Transform select label[s] into corresponding value[s]"""
     if not value:
         return None
@@ -168,8 +579,7 @@ def _normalize_choice(
     if isinstance(value, str):
         value = value.split(separator)
 
-    mapping = {o["label"]: o["value"] for o in choices if "label" in o}
-    value = [mapping.get(v, v) for v in value]
+    value = [index.get(_choice_key(v), v) for v in value]
 
     if len(value) > 1:
         return value
@@ -41,7 +41,12 @@ class IngestView(MethodView):
             data.update(parse_params(tk.request.files))
             result = tk.get_action("ingest_import_records")({}, data)
 
-            if data['report'] == 'details':
+            if tk.asbool(data.get("background")):
+                tk.h.flash_success(
+                    tk._("Ingestion is scheduled. Job ID: {id}").format(**result),
+                )
+
+            elif data.get("report") == "details":
                 for ingested in result:
                     pkg = tk.get_action("package_show")({}, ingested['result']['result'])
                     tk.h.flash_success(